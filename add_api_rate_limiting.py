@@ -13,6 +13,8 @@ ESV API Terms:
 from bs4 import BeautifulSoup
 from pathlib import Path
 
+from add_bible_api import api_bible_script, esv_batch_script, stamp_passage_ids, verse_lookup_script
+
 def add_rate_limiting():
     """Add comprehensive rate limiting to all publish files."""
     
@@ -38,85 +40,261 @@ def add_rate_limiting():
     const STORAGE_KEY = 'esv_api_rate_limits';
     const CACHE_KEY = 'esv_verse_cache';
     
+    // ============================================================
+    // Client Storage
+    // One IndexedDB record per key, with localStorage only as a fallback.
+    // Everything is read into memory once at startup, so lookups never
+    // touch storage; writes made in the same turn are committed together
+    // in one transaction.
+    // ============================================================
+    const STORAGE_DB = 'esv-api';
+    const STORAGE_DB_STORE = 'state';
+    
+    class ClientStore {
+        constructor() {
+            this.values = new Map();
+            this.pending = new Map();  // key -> value to write, or undefined to delete
+            this.flushScheduled = false;
+            this.db = null;
+            this.ready = this.open();
+        }
+        
+        async open() {
+            try {
+                if (typeof indexedDB === 'undefined') throw new Error('IndexedDB not supported');
+                this.db = await new Promise((resolve, reject) => {
+                    const request = indexedDB.open(STORAGE_DB, 1);
+                    request.onupgradeneeded = () => request.result.createObjectStore(STORAGE_DB_STORE);
+                    request.onsuccess = () => resolve(request.result);
+                    request.onerror = () => reject(request.error);
+                });
+                await new Promise((resolve, reject) => {
+                    const request = this.db.transaction(STORAGE_DB_STORE).objectStore(STORAGE_DB_STORE).openCursor();
+                    request.onsuccess = () => {
+                        const cursor = request.result;
+                        if (!cursor) return resolve();
+                        this.values.set(cursor.key, cursor.value);
+                        cursor.continue();
+                    };
+                    request.onerror = () => reject(request.error);
+                });
+            } catch (e) {
+                console.warn('IndexedDB unavailable, using localStorage:', e);
+                this.db = null;
+            }
+            this.importLocalStorage();
+        }
+        
+        // The fallback's data, or state saved by pages that used localStorage;
+        // with IndexedDB available it is moved there
+        importLocalStorage() {
+            try {
+                const keys = [];
+                for (let i = 0; i < localStorage.length; i++) {
+                    keys.push(localStorage.key(i));
+                }
+                for (const key of keys) {
+                    if (!key.startsWith(STORAGE_KEY) && !key.startsWith(CACHE_KEY)) continue;
+                    if (!this.values.has(key)) {
+                        this.values.set(key, JSON.parse(localStorage.getItem(key)));
+                        if (this.db) this.pending.set(key, this.values.get(key));
+                    }
+                    if (this.db) localStorage.removeItem(key);
+                }
+                this.scheduleFlush();
+            } catch (e) {
+                console.warn('Failed to read localStorage:', e);
+            }
+        }
+        
+        get(key) {
+            return this.values.has(key) ? this.values.get(key) : null;
+        }
+        
+        set(key, value) {
+            this.values.set(key, value);
+            this.pending.set(key, value);
+            this.scheduleFlush();
+        }
+        
+        remove(key) {
+            this.values.delete(key);
+            this.pending.set(key, undefined);
+            this.scheduleFlush();
+        }
+        
+        scheduleFlush() {
+            if (!this.flushScheduled && this.pending.size) {
+                this.flushScheduled = true;
+                setTimeout(() => this.flush(), 0);
+            }
+        }
+        
+        flush() {
+            this.flushScheduled = false;
+            if (!this.pending.size) return;
+            const pending = this.pending;
+            this.pending = new Map();
+            
+            if (this.db) {
+                try {
+                    const transaction = this.db.transaction(STORAGE_DB_STORE, 'readwrite');
+                    const store = transaction.objectStore(STORAGE_DB_STORE);
+                    for (const [key, value] of pending) {
+                        if (value === undefined) store.delete(key);
+                        else store.put(value, key);
+                    }
+                    transaction.onerror = () => console.error('Failed to save state:', transaction.error);
+                    return;
+                } catch (e) {
+                    console.error('Failed to save state to IndexedDB:', e);
+                }
+            }
+            for (const [key, value] of pending) {
+                try {
+                    if (value === undefined) localStorage.removeItem(key);
+                    else localStorage.setItem(key, JSON.stringify(value));
+                } catch (e) {
+                    console.error('Failed to save state:', e);
+                }
+            }
+        }
+    }
+    
     // ============================================================
     // Rate Limit Tracker
+    // Requests are counted per minute, hour and day in fixed ring buffers
+    // of time slots (mirrored in rate_limiter.py), so memory and every
+    // check are constant. A window counts every slot that overlaps it, one
+    // more slot than it holds, so the limits are never exceeded.
     // ============================================================
+    const RATE_WINDOWS = {
+        minute: { limit: ESV_RATE_LIMITS.perMinute, windowMs: 60 * 1000, slots: 12 },
+        hour: { limit: ESV_RATE_LIMITS.perHour, windowMs: 60 * 60 * 1000, slots: 60 },
+        day: { limit: ESV_RATE_LIMITS.perDay, windowMs: 24 * 60 * 60 * 1000, slots: 24 }
+    };
+    const SAVE_DELAY_MS = 2000;  // state is written at most this often
+    
+    class WindowCounter {
+        constructor(windowMs, slots, state) {
+            this.slots = slots + 1;
+            this.slotMs = windowMs / slots;
+            const counts = state && state.counts;
+            this.counts = counts && counts.length === this.slots ? counts.slice() : new Array(this.slots).fill(0);
+            this.slot = (state && state.slot) || 0;
+            this.total = this.counts.reduce((sum, n) => sum + n, 0);
+        }
+        
+        // Move to the slot containing now, clearing slots that left the window
+        advance(now) {
+            const current = Math.floor(now / this.slotMs);
+            if (current - this.slot >= this.slots) {
+                this.counts.fill(0);
+                this.total = 0;
+            } else {
+                for (let slot = this.slot + 1; slot <= current; slot++) {
+                    this.total -= this.counts[slot % this.slots];
+                    this.counts[slot % this.slots] = 0;
+                }
+            }
+            this.slot = Math.max(this.slot, current);
+        }
+        
+        count(now) {
+            this.advance(now);
+            return this.total;
+        }
+        
+        add(now, n = 1) {
+            this.advance(now);
+            this.counts[this.slot % this.slots] += n;
+            this.total += n;
+        }
+        
+        // Milliseconds until the oldest slots expire enough to get under limit
+        waitMs(now, limit) {
+            this.advance(now);
+            let total = this.total;
+            for (let age = this.slots - 1; age >= 0 && total >= limit; age--) {
+                const slot = this.slot - age;
+                total -= this.counts[slot % this.slots];
+                if (total < limit) {
+                    return Math.max((slot + this.slots) * this.slotMs - now, 0);
+                }
+            }
+            return 0;
+        }
+        
+        toJSON() {
+            return { slot: this.slot, counts: this.counts.slice() };
+        }
+    }
+    
     class RateLimiter {
         constructor() {
-            this.loadState();
-            this.startCleanupTimer();
+            this.saveTimer = null;
+            this.createCounters(null);
+        }
+        
+        createCounters(state) {
+            this.counters = {};
+            for (const [name, config] of Object.entries(RATE_WINDOWS)) {
+                this.counters[name] = new WindowCounter(config.windowMs, config.slots, state && state[name]);
+            }
         }
         
         loadState() {
             try {
-                const stored = localStorage.getItem(STORAGE_KEY);
-                if (stored) {
-                    this.state = JSON.parse(stored);
-                    this.cleanOldEntries();
-                } else {
-                    this.resetState();
+                const state = clientStore.get(STORAGE_KEY);
+                this.createCounters(state && !Array.isArray(state.requests) ? state : null);
+                if (state && Array.isArray(state.requests)) {
+                    this.migrateTimestamps(state);
                 }
             } catch (e) {
                 console.warn('Failed to load rate limit state:', e);
-                this.resetState();
+                this.createCounters(null);
+            }
+        }
+        
+        // State saved by the earlier limiter: a list of request timestamps
+        // from the last hour plus a daily count
+        migrateTimestamps(state) {
+            const now = Date.now();
+            const recent = state.requests.filter(t => t > now - RATE_WINDOWS.hour.windowMs && t <= now);
+            for (const t of recent) {
+                for (const counter of Object.values(this.counters)) counter.add(t);
+            }
+            if (state.lastReset > now - RATE_WINDOWS.day.windowMs) {
+                this.counters.day.add(now, Math.max((state.dailyCount || 0) - recent.length, 0));
             }
+            this.flushState();
         }
         
         resetState() {
-            this.state = {
-                requests: [],
-                dailyCount: 0,
-                lastReset: Date.now()
-            };
-            this.saveState();
+            this.createCounters(null);
+            this.flushState();
         }
         
+        // Batched: a burst of requests is written once
         saveState() {
-            try {
-                localStorage.setItem(STORAGE_KEY, JSON.stringify(this.state));
-            } catch (e) {
-                console.error('Failed to save rate limit state:', e);
+            if (!this.saveTimer) {
+                this.saveTimer = setTimeout(() => this.flushState(), SAVE_DELAY_MS);
             }
         }
         
-        cleanOldEntries() {
-            const now = Date.now();
-            const oneHourAgo = now - (60 * 60 * 1000);
-            const oneDayAgo = now - (24 * 60 * 60 * 1000);
-            
-            // Remove requests older than 1 hour
-            this.state.requests = this.state.requests.filter(timestamp => timestamp > oneHourAgo);
-            
-            // Reset daily counter if more than 24 hours
-            if (this.state.lastReset < oneDayAgo) {
-                this.state.dailyCount = 0;
-                this.state.lastReset = now;
+        flushState() {
+            clearTimeout(this.saveTimer);
+            this.saveTimer = null;
+            const state = {};
+            for (const [name, counter] of Object.entries(this.counters)) {
+                state[name] = counter.toJSON();
             }
-            
-            this.saveState();
-        }
-        
-        startCleanupTimer() {
-            // Clean up old entries every 5 minutes
-            setInterval(() => this.cleanOldEntries(), 5 * 60 * 1000);
+            clientStore.set(STORAGE_KEY, state);
         }
         
         checkLimit(limitType = 'minute') {
-            const now = Date.now();
-            this.cleanOldEntries();
-            
-            if (limitType === 'minute') {
-                const oneMinuteAgo = now - (60 * 1000);
-                const recentRequests = this.state.requests.filter(t => t > oneMinuteAgo);
-                return recentRequests.length < ESV_RATE_LIMITS.perMinute;
-            } else if (limitType === 'hour') {
-                const oneHourAgo = now - (60 * 60 * 1000);
-                const recentRequests = this.state.requests.filter(t => t > oneHourAgo);
-                return recentRequests.length < ESV_RATE_LIMITS.perHour;
-            } else if (limitType === 'day') {
-                return this.state.dailyCount < ESV_RATE_LIMITS.perDay;
-            }
-            return false;
+            const config = RATE_WINDOWS[limitType];
+            return config ? this.counters[limitType].count(Date.now()) < config.limit : false;
         }
         
         canMakeRequest() {
@@ -127,120 +305,158 @@ def add_rate_limiting():
         
         recordRequest() {
             const now = Date.now();
-            this.state.requests.push(now);
-            this.state.dailyCount++;
+            for (const counter of Object.values(this.counters)) {
+                counter.add(now);
+            }
             this.saveState();
         }
         
         getRemainingRequests() {
-            this.cleanOldEntries();
             const now = Date.now();
-            const oneMinuteAgo = now - (60 * 1000);
-            const oneHourAgo = now - (60 * 60 * 1000);
-            
-            const minuteRequests = this.state.requests.filter(t => t > oneMinuteAgo).length;
-            const hourRequests = this.state.requests.filter(t => t > oneHourAgo).length;
-            
-            return {
-                minute: ESV_RATE_LIMITS.perMinute - minuteRequests,
-                hour: ESV_RATE_LIMITS.perHour - hourRequests,
-                day: ESV_RATE_LIMITS.perDay - this.state.dailyCount
-            };
+            const remaining = {};
+            for (const [name, config] of Object.entries(RATE_WINDOWS)) {
+                remaining[name] = config.limit - this.counters[name].count(now);
+            }
+            return remaining;
         }
         
+        // Seconds until every window allows another request
         getWaitTime() {
-            if (this.checkLimit('minute')) return 0;
-            
             const now = Date.now();
-            const oneMinuteAgo = now - (60 * 1000);
-            const oldestRequest = this.state.requests.find(t => t > oneMinuteAgo);
-            
-            if (oldestRequest) {
-                const waitMs = (oldestRequest + 60 * 1000) - now;
-                return Math.max(0, Math.ceil(waitMs / 1000));
+            let waitMs = 0;
+            for (const [name, config] of Object.entries(RATE_WINDOWS)) {
+                waitMs = Math.max(waitMs, this.counters[name].waitMs(now, config.limit));
             }
-            return 60;
+            return Math.ceil(waitMs / 1000);
         }
     }
     
     // ============================================================
     // Verse Cache Manager (Max 500 verses per ESV terms)
+    // Least recently used passages are evicted until the verses held fit
+    // the cap; verses are counted with the Bible API script's
+    // versification table. Each passage has its own storage key, so an
+    // insert writes one entry, and the small LRU index is saved in batches.
     // ============================================================
+    const CACHE_ENTRY_PREFIX = CACHE_KEY + ':';
+    
     class VerseCache {
         constructor() {
-            this.loadCache();
+            this.indexTimer = null;
+            // reference -> verses held, least recently used first
+            this.entries = new Map();
+            this.verseCount = 0;
+            this.lastCleared = Date.now();
         }
         
         loadCache() {
+            this.entries = new Map();
+            this.verseCount = 0;
+            this.lastCleared = Date.now();
             try {
-                const stored = localStorage.getItem(CACHE_KEY);
-                if (stored) {
-                    this.cache = JSON.parse(stored);
-                } else {
-                    this.cache = {
-                        verses: {},
-                        count: 0,
-                        lastCleared: Date.now()
-                    };
+                const stored = clientStore.get(CACHE_KEY);
+                if (stored && stored.verses) {
+                    // Earlier caches kept every passage in this one object
+                    // and counted entries, not verses; start afresh
+                    clientStore.remove(CACHE_KEY);
+                } else if (stored) {
+                    this.lastCleared = stored.lastCleared || this.lastCleared;
+                    for (const [reference, verses] of stored.entries || []) {
+                        this.entries.set(reference, verses);
+                        this.verseCount += verses;
+                    }
                 }
             } catch (e) {
                 console.warn('Failed to load verse cache:', e);
-                this.cache = { verses: {}, count: 0, lastCleared: Date.now() };
             }
         }
         
+        // Batched: the index is written at most every SAVE_DELAY_MS
         saveCache() {
-            try {
-                localStorage.setItem(CACHE_KEY, JSON.stringify(this.cache));
-            } catch (e) {
-                console.error('Failed to save verse cache:', e);
+            if (!this.indexTimer) {
+                this.indexTimer = setTimeout(() => this.flushIndex(), SAVE_DELAY_MS);
             }
         }
         
+        flushIndex() {
+            clearTimeout(this.indexTimer);
+            this.indexTimer = null;
+            clientStore.set(CACHE_KEY, {
+                entries: Array.from(this.entries),
+                lastCleared: this.lastCleared
+            });
+        }
+        
+        verses(reference) {
+            const range = window.esvPassageRange && window.esvPassageRange(reference);
+            return range ? range.verses : 1;
+        }
+        
         get(reference) {
-            return this.cache.verses[reference] || null;
+            if (!this.entries.has(reference)) return null;
+            
+            const data = clientStore.get(CACHE_ENTRY_PREFIX + reference);
+            if (!data) {
+                this.remove(reference);
+                this.saveCache();
+                return null;
+            }
+            
+            // Move to the most recently used end
+            const verses = this.entries.get(reference);
+            this.entries.delete(reference);
+            this.entries.set(reference, verses);
+            this.saveCache();
+            return data;
+        }
+        
+        remove(reference) {
+            this.verseCount -= this.entries.get(reference) || 0;
+            this.entries.delete(reference);
+            clientStore.remove(CACHE_ENTRY_PREFIX + reference);
         }
         
         set(reference, data) {
-            // Check if we're at the 500 verse limit
-            if (!this.cache.verses[reference] && this.cache.count >= ESV_RATE_LIMITS.maxCacheSize) {
-                // Remove oldest entry (FIFO)
-                const oldestKey = Object.keys(this.cache.verses)[0];
-                delete this.cache.verses[oldestKey];
-                this.cache.count--;
-                console.log('⚠ Cache limit reached. Removed oldest verse:', oldestKey);
+            const verses = this.verses(reference);
+            if (verses > ESV_RATE_LIMITS.maxCacheSize) return;
+            if (this.entries.has(reference)) {
+                this.remove(reference);
             }
             
-            if (!this.cache.verses[reference]) {
-                this.cache.count++;
+            // Evict least recently used passages until this one fits
+            for (const oldest of this.entries.keys()) {
+                if (this.verseCount + verses <= ESV_RATE_LIMITS.maxCacheSize) break;
+                this.remove(oldest);
+                console.log('⚠ Cache limit reached. Removed least recently used passage:', oldest);
             }
             
-            this.cache.verses[reference] = {
+            clientStore.set(CACHE_ENTRY_PREFIX + reference, {
                 ...data,
                 cached: Date.now()
-            };
-            
+            });
+            this.entries.set(reference, verses);
+            this.verseCount += verses;
             this.saveCache();
         }
         
         clear() {
-            this.cache = {
-                verses: {},
-                count: 0,
-                lastCleared: Date.now()
-            };
-            this.saveCache();
+            for (const reference of Array.from(this.entries.keys())) {
+                this.remove(reference);
+            }
+            this.lastCleared = Date.now();
+            this.flushIndex();
             console.log('✓ Verse cache cleared');
         }
         
+        // Verses currently held
         getSize() {
-            return this.cache.count;
+            return this.verseCount;
         }
         
         shouldClear() {
             // Clear cache every 30 days (ESV recommendation)
             const thirtyDaysAgo = Date.now() - (30 * 24 * 60 * 60 * 1000);
-            return this.cache.lastCleared < thirtyDaysAgo;
+            return this.lastCleared < thirtyDaysAgo;
         }
     }
     
@@ -299,36 +515,58 @@ def add_rate_limiting():
     // ============================================================
     // Initialize Protection Systems
     // ============================================================
+    const clientStore = new ClientStore();
     const rateLimiter = new RateLimiter();
     const verseCache = new VerseCache();
     const botDetector = new BotDetector();
     
-    // Clear cache if it's been 30 days
-    if (verseCache.shouldClear()) {
-        verseCache.clear();
-        console.log('♻️ Periodic cache clear (30 days)');
-    }
+    const storageReady = clientStore.ready.then(() => {
+        rateLimiter.loadState();
+        verseCache.loadCache();
+        
+        // Clear cache if it's been 30 days
+        if (verseCache.shouldClear()) {
+            verseCache.clear();
+            console.log('♻️ Periodic cache clear (30 days)');
+        }
+    });
+    
+    // Write pending state before the page goes away
+    window.addEventListener('pagehide', () => {
+        rateLimiter.flushState();
+        verseCache.flushIndex();
+        clientStore.flush();
+    });
     
     // ============================================================
-    // Protected API Request Function
+    // Protected API Request Functions
     // ============================================================
-    window.makeProtectedAPIRequest = async function(reference, fetchFunction) {
+    
+    // One API request for several references: fetchFunction(references)
+    // returns results in the same order. Cached references are not sent,
+    // and the whole request counts once against the rate limits.
+    window.makeProtectedBatchRequest = async function(references, fetchFunction) {
+        await storageReady;
+        
         // Check cache first
-        const cached = verseCache.get(reference);
-        if (cached) {
-            console.log('✓ Verse loaded from cache:', reference);
-            return cached;
+        const results = references.map(reference => verseCache.get(reference));
+        const missing = references.filter((_, i) => !results[i]);
+        if (!missing.length) {
+            console.log('✓ Verses loaded from cache:', references.join('; '));
+            return results;
         }
         
+        const fill = result => results.map(cached => cached || result);
+        
         // Bot detection
         if (botDetector.isBot()) {
             console.error('🚫 Bot detected - API request blocked');
-            return {
+            return fill({
                 text: 'Automated requests are not permitted. Please visit ESV.org directly.',
                 version: 'Error',
                 success: false,
                 error: 'bot_detected'
-            };
+            });
         }
         
         // Rate limit check
@@ -343,42 +581,55 @@ def add_rate_limiting():
             console.log('  Per day:', remaining.day);
             console.log('Wait time:', waitTime, 'seconds');
             
-            return {
+            return fill({
                 text: `Rate limit reached. Please wait ${waitTime} seconds. (ESV API allows 60/min, 1000/hour, 5000/day)`,
                 version: 'Rate Limited',
                 success: false,
                 error: 'rate_limit',
                 waitTime: waitTime,
                 remaining: remaining
-            };
+            });
         }
         
         // Make the API request
         try {
             rateLimiter.recordRequest();
-            const result = await fetchFunction(reference);
-            
-            // Cache successful results
-            if (result && result.success) {
-                verseCache.set(reference, result);
-            }
+            const fetched = await fetchFunction(missing);
             
-            return result;
+            let next = 0;
+            return results.map((cached, i) => {
+                if (cached) return cached;
+                const result = fetched[next++];
+                // Cache successful results
+                if (result && result.success) {
+                    verseCache.set(references[i], result);
+                }
+                return result;
+            });
         } catch (error) {
             console.error('API request failed:', error);
-            return {
+            return fill({
                 text: 'Failed to fetch verse. Please try again later.',
                 version: 'Error',
                 success: false,
                 error: error.message
-            };
+            });
         }
     };
     
+    window.makeProtectedAPIRequest = async function(reference, fetchFunction) {
+        const results = await window.makeProtectedBatchRequest(
+            [reference], async references => [await fetchFunction(references[0])]
+        );
+        return results[0];
+    };
+    
     // ============================================================
     // Expose API for monitoring
     // ============================================================
     window.ESV_RATE_LIMITER = {
+        // Resolves once the stored limiter state and cache have been loaded
+        ready: storageReady,
         getRemaining: () => rateLimiter.getRemainingRequests(),
         getWaitTime: () => rateLimiter.getWaitTime(),
         getCacheSize: () => verseCache.getSize(),
@@ -406,15 +657,18 @@ def add_rate_limiting():
     console.log('  • 5,000 requests per day');
     console.log('  • Max 500 verses cached');
     console.log('');
-    console.log('Current Status:');
-    const remaining = rateLimiter.getRemainingRequests();
-    console.log('  • Remaining today:', remaining.day);
-    console.log('  • Remaining this hour:', remaining.hour);
-    console.log('  • Remaining this minute:', remaining.minute);
-    console.log('  • Cached verses:', verseCache.getSize(), '/ 500');
-    console.log('');
-    console.log('To check status: ESV_RATE_LIMITER.getStatus()');
-    console.log('To clear cache: ESV_RATE_LIMITER.clearCache()');
+    storageReady.then(() => {
+        console.log('Current Status:');
+        const remaining = rateLimiter.getRemainingRequests();
+        console.log('  • Remaining today:', remaining.day);
+        console.log('  • Remaining this hour:', remaining.hour);
+        console.log('  • Remaining this minute:', remaining.minute);
+        console.log('  • Cached verses:', verseCache.getSize(), '/ 500');
+        console.log('  • Storage:', clientStore.db ? 'IndexedDB' : 'localStorage');
+        console.log('');
+        console.log('To check status: ESV_RATE_LIMITER.getStatus()');
+        console.log('To clear cache: ESV_RATE_LIMITER.clearCache()');
+    });
 })();
 </script>
 '''
@@ -422,9 +676,16 @@ def add_rate_limiting():
     return rate_limiting_code
 
 def update_api_functions():
-    """Update API functions to use rate limiter."""
+    """
+    Batched ESV lookups for pages built before batching; the batch sender uses
+    window.makeProtectedBatchRequest, so every request is rate limited.
+    """
+    return esv_batch_script()
+
+def legacy_rate_limited_fetch():
+    """The per-reference rate-limited fetchFromESV older pages carry."""
     
-    updated_api_code = '''
+    legacy_api_code = '''
     /**
      * Fetch verse text from ESV API with rate limiting
      */
@@ -476,7 +737,107 @@ def update_api_functions():
     }
 '''
     
-    return updated_api_code
+    return legacy_api_code
+
+def legacy_verse_lookup():
+    """The getVerseText older pages carry, which caches only finished lookups by reference."""
+    
+    return """    /**
+     * Get verse text with API fallback chain
+     */
+    async function getVerseText(reference) {
+        // Check cache first
+        if (apiCache.has(reference)) {
+            return apiCache.get(reference);
+        }
+        
+        // Try ESV API first
+        let result = await fetchFromESV(reference);
+        
+        // Fallback to API.Bible
+        if (!result) {
+            result = await fetchFromAPIBible(reference);
+        }
+        
+        // Final fallback to placeholder
+        if (!result) {
+            result = {
+                text: 'API key required for live verse preview. Click link to view verse on ESV.org',
+                version: 'Info',
+                success: false
+            };
+        }
+        
+        // Cache result
+        apiCache.set(reference, result);
+        return result;
+    }
+    
+"""
+
+def legacy_api_bible_lookup():
+    """The API.Bible lookup older pages carry, which maps only eight books."""
+    
+    return """    /**
+     * Fetch verse text from API.Bible
+     */
+    async function fetchFromAPIBible(reference) {
+        if (!API_CONFIG.apiBible.enabled || !API_CONFIG.apiBible.key || API_CONFIG.apiBible.key === 'YOUR_API_BIBLE_KEY_HERE') {
+            return null;
+        }
+        
+        try {
+            // Convert reference to API format (e.g., "John 3:16" -> "JHN.3.16")
+            const normalized = normalizeReferenceForAPI(reference);
+            if (!normalized) return null;
+            
+            const url = `${API_CONFIG.apiBible.baseUrl}${API_CONFIG.apiBible.bibleId}/passages/${normalized}`;
+            
+            const response = await fetch(url, {
+                headers: {
+                    'api-key': API_CONFIG.apiBible.key
+                }
+            });
+            
+            if (!response.ok) throw new Error('API.Bible error');
+            
+            const data = await response.json();
+            return {
+                text: data.data?.content?.replace(/<[^>]+>/g, '').trim() || 'Verse not found',
+                version: 'KJV',
+                success: true
+            };
+        } catch (error) {
+            console.warn('API.Bible fetch failed:', error);
+            return null;
+        }
+    }
+    
+    /**
+     * Normalize reference for API.Bible format
+     */
+    function normalizeReferenceForAPI(reference) {
+        // This is a simplified version - would need full book name mapping
+        const bookMap = {
+            'Gen': 'GEN', 'Exod': 'EXO', 'Matt': 'MAT', 'John': 'JHN',
+            'Rom': 'ROM', 'Eph': 'EPH', '1 Cor': '1CO', '2 Cor': '2CO',
+            // Add more mappings as needed
+        };
+        
+        const match = reference.match(/^([^0-9]+)\\s*(\\d+):(\\d+)/);
+        if (!match) return null;
+        
+        const book = match[1].trim();
+        const chapter = match[2];
+        const verse = match[3];
+        
+        const bookCode = bookMap[book];
+        if (!bookCode) return null;
+        
+        return `${bookCode}.${chapter}.${verse}`;
+    }
+    
+"""
 
 def process_file(file_path):
     """Add rate limiting to a publish file."""
@@ -487,7 +848,14 @@ def process_file(file_path):
         content = f.read()
     
     # Add rate limiting code before API configuration
-    if 'ESV API Rate Limiting & Bot Protection' not in content:
+    rate_limiting_marker = 'ESV API Rate Limiting & Bot Protection'
+    if rate_limiting_marker in content and add_rate_limiting().strip() not in content:
+        # Older copy: replace it with the current one
+        start = content.rfind('<script>', 0, content.index(rate_limiting_marker))
+        end = content.index('</script>', start) + len('</script>')
+        content = content[:start] + add_rate_limiting().strip() + content[end:]
+        print('   ✓ Updated rate limiting and verse cache')
+    elif rate_limiting_marker not in content:
         # Find the Bible API Configuration section
         api_config_marker = '// Bible API Configuration'
         if api_config_marker in content:
@@ -500,10 +868,10 @@ def process_file(file_path):
         else:
             print('   ⚠ Bible API Configuration section not found')
             return False
-        
-        # Update fetchFromESV to use rate limiter
-        if 'async function fetchFromESV(reference)' in content:
-            old_fetch = '''    async function fetchFromESV(reference) {
+    
+    # Older pages fetch each reference separately; switch them to batched requests
+    if 'function queuePassage(' not in content:
+        old_fetches = [legacy_rate_limited_fetch(), '''    async function fetchFromESV(reference) {
         if (!API_CONFIG.esv.enabled || !API_CONFIG.esv.key || API_CONFIG.esv.key === 'YOUR_ESV_API_KEY_HERE') {
             return null;
         }
@@ -536,11 +904,25 @@ def process_file(file_path):
             console.warn('ESV API fetch failed:', error);
             return null;
         }
-    }'''
-            
-            new_fetch = update_api_functions()
-            content = content.replace(old_fetch, new_fetch)
-            print('   ✓ Updated ESV API function with rate limiting')
+    }''']
+        for old_fetch in old_fetches:
+            if old_fetch in content:
+                content = content.replace(old_fetch, update_api_functions())
+                print('   ✓ Updated ESV API function to batched, rate-limited requests')
+                break
+    
+    # Share lookups of the same passage while they are in flight
+    if legacy_verse_lookup() in content:
+        content = content.replace(legacy_verse_lookup(), verse_lookup_script())
+        print('   ✓ Updated verse lookups to share in-flight requests')
+    
+    # API.Bible fallback: passage IDs on the links and the full book-code table
+    if legacy_api_bible_lookup() in content:
+        content = content.replace(legacy_api_bible_lookup(), api_bible_script())
+        print('   ✓ Updated API.Bible lookups to use passage IDs')
+    content, stamped = stamp_passage_ids(content)
+    if stamped:
+        print(f'   ✓ Added API.Bible passage IDs to {stamped} scripture links')
     
     # Write updated content
     with open(file_path, 'w', encoding='utf-8') as f:
@@ -607,7 +989,8 @@ def main():
     print("  ✓ Automatic verse caching (max 500)")
     print("  ✓ Bot detection & blocking")
     print("  ✓ Rapid-fire request prevention")
-    print("  ✓ localStorage state persistence")
+    print("  ✓ Shared in-flight lookups for the same passage")
+    print("  ✓ IndexedDB state persistence (localStorage fallback)")
     print("  ✓ Automatic cache cleanup (30 days)")
     print("  ✓ User-friendly error messages")
     print("  ✓ Console monitoring tools")
@@ -3,88 +3,265 @@
 Add Live Bible API Integration
 Integrates ESV API for real verse text retrieval in tooltips.
 Includes fallback to API.Bible as alternative.
+
+ESV lookups are batched: references requested within a short window go out
+as one passage request (q=ref1;ref2;...) of at most 500 verses.
+
+Each scripture link is stamped with its API.Bible passage ID
+(data-passage-id="ROM.8.28-ROM.8.30") when the page is built, so fallback
+lookups need no parsing in the browser.
 """
 
+import html
+import json
+import re
+
 from bs4 import BeautifulSoup
 
-def add_bible_api_script():
-    """Generate JavaScript for live Bible API integration."""
+from generate_scripture_index import CANONICAL_BOOKS, book_number_lookup
+from verse_store import ESV_MAX_VERSES, USFM_BOOK_CODES
+from versification import CHAPTER_VERSES, url_passage
+
+# How long (ms) references are collected before a batched ESV request is sent
+ESV_BATCH_WINDOW_MS = 40
+
+# Opening tags of scripture links, which get a data-passage-id attribute
+SCRIPTURE_LINK_TAG = re.compile(r'<a\b[^>]*\bhref="([^"]*(?:esv\.org/|biblegateway)[^"]*)"[^>]*>')
+
+def passage_id(passage):
+    """
+    API.Bible passage ID for a (book, start, end) verse range, as
+    normalizeReferenceForAPI() builds it: 'ROM.8.28' or 'ROM.8.28-ROM.9.2'.
+    """
+    book, start, end = passage
+    code = USFM_BOOK_CODES[CANONICAL_BOOKS.index(book)]
+    part = lambda vid: f"{code}.{(vid // 1000) % 1000}.{vid % 1000}"
+    return part(start) if start == end else f"{part(start)}-{part(end)}"
+
+def stamp_passage_ids(content):
+    """
+    Add data-passage-id to every scripture link that lacks one; returns
+    (content, links stamped). Links whose reference does not parse are left
+    for the page to convert.
+    """
+    stamped = 0
     
-    return """
-<script>
-(function() {
-    // Bible API Configuration
-    // To use ESV API: Get free key from https://api.esv.org/
-    // To use API.Bible: Get free key from https://scripture.api.bible/
+    def stamp(match):
+        nonlocal stamped
+        tag = match.group(0)
+        passage = url_passage(html.unescape(match.group(1)))
+        if 'data-passage-id=' in tag or not passage:
+            return tag
+        stamped += 1
+        # Before the closing '>' or '/>'
+        end = len(tag) - (2 if tag.endswith('/>') else 1)
+        return f'{tag[:end].rstrip()} data-passage-id="{passage_id(passage)}"{tag[end:]}'
     
-    const API_CONFIG = {
-        // ESV API (preferred)
-        esv: {
-            enabled: false, // Set to true when you have an API key
-            key: 'YOUR_ESV_API_KEY_HERE', // Get from https://api.esv.org/
-            baseUrl: 'https://api.esv.org/v3/passage/text/'
-        },
-        // API.Bible (fallback)
-        apiBible: {
-            enabled: false, // Set to true when you have an API key
-            key: 'YOUR_API_BIBLE_KEY_HERE', // Get from https://scripture.api.bible/
-            bibleId: 'de4e12af7f28f599-02', // KJV Bible ID
-            baseUrl: 'https://api.scripture.api.bible/v1/bibles/'
-        }
+    return SCRIPTURE_LINK_TAG.sub(stamp, content), stamped
+
+def esv_batch_script():
+    """
+    JavaScript for batched ESV lookups: fetchFromESV queues the reference, and
+    references queued within the batch window are sent as one q=ref1;ref2;...
+    request, packed so no request exceeds ESV_MAX_VERSES verses. Each caller
+    gets back the passages whose verse range (the response's 'parsed' field)
+    overlaps its own. The HTTP request goes through
+    window.makeProtectedBatchRequest when the rate limiter is on the page.
+    """
+    
+    chapter_verses = [CHAPTER_VERSES[book] for book in CANONICAL_BOOKS]
+    
+    return """
+    // ============================================================
+    // Batched ESV passage requests
+    // ============================================================
+    const ESV_BATCH = {
+        windowMs: """ + str(ESV_BATCH_WINDOW_MS) + """,
+        maxVerses: """ + str(ESV_MAX_VERSES) + """  // ESV: max 500 verses per query
     };
+    // Lowercased book names and abbreviations -> book number
+    const ESV_BOOK_NUMBERS = """ + json.dumps(book_number_lookup(), separators=(',', ':')) + """;
+    // Verses per chapter for each book, in canonical order
+    const ESV_CHAPTER_VERSES = """ + json.dumps(chapter_verses, separators=(',', ':')) + """;
     
-    // Cache for API responses
-    const apiCache = new Map();
+    let pendingPassages = [];
+    let passageTimer = null;
     
     /**
-     * Fetch verse text from ESV API
+     * Verse range of a reference as BBCCCVVV IDs plus its verse count, or null
      */
-    async function fetchFromESV(reference) {
-        if (!API_CONFIG.esv.enabled || !API_CONFIG.esv.key || API_CONFIG.esv.key === 'YOUR_ESV_API_KEY_HERE') {
-            return null;
+    function passageRange(reference) {
+        const match = reference.match(/^\\s*([123]?\\s*[A-Za-z][A-Za-z .]*?)\\.?\\s+(\\d+)(?::(\\d+))?(?:\\s*[-–—]\\s*(\\d+)(?::(\\d+))?)?/);
+        if (!match) return null;
+        const book = ESV_BOOK_NUMBERS[match[1].replace(/\\s+/g, ' ').toLowerCase()];
+        const chapters = book && ESV_CHAPTER_VERSES[book - 1];
+        const chapter = parseInt(match[2], 10);
+        if (!chapters || !chapters[chapter - 1]) return null;
+        
+        const startVerse = match[3] ? parseInt(match[3], 10) : 1;
+        let endChapter = chapter;
+        let endVerse;
+        if (match[5]) {
+            endChapter = parseInt(match[4], 10);
+            endVerse = parseInt(match[5], 10);
+        } else if (match[4] && !match[3]) {
+            endChapter = parseInt(match[4], 10);
+            endVerse = chapters[endChapter - 1];
+        } else {
+            endVerse = match[4] ? parseInt(match[4], 10) : (match[3] ? startVerse : chapters[chapter - 1]);
+        }
+        endChapter = Math.min(Math.max(endChapter, chapter), chapters.length);
+        
+        let verses = 0;
+        for (let c = chapter; c <= endChapter; c++) {
+            const first = c === chapter ? startVerse : 1;
+            const last = c === endChapter ? Math.min(endVerse, chapters[c - 1]) : chapters[c - 1];
+            verses += Math.max(last - first + 1, 0);
+        }
+        return {
+            start: book * 1000000 + chapter * 1000 + startVerse,
+            end: book * 1000000 + endChapter * 1000 + endVerse,
+            verses: Math.max(verses, 1)
+        };
+    }
+    // The rate limiter's verse cache counts cached verses with it
+    window.esvPassageRange = passageRange;
+    
+    /**
+     * One ESV request for several references; results are in reference order
+     */
+    async function fetchESVPassages(references) {
+        const url = API_CONFIG.esv.baseUrl + '?' + new URLSearchParams({
+            q: references.join(';'),
+            'include-headings': 'false',
+            'include-footnotes': 'false',
+            'include-verse-numbers': 'false',
+            'include-short-copyright': 'false',
+            'include-passage-references': 'false'
+        });
+        
+        const response = await fetch(url, {
+            headers: {
+                'Authorization': `Token ${API_CONFIG.esv.key}`
+            }
+        });
+        
+        if (!response.ok) {
+            throw new Error(response.status === 429 ? 'Rate limit exceeded' : 'ESV API error');
         }
         
+        const data = await response.json();
+        const passages = data.passages || [];
+        const parsed = data.parsed || [];
+        
+        return references.map((reference, i) => {
+            let texts;
+            const range = passageRange(reference);
+            if (references.length === 1) {
+                texts = passages;
+            } else if (range && parsed.length === passages.length) {
+                // The passage parsed as exactly this range, else those overlapping it
+                const exact = passages.findIndex((_, j) => parsed[j][0] === range.start && parsed[j][1] === range.end);
+                texts = exact >= 0
+                    ? [passages[exact]]
+                    : passages.filter((_, j) => parsed[j][0] <= range.end && parsed[j][1] >= range.start);
+            } else {
+                texts = passages.length === references.length ? [passages[i]] : [];
+            }
+            const text = texts.map(t => t.trim()).filter(Boolean).join(' ');
+            return text ? { text: text, version: 'ESV', success: true } : null;
+        });
+    }
+    
+    async function sendPassageBatch(batch) {
+        const references = batch.map(item => item.reference);
+        let results;
         try {
-            const url = API_CONFIG.esv.baseUrl + '?' + new URLSearchParams({
-                q: reference,
-                'include-headings': 'false',
-                'include-footnotes': 'false',
-                'include-verse-numbers': 'false',
-                'include-short-copyright': 'false',
-                'include-passage-references': 'false'
-            });
-            
-            const response = await fetch(url, {
-                headers: {
-                    'Authorization': `Token ${API_CONFIG.esv.key}`
-                }
-            });
-            
-            if (!response.ok) throw new Error('ESV API error');
-            
-            const data = await response.json();
-            return {
-                text: data.passages[0]?.trim() || 'Verse not found',
-                version: 'ESV',
-                success: true
-            };
+            results = window.makeProtectedBatchRequest
+                ? await window.makeProtectedBatchRequest(references, fetchESVPassages)
+                : await fetchESVPassages(references);
         } catch (error) {
             console.warn('ESV API fetch failed:', error);
+            // Marked as an error so the lookup is not cached
+            results = references.map(() => ({
+                text: 'Failed to fetch verse. Please try again later.',
+                version: 'Error',
+                success: false,
+                error: error.message
+            }));
+        }
+        batch.forEach((item, i) => item.resolve(results[i] || null));
+    }
+    
+    /**
+     * Send everything queued, packed into requests of at most ESV_BATCH.maxVerses
+     */
+    function flushPassages() {
+        clearTimeout(passageTimer);
+        passageTimer = null;
+        const pending = pendingPassages;
+        pendingPassages = [];
+        
+        let batch = [];
+        let verses = 0;
+        for (const item of pending) {
+            if (batch.length && verses + item.verses > ESV_BATCH.maxVerses) {
+                sendPassageBatch(batch);
+                batch = [];
+                verses = 0;
+            }
+            batch.push(item);
+            verses += item.verses;
+        }
+        if (batch.length) sendPassageBatch(batch);
+    }
+    
+    function queuePassage(reference) {
+        return new Promise(resolve => {
+            const range = passageRange(reference);
+            // Unparsed references are sent on their own
+            pendingPassages.push({ reference, resolve, verses: range ? range.verses : ESV_BATCH.maxVerses });
+            
+            const queued = pendingPassages.reduce((sum, item) => sum + item.verses, 0);
+            if (queued >= ESV_BATCH.maxVerses) {
+                flushPassages();
+            } else if (!passageTimer) {
+                passageTimer = setTimeout(flushPassages, ESV_BATCH.windowMs);
+            }
+        });
+    }
+    
+    /**
+     * Fetch verse text from ESV API (batched with other pending lookups)
+     */
+    async function fetchFromESV(reference) {
+        if (!API_CONFIG.esv.enabled || !API_CONFIG.esv.key || API_CONFIG.esv.key === 'YOUR_ESV_API_KEY_HERE') {
             return null;
         }
+        return queuePassage(reference);
     }
+"""
+
+def api_bible_script():
+    """
+    JavaScript API.Bible lookup. Links carry their passage ID from the build;
+    other references are converted with the full USFM book-code table.
+    """
+    
+    return """    // USFM book codes in canonical order, as API.Bible passage IDs use
+    const API_BIBLE_BOOK_CODES = """ + json.dumps(USFM_BOOK_CODES, separators=(',', ':')) + """;
     
     /**
      * Fetch verse text from API.Bible
      */
-    async function fetchFromAPIBible(reference) {
+    async function fetchFromAPIBible(reference, passageId) {
         if (!API_CONFIG.apiBible.enabled || !API_CONFIG.apiBible.key || API_CONFIG.apiBible.key === 'YOUR_API_BIBLE_KEY_HERE') {
             return null;
         }
         
         try {
-            // Convert reference to API format (e.g., "John 3:16" -> "JHN.3.16")
-            const normalized = normalizeReferenceForAPI(reference);
+            // Passage ID stamped on the link (e.g. "JHN.3.16"), else converted here
+            const normalized = passageId || normalizeReferenceForAPI(reference);
             if (!normalized) return null;
             
             const url = `${API_CONFIG.apiBible.baseUrl}${API_CONFIG.apiBible.bibleId}/passages/${normalized}`;
@@ -105,49 +282,55 @@ def add_bible_api_script():
             };
         } catch (error) {
             console.warn('API.Bible fetch failed:', error);
-            return null;
+            return {
+                text: 'Failed to fetch verse. Please try again later.',
+                version: 'Error',
+                success: false,
+                error: error.message
+            };
         }
     }
     
     /**
-     * Normalize reference for API.Bible format
+     * Normalize reference for API.Bible format ("Romans 8:28-30" -> "ROM.8.28-ROM.8.30")
      */
     function normalizeReferenceForAPI(reference) {
-        // This is a simplified version - would need full book name mapping
-        const bookMap = {
-            'Gen': 'GEN', 'Exod': 'EXO', 'Matt': 'MAT', 'John': 'JHN',
-            'Rom': 'ROM', 'Eph': 'EPH', '1 Cor': '1CO', '2 Cor': '2CO',
-            // Add more mappings as needed
-        };
-        
-        const match = reference.match(/^([^0-9]+)\\s*(\\d+):(\\d+)/);
-        if (!match) return null;
-        
-        const book = match[1].trim();
-        const chapter = match[2];
-        const verse = match[3];
-        
-        const bookCode = bookMap[book];
-        if (!bookCode) return null;
+        const range = passageRange(reference);
+        if (!range) return null;
         
-        return `${bookCode}.${chapter}.${verse}`;
+        const code = API_BIBLE_BOOK_CODES[Math.floor(range.start / 1000000) - 1];
+        const part = id => `${code}.${Math.floor(id / 1000) % 1000}.${id % 1000}`;
+        return range.start === range.end ? part(range.start) : `${part(range.start)}-${part(range.end)}`;
     }
     
-    /**
-     * Get verse text with API fallback chain
+"""
+
+def verse_lookup_script():
+    """
+    JavaScript getVerseText: ESV, then API.Bible, then a placeholder. Lookups
+    are shared by canonical verse range while in flight and afterwards, so
+    "Rom 8:1" and "Romans 8:1" hovered together make one request.
+    """
+    
+    return """    /**
+     * Cache key for a reference: its verse range when it parses, so spellings
+     * of the same passage share one entry
      */
-    async function getVerseText(reference) {
-        // Check cache first
-        if (apiCache.has(reference)) {
-            return apiCache.get(reference);
-        }
-        
+    function lookupKey(reference) {
+        const range = passageRange(reference);
+        return range ? range.start + '-' + range.end : reference.trim().toLowerCase();
+    }
+    
+    async function lookupVerseText(reference, passageId) {
         // Try ESV API first
         let result = await fetchFromESV(reference);
         
-        // Fallback to API.Bible
-        if (!result) {
-            result = await fetchFromAPIBible(reference);
+        // Fallback to API.Bible, also when the ESV request failed
+        if (!result || result.error) {
+            const fallback = await fetchFromAPIBible(reference, passageId);
+            if (fallback && (fallback.success || !result)) {
+                result = fallback;
+            }
         }
         
         // Final fallback to placeholder
@@ -158,25 +341,93 @@ def add_bible_api_script():
                 success: false
             };
         }
-        
-        // Cache result
-        apiCache.set(reference, result);
         return result;
     }
     
     /**
+     * Get verse text with API fallback chain
+     */
+    function getVerseText(reference, passageId) {
+        // The pending lookup is cached too, so concurrent calls share it
+        const key = lookupKey(reference);
+        if (!apiCache.has(key)) {
+            const lookup = lookupVerseText(reference, passageId).then(result => {
+                // Failures (rate limiting, network errors) are temporary; look again next time
+                if (result.error && apiCache.get(key) === lookup) {
+                    apiCache.delete(key);
+                }
+                return result;
+            });
+            apiCache.set(key, lookup);
+        }
+        return apiCache.get(key);
+    }
+    
+"""
+
+def verse_tooltip_override_script():
+    """JavaScript wrapping the preview's window.getVerseText with the live API lookup."""
+    
+    return """        // Override existing getVerseText function
+        const originalGetVerseText = window.getVerseText;
+        window.getVerseText = async function(reference, passageId) {
+            const result = await getVerseText(reference, passageId);
+            // Without live text (no key, rate limited) use the page's own lookup
+            if (!result.success) {
+                return originalGetVerseText(reference);
+            }
+            return { ...result, reference: `${reference} (${result.version})` };
+        };
+"""
+
+def legacy_verse_tooltip_override():
+    """The override older pages carry, which drops passage IDs and the page's own lookup."""
+    
+    return """        // Override existing getVerseText function
+        const originalGetVerseText = window.getVerseText;
+        window.getVerseText = async function(reference) {
+            return await getVerseText(reference);
+        };
+"""
+
+def add_bible_api_script():
+    """Generate JavaScript for live Bible API integration."""
+    
+    return """
+<script>
+(function() {
+    // Bible API Configuration
+    // To use ESV API: Get free key from https://api.esv.org/
+    // To use API.Bible: Get free key from https://scripture.api.bible/
+    
+    const API_CONFIG = {
+        // ESV API (preferred)
+        esv: {
+            enabled: false, // Set to true when you have an API key
+            key: 'YOUR_ESV_API_KEY_HERE', // Get from https://api.esv.org/
+            baseUrl: 'https://api.esv.org/v3/passage/text/'
+        },
+        // API.Bible (fallback)
+        apiBible: {
+            enabled: false, // Set to true when you have an API key
+            key: 'YOUR_API_BIBLE_KEY_HERE', // Get from https://scripture.api.bible/
+            bibleId: 'de4e12af7f28f599-02', // KJV Bible ID
+            baseUrl: 'https://api.scripture.api.bible/v1/bibles/'
+        }
+    };
+    
+    // Cache for API responses (and lookups still in flight), by lookupKey()
+    const apiCache = new Map();
+""" + esv_batch_script() + """
+    
+""" + api_bible_script() + """""" + verse_lookup_script() + """    /**
      * Update existing verse tooltip system with API
      */
     if (typeof window.getVerseText === 'undefined') {
         // No existing tooltip system, create one
         console.log('⚠ Verse tooltip system not found. Run add_verse_preview.py first');
     } else {
-        // Override existing getVerseText function
-        const originalGetVerseText = window.getVerseText;
-        window.getVerseText = async function(reference) {
-            return await getVerseText(reference);
-        };
-        console.log('✓ Live Bible API integrated with verse tooltips');
+""" + verse_tooltip_override_script() + """        console.log('✓ Live Bible API integrated with verse tooltips');
     }
     
     // Expose API configuration for easy updates
@@ -229,9 +480,17 @@ def add_bible_api(html_file, output_file):
     with open(html_file, 'r', encoding='utf-8') as f:
         content = f.read()
     
+    # API.Bible passage IDs, worked out once here rather than per lookup
+    content, stamped = stamp_passage_ids(content)
+    if stamped:
+        print(f"✓ Added API.Bible passage IDs to {stamped} scripture links")
+    
     # Check if already exists
     if 'BIBLE_API_CONFIG' in content:
         print(f"ℹ Bible API already exists in {html_file}")
+        if stamped:
+            with open(output_file, 'w', encoding='utf-8') as f:
+                f.write(content)
         return
     
     # Find the last closing div and insert before it
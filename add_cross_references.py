@@ -6,19 +6,79 @@ Analyzes scripture relationships to suggest related verses and doctrines.
 
 from bs4 import BeautifulSoup
 from collections import defaultdict
+import numpy as np
+from scipy import sparse
+from scipy.sparse import csgraph
+import heapq
+import json
 import re
+import sys
+from xml.sax.saxutils import escape, quoteattr
 
-def extract_verse_relationships(html_file):
-    """Extract relationships between verses based on co-occurrence in doctrines."""
+from generate_scripture_index import BOOK_NUMBERS, CANONICAL_BOOKS, book_number_lookup, split_verse_id
+from versification import CHAPTER_VERSES, parse_passage, url_passage
+
+SCORING_MODES = ('count', 'proximity', 'pmi', 'jaccard', 'cosine')
+
+# Outline items / paragraphs used as the unit of distance between citations
+BLOCK_TAGS = ['li', 'p', 'blockquote', 'h3', 'h4', 'td']
+PROXIMITY_WINDOW = 3
+FAR_PAIR_WEIGHT = 0.1
+
+# Asset path written by main() and the URL the page fetches it from
+CROSS_REF_DATA_FILE = 'Doctrines/cross_references.json'
+CROSS_REF_DATA_URL = '/cross_references.json'
+
+# Verse graph exports for offline exploration
+CROSS_REF_GRAPHML_FILE = 'Doctrines/cross_references.graphml'
+CROSS_REF_EDGES_FILE = 'Doctrines/cross_references_edges.tsv'
+HUB_COUNT = 20
+
+def passage_range(reference):
+    """(start verse ID, end verse ID) for a reference, read as versification.parse_passage does, or None."""
+    passage = parse_passage(reference)
+    return passage[1:] if passage else None
+
+def format_reference(verse_range):
+    """Display label for a (start, end) verse ID range, e.g. 'Romans 8:28–30', 'Romans 8' or 'Romans 8:28–9:2'."""
+    start, end = verse_range
+    book, chapter, verse_start = split_verse_id(start)
+    end_chapter, verse_end = split_verse_id(end)[1:]
+    if verse_start == 1 and verse_end == CHAPTER_VERSES[book][end_chapter - 1]:
+        return f"{book} {chapter}" if end_chapter == chapter else f"{book} {chapter}–{end_chapter}"
+    if end_chapter != chapter:
+        return f"{book} {chapter}:{verse_start}–{end_chapter}:{verse_end}"
+    if verse_end != verse_start:
+        return f"{book} {chapter}:{verse_start}–{verse_end}"
+    return f"{book} {chapter}:{verse_start}"
+
+def range_key(verse_range):
+    """JSON key for a verse range: 'start' for one verse, 'start-end' otherwise."""
+    start, end = verse_range
+    return str(start) if start == end else f"{start}-{end}"
+
+def url_reference(href):
+    """Verse range named by an esv.org or biblegateway URL, or None."""
+    passage = url_passage(href)
+    return passage[1:] if passage else None
+
+def link_reference(link):
+    """Verse range a scripture link points to, read from its URL."""
+    return url_reference(link.get('href', ''))
+
+def extract_section_verses(html_file):
+    """
+    Return [(doctrine_name, [(start verse ID, end verse ID), ...], [position, ...]), ...]
+    with one entry per doctrine section. A citation's position is the index of
+    the outline item or paragraph containing it, in document order.
+    """
     
     with open(html_file, 'r', encoding='utf-8') as f:
         content = f.read()
     
     soup = BeautifulSoup(f'<html><body>{content}</body></html>', 'html.parser')
     
-    # Track which verses appear together
-    verse_co_occurrence = defaultdict(lambda: defaultdict(int))
-    verse_to_doctrines = defaultdict(set)
+    section_verses = []
     
     sections = soup.find_all('section', id=True)
     
@@ -26,71 +86,456 @@ def extract_verse_relationships(html_file):
         h2 = section.find('h2')
         doctrine_name = h2.get_text(strip=True) if h2 else "Unknown"
         
+        # Number the section's outline items / paragraphs for proximity
+        blocks = {id(block): i for i, block in enumerate(section.find_all(BLOCK_TAGS))}
+        
         # Find all scripture references in this doctrine
         links = section.find_all('a', href=True)
         verses_in_doctrine = []
+        positions = []
         
         for link in links:
             href = link.get('href', '')
             if 'esv.org' in href or 'biblegateway' in href:
-                verse_ref = link.get_text(strip=True)
+                verse_range = link_reference(link)
                 
-                # Skip bare numbers - they need context
-                if verse_ref.isdigit():
-                    # Try to get book and chapter from previous sibling text
-                    prev_text = ''
-                    for sibling in link.previous_siblings:
-                        if isinstance(sibling, str):
-                            prev_text = sibling + prev_text
-                        else:
-                            break
+                # Fall back to the link text when the URL can't be parsed
+                if verse_range is None:
+                    verse_ref = link.get_text(strip=True)
                     
-                    # Look for pattern like "Book Chapter:" before the number
-                    match = re.search(r'([1-3]?\s*[A-Za-z]+\.?\s+\d+):?\s*$', prev_text)
-                    if match:
-                        book_chapter = match.group(1).strip()
-                        verse_ref = f"{book_chapter}:{verse_ref}"
-                    else:
-                        # Can't determine context, skip this reference
+                    # Bare numbers need context
+                    if verse_ref.isdigit():
+                        # Try to get book and chapter from previous sibling text
+                        prev_text = ''
+                        for sibling in link.previous_siblings:
+                            if isinstance(sibling, str):
+                                prev_text = sibling + prev_text
+                            else:
+                                break
+                        
+                        # Look for pattern like "Book Chapter:" before the number
+                        match = re.search(r'([1-3]?\s*[A-Za-z]+\.?\s+\d+):?\s*$', prev_text)
+                        if not match:
+                            # Can't determine context, skip this reference
+                            continue
+                        verse_ref = f"{match.group(1).strip()}:{verse_ref}"
+                    
+                    verse_range = passage_range(verse_ref)
+                    if verse_range is None:
                         continue
                 
-                verses_in_doctrine.append(verse_ref)
-                verse_to_doctrines[verse_ref].add(doctrine_name)
+                verses_in_doctrine.append(verse_range)
+                positions.append(blocks.get(id(link.find_parent(BLOCK_TAGS)), 0))
         
-        # Record co-occurrences
-        for i, verse1 in enumerate(verses_in_doctrine):
-            for verse2 in verses_in_doctrine[i+1:]:
-                verse_co_occurrence[verse1][verse2] += 1
-                verse_co_occurrence[verse2][verse1] += 1
+        section_verses.append((doctrine_name, verses_in_doctrine, positions))
     
-    return verse_co_occurrence, verse_to_doctrines
+    return section_verses
 
-def generate_cross_references(verse_co_occurrence, min_occurrences=2):
-    """Generate cross-reference suggestions."""
-    
-    cross_refs = {}
+def build_incidence_matrix(section_verses):
+    """
+    Build a sparse section x verse incidence matrix.
+    Entry (s, v) counts how often verse v is cited in section s.
+    Returns (matrix, verse labels in column order).
+    """
+    verse_index = {}
+    rows = []
+    cols = []
+    
+    for row, (doctrine_name, verses, positions) in enumerate(section_verses):
+        for verse in verses:
+            rows.append(row)
+            cols.append(verse_index.setdefault(verse, len(verse_index)))
+    
+    # Duplicate (row, col) pairs are summed into citation counts
+    incidence = sparse.csr_matrix(
+        (np.ones(len(rows), dtype=np.int32), (rows, cols)),
+        shape=(len(section_verses), len(verse_index))
+    )
+    return incidence, list(verse_index)
+
+def proximity_matrix(section_verses, incidence, verses, window=PROXIMITY_WINDOW, far_weight=FAR_PAIR_WEIGHT):
+    """
+    Verse x verse co-citation weights that decay with distance inside a section.
+    
+    Citations up to `window` outline items apart weigh 1 / (1 + distance). The
+    citations are first counted per outline item in a sparse block x verse
+    matrix, with a gap of `window` empty rows between sections; the pairs at
+    distance d are then one product of that matrix with itself shifted by d
+    rows, so the work is window + 1 sparse products rather than a loop over
+    citation pairs. Every other same-section pair keeps far_weight, added for
+    all pairs at once through the incidence product. The diagonal is kept (a
+    citation paired with itself) so range expansion can spread it;
+    relatedness_scores clears it afterwards.
+    """
+    verse_index = {verse: i for i, verse in enumerate(verses)}
+    rows, cols = [], []
+    offset = 0
+    
+    for doctrine_name, cited, positions in section_verses:
+        for verse, position in zip(cited, positions):
+            rows.append(offset + position)
+            cols.append(verse_index[verse])
+        if positions:
+            offset += max(positions) + 1 + window
+    
+    # Duplicate (block, verse) pairs are summed into citation counts
+    blocks = sparse.csr_matrix(
+        (np.ones(len(rows)), (rows, cols)),
+        shape=(offset, len(verses))
+    )
+    
+    near = sparse.csr_matrix((len(verses), len(verses)))
+    for distance in range(min(window, offset - 1) + 1):
+        weight = 1 / (1 + distance) - far_weight
+        if weight <= 0:
+            break
+        pairs = blocks[:offset - distance].T @ blocks[distance:]
+        near = near + weight * (pairs if distance == 0 else pairs + pairs.T)
+    
+    return (near + far_weight * (incidence.T @ incidence)).tocsr()
+
+def overlapping_ranges(ranges):
+    """
+    Index pairs (i, j), i < j, of verse ranges that overlap or contain one another.
+    Sweeps the ranges in start order with a min-heap of active end points, so the
+    cost is O(n log n + overlapping pairs) instead of comparing every pair.
+    """
+    order = sorted(range(len(ranges)), key=lambda i: ranges[i])
+    active = []  # (end, index) of ranges that may still overlap later starts
+    pairs = []
+    
+    for i in order:
+        start, end = ranges[i]
+        while active and active[0][0] < start:
+            heapq.heappop(active)
+        pairs.extend((min(i, j), max(i, j)) for _, j in active)
+        heapq.heappush(active, (end, i))
+    
+    return pairs
+
+def overlap_matrix(ranges):
+    """Symmetric sparse 0/1 matrix marking overlapping (or containing) verse ranges."""
+    pairs = overlapping_ranges(ranges)
+    rows = [i for i, j in pairs] + [j for i, j in pairs]
+    cols = [j for i, j in pairs] + [i for i, j in pairs]
+    return sparse.csr_matrix(
+        (np.ones(len(rows), dtype=np.int32), (rows, cols)),
+        shape=(len(ranges), len(ranges))
+    )
+
+def expand_incidence(incidence, ranges):
+    """
+    Range-aware incidence: a citation also counts for every range it overlaps or
+    contains (and every range containing it), so "Romans 8:28", "Romans 8:28–30"
+    and "Romans 8" share their co-citations.
+    """
+    return (incidence + incidence @ overlap_matrix(ranges)).tocsr()
+
+def expand_pairs(pair_matrix, ranges):
+    """The same range expansion applied to a verse x verse co-citation matrix."""
+    spread = sparse.identity(len(ranges), dtype=np.int32, format='csr') + overlap_matrix(ranges)
+    return (spread.T @ pair_matrix @ spread).tocsr()
+
+def co_occurrence_matrix(incidence):
+    """
+    Verse x verse co-occurrence counts as one sparse product.
+    Entry (a, b) is the number of citation pairs of a and b within the same
+    section; the diagonal (a verse paired with itself) is dropped.
+    """
+    co_occurrence = (incidence.T @ incidence).tocsr()
+    co_occurrence.setdiag(0)
+    co_occurrence.eliminate_zeros()
+    return co_occurrence
+
+def _pairwise(matrix, values):
+    """Sparse matrix with the pattern of `matrix` and data computed by values(rows, cols, data)."""
+    coo = matrix.tocoo()
+    return sparse.csr_matrix((values(coo.row, coo.col, coo.data), (coo.row, coo.col)), shape=matrix.shape)
+
+def relatedness_scores(incidence, mode='count', min_support=2, proximity=None):
+    """
+    Score every co-cited verse pair in one batch over the incidence matrix.
+    
+    count     - raw co-occurrence counts
+    proximity - co-occurrence weighted by distance within the section
+                (needs the proximity matrix from extract_verse_relationships)
+    pmi       - positive pointwise mutual information over sections
+    jaccard   - shared sections / sections citing either verse
+    cosine    - cosine similarity of TF-IDF weighted verse vectors; sections
+                citing many distinct verses carry less weight
+    
+    Pairs with fewer than min_support co-occurrences are dropped in every mode.
+    """
+    if mode not in SCORING_MODES:
+        raise ValueError(f"Unknown scoring mode: {mode} (expected one of {', '.join(SCORING_MODES)})")
+    
+    co_occurrence = co_occurrence_matrix(incidence)
+    support = co_occurrence >= min_support
+    
+    if mode == 'count':
+        scores = co_occurrence
+    elif mode == 'proximity':
+        if proximity is None:
+            raise ValueError("proximity scoring needs the proximity matrix")
+        scores = proximity.tocsr(copy=True)
+        scores.setdiag(0)
+    elif mode == 'cosine':
+        presence = (incidence > 0).astype(np.float64)
+        verses_per_section = np.asarray(presence.sum(axis=1)).ravel()
+        idf = np.log1p(incidence.shape[1] / np.maximum(verses_per_section, 1))
+        weighted = sparse.diags(idf) @ incidence.astype(np.float64)
+        norms = np.sqrt(np.asarray(weighted.multiply(weighted).sum(axis=0)).ravel())
+        scores = _pairwise(co_occurrence_matrix(weighted),
+                           lambda rows, cols, dot: dot / (norms[rows] * norms[cols]))
+    else:
+        presence = (incidence > 0).astype(np.int32)
+        shared = co_occurrence_matrix(presence)
+        sections_per_verse = np.asarray(presence.sum(axis=0)).ravel()
+        if mode == 'jaccard':
+            scores = _pairwise(shared, lambda rows, cols, both:
+                               both / (sections_per_verse[rows] + sections_per_verse[cols] - both))
+        else:
+            sections = incidence.shape[0]
+            scores = _pairwise(shared, lambda rows, cols, both: np.maximum(
+                np.log(both * sections / (sections_per_verse[rows] * sections_per_verse[cols])), 0))
+    
+    scores = scores.multiply(support).tocsr()
+    scores.eliminate_zeros()
+    return scores
+
+def extract_verse_relationships(html_file):
+    """
+    Extract relationships between verses based on co-occurrence in doctrines.
+    Returns (section x verse incidence matrix, verse labels, verse -> set of doctrines,
+    proximity-weighted verse x verse co-citation matrix).
+    """
+    section_verses = extract_section_verses(html_file)
     
-    for verse, related in verse_co_occurrence.items():
-        # Get top related verses
-        sorted_related = sorted(related.items(), key=lambda x: x[1], reverse=True)
-        # Filter by minimum occurrences
-        filtered = [(v, count) for v, count in sorted_related if count >= min_occurrences]
-        if filtered:
-            cross_refs[verse] = filtered[:5]  # Top 5 related verses
+    verse_to_doctrines = defaultdict(set)
+    for doctrine_name, verses, positions in section_verses:
+        for verse in verses:
+            verse_to_doctrines[verse].add(doctrine_name)
     
-    return cross_refs
+    incidence, verses = build_incidence_matrix(section_verses)
+    proximity = proximity_matrix(section_verses, incidence, verses)
+    return incidence, verses, verse_to_doctrines, proximity
 
-def add_cross_reference_script(cross_refs, verse_to_doctrines):
-    """Generate JavaScript for cross-reference suggestions."""
+def top_k_related(matrix, labels, k):
+    """
+    For each row of a sparse score matrix, keep the k highest stored entries.
+    Uses partial selection (argpartition) so only the kept entries are sorted.
+    Returns {label: [(related label, score), ...]}.
+    """
+    matrix = matrix.tocsr()
+    related = {}
+    
+    for row in range(matrix.shape[0]):
+        start, end = matrix.indptr[row], matrix.indptr[row + 1]
+        if start == end:
+            continue
+        scores = matrix.data[start:end]
+        cols = matrix.indices[start:end]
+        
+        if len(scores) > k:
+            top = np.argpartition(-scores, k - 1)[:k]
+            scores, cols = scores[top], cols[top]
+        
+        # Highest score first; ties in first-seen verse order
+        order = np.lexsort((cols, -scores))
+        related[labels[row]] = [(labels[c], scores[i].item()) for i, c in zip(order, cols[order])]
     
-    # Prepare data for JavaScript
-    cross_ref_data = {}
+    return related
+
+def generate_cross_references(incidence, verses, mode='count', min_occurrences=2, top_k=5,
+                              range_aware=True, proximity=None):
+    """Generate cross-reference suggestions (top related verses per verse, with scores)."""
+    if range_aware:
+        incidence = expand_incidence(incidence, verses)
+        if proximity is not None:
+            proximity = expand_pairs(proximity, verses)
+    scores = relatedness_scores(incidence, mode, min_support=min_occurrences, proximity=proximity)
+    return top_k_related(scores, verses, top_k)
+
+def verse_graph(cross_refs, verses):
+    """
+    Undirected weighted adjacency matrices of the suggested cross-references:
+    (edge if either verse lists the other, edge only if both list each other).
+    """
+    index = {verse: i for i, verse in enumerate(verses)}
+    rows, cols, weights = [], [], []
     for verse, related in cross_refs.items():
-        cross_ref_data[verse] = [{'verse': v, 'strength': count} for v, count in related]
-    
-    doctrine_data = {}
-    for verse, doctrines in verse_to_doctrines.items():
-        doctrine_data[verse] = list(doctrines)[:3]  # Top 3 doctrines
+        for other, score in related:
+            rows.append(index[verse])
+            cols.append(index[other])
+            weights.append(score)
+    directed = sparse.csr_matrix((weights, (rows, cols)), shape=(len(verses), len(verses)))
+    mutual = directed.minimum(directed.T).tocsr()
+    mutual.eliminate_zeros()
+    return directed.maximum(directed.T).tocsr(), mutual
+
+def pagerank(adjacency, damping=0.85, tolerance=1e-10, max_iterations=200):
+    """Weighted PageRank by power iteration over a sparse adjacency matrix."""
+    n = adjacency.shape[0]
+    strength = np.asarray(adjacency.sum(axis=1)).ravel()
+    dangling = strength == 0
+    transition = (sparse.diags(1 / np.where(dangling, 1, strength)) @ adjacency).T.tocsr()
+    
+    rank = np.full(n, 1 / n)
+    for _ in range(max_iterations):
+        updated = damping * (transition @ rank + rank[dangling].sum() / n) + (1 - damping) / n
+        converged = np.abs(updated - rank).sum() < tolerance
+        rank = updated
+        if converged:
+            break
+    return rank
+
+def analyze_verse_graph(cross_refs, verses, hop2_k=3):
+    """
+    Precompute graph structure so the page never traverses it:
+    connected components, PageRank centrality, degree, and each verse's strongest
+    two-hop neighbours (paths a-b-c scored by the product of edge scores, summed
+    over every b, excluding a's direct neighbours).
+    
+    Nearly every verse is reachable through the either-side graph, so clusters
+    are the connected components of the mutual-neighbour graph instead.
+    """
+    adjacency, mutual = verse_graph(cross_refs, verses)
+    component_count, components = csgraph.connected_components(mutual, directed=False)
+    rank = pagerank(adjacency)
+    degree = np.diff(adjacency.indptr)
+    
+    two_hop = (adjacency @ adjacency).tocsr()
+    two_hop = (two_hop - two_hop.multiply(adjacency > 0)).tocsr()
+    two_hop.setdiag(0)
+    two_hop.eliminate_zeros()
+    
+    # Clusters: components with at least three verses, largest first
+    sizes = np.bincount(components)
+    clusters = []
+    for component in np.argsort(-sizes, kind='stable'):
+        if sizes[component] < 3:
+            break
+        members = np.flatnonzero(components == component)
+        hubs = members[np.argsort(-rank[members], kind='stable')[:3]]
+        clusters.append({'component': int(component), 'size': int(sizes[component]),
+                         'hubs': [verses[i] for i in hubs]})
+    
+    return {
+        'adjacency': adjacency,
+        'components': components,
+        'clusters': clusters,
+        'rank': rank,
+        'degree': degree,
+        'hop2': top_k_related(two_hop, verses, hop2_k),
+        'hubs': [verses[i] for i in np.argsort(-rank, kind='stable')[:HUB_COUNT] if degree[i] > 0],
+        'labels': verses,
+    }
+
+def write_verse_graphml(verses, graph, output_path):
+    """The verse graph as undirected GraphML with score, component and centrality attributes."""
+    adjacency = sparse.triu(graph['adjacency']).tocoo()
+    lines = [
+        '<?xml version="1.0" encoding="UTF-8"?>',
+        '<graphml xmlns="http://graphml.graphdrawing.org/xmlns">',
+        '  <key id="label" for="node" attr.name="label" attr.type="string"/>',
+        '  <key id="component" for="node" attr.name="component" attr.type="int"/>',
+        '  <key id="pagerank" for="node" attr.name="pagerank" attr.type="double"/>',
+        '  <key id="degree" for="node" attr.name="degree" attr.type="int"/>',
+        '  <key id="score" for="edge" attr.name="score" attr.type="double"/>',
+        '  <graph id="cross-references" edgedefault="undirected">',
+    ]
+    for i, verse in enumerate(verses):
+        lines.append(f'    <node id={quoteattr(range_key(verse))}>')
+        lines.append(f'      <data key="label">{escape(format_reference(verse))}</data>')
+        lines.append(f'      <data key="component">{graph["components"][i]}</data>')
+        lines.append(f'      <data key="pagerank">{graph["rank"][i]:.6g}</data>')
+        lines.append(f'      <data key="degree">{graph["degree"][i]}</data>')
+        lines.append('    </node>')
+    for a, b, score in zip(adjacency.row, adjacency.col, adjacency.data):
+        lines.append(f'    <edge source={quoteattr(range_key(verses[a]))} target={quoteattr(range_key(verses[b]))}>'
+                     f'<data key="score">{score:.6g}</data></edge>')
+    lines.append('  </graph>')
+    lines.append('</graphml>')
+    
+    with open(output_path, 'w', encoding='utf-8') as f:
+        f.write('\n'.join(lines) + '\n')
+
+def write_verse_edge_list(verses, graph, output_path):
+    """Tab-separated edge list: source key, target key, source label, target label, score."""
+    adjacency = sparse.triu(graph['adjacency']).tocoo()
+    with open(output_path, 'w', encoding='utf-8') as f:
+        f.write('source\ttarget\tsource_label\ttarget_label\tscore\n')
+        for a, b, score in zip(adjacency.row, adjacency.col, adjacency.data):
+            f.write(f'{range_key(verses[a])}\t{range_key(verses[b])}\t'
+                    f'{format_reference(verses[a])}\t{format_reference(verses[b])}\t{score:.6g}\n')
+    return adjacency.nnz
+
+def build_cross_reference_data(cross_refs, verse_to_doctrines, mode='count', graph=None):
+    """
+    Compact cross-reference asset keyed by integer verse IDs ('start' or 'start-end').
+    Doctrines are stored once and referenced by index; 'books' and 'chapters'
+    (verses per chapter) let the page turn a link URL into a key without
+    shipping a parser table inline. With a graph
+    from analyze_verse_graph, entries also carry their cluster and two-hop
+    neighbours, and the asset lists clusters and hub verses.
+    """
+    # Raw counts keep fixed labels; normalized scores are labelled by quartile
+    if mode == 'count':
+        strong_threshold, related_threshold = 6, 3
+    else:
+        all_scores = [score for related_refs in cross_refs.values() for _, score in related_refs]
+        strong_threshold, related_threshold = (round(float(q), 3) for q in np.percentile(all_scores or [0], [75, 50]))
+    
+    doctrines = sorted({name for names in verse_to_doctrines.values() for name in names})
+    doctrine_index = {name: i for i, name in enumerate(doctrines)}
+    
+    books = book_number_lookup()
+    
+    verses = {}
+    for verse_range in sorted(verse_to_doctrines):
+        entry = {
+            'label': format_reference(verse_range),
+            'doctrines': sorted(doctrine_index[name] for name in verse_to_doctrines[verse_range])[:3],  # Top 3 doctrines
+        }
+        if verse_range in cross_refs:
+            entry['related'] = [[range_key(related), round(score, 3)] for related, score in cross_refs[verse_range]]
+        verses[range_key(verse_range)] = entry
+    
+    data = {
+        'format': 'cross-refs/2',
+        'mode': mode,
+        'thresholds': [strong_threshold, related_threshold],
+        'books': books,
+        'chapters': [CHAPTER_VERSES[book] for book in CANONICAL_BOOKS],
+        'doctrines': doctrines,
+        'verses': verses,
+    }
+    
+    if graph:
+        for cluster_index, cluster in enumerate(graph['clusters']):
+            for i in np.flatnonzero(graph['components'] == cluster['component']):
+                verses[range_key(graph['labels'][i])]['cluster'] = cluster_index
+        for verse_range, hop2 in graph['hop2'].items():
+            verses[range_key(verse_range)]['hop2'] = [[range_key(other), round(score, 3)] for other, score in hop2]
+        
+        index = {verse: i for i, verse in enumerate(graph['labels'])}
+        data['clusters'] = [
+            {'size': cluster['size'], 'hubs': [range_key(hub) for hub in cluster['hubs']]}
+            for cluster in graph['clusters']
+        ]
+        data['hubs'] = [
+            [range_key(hub), int(graph['degree'][index[hub]]), round(float(graph['rank'][index[hub]]), 5)]
+            for hub in graph['hubs']
+        ]
+    
+    return data
+
+def write_cross_reference_data(data, output_path):
+    with open(output_path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False, separators=(',', ':'))
+
+def add_cross_reference_script(data_url=CROSS_REF_DATA_URL):
+    """Generate JavaScript for cross-reference suggestions; the data is fetched on first use."""
     
     return f"""
 <style>
@@ -183,6 +628,18 @@ def add_cross_reference_script(cross_refs, verse_to_doctrines):
     padding: 2em;
     font-style: italic;
 }}
+.cross-ref-cluster {{
+    margin-top: 1.5em;
+    padding: 1em;
+    background: #f5f3ff;
+    border-radius: 8px;
+    font-size: 0.9em;
+    color: #4b5563;
+}}
+.cross-ref-cluster a {{
+    color: #4f46e5;
+    cursor: pointer;
+}}
 @media (max-width: 768px) {{
     .cross-ref-panel {{
         width: 100%;
@@ -210,32 +667,116 @@ def add_cross_reference_script(cross_refs, verse_to_doctrines):
 <script>
 (function() {{
     // Cross-reference data
-    const crossRefData = {cross_ref_data};
-    const doctrineData = {doctrine_data};
+    const CROSS_REF_DATA_URL = '{data_url}';
     
     const panel = document.getElementById('crossRefPanel');
     const toggle = document.getElementById('crossRefToggle');
     const close = document.getElementById('crossRefClose');
     const content = document.getElementById('crossRefContent');
     
+    let crossRefData = null;
+    let loading = null;
     let currentVerse = null;
     
+    // Fetch the cross-reference asset once, the first time it is needed
+    function loadCrossReferences() {{
+        if (!loading) {{
+            loading = fetch(CROSS_REF_DATA_URL)
+                .then(response => {{
+                    if (!response.ok) throw new Error('HTTP ' + response.status);
+                    return response.json();
+                }})
+                .then(data => {{
+                    crossRefData = data;
+                    console.log(`✓ Cross-reference data loaded for ${{Object.keys(data.verses).length}} verses`);
+                    return data;
+                }})
+                .catch(error => {{
+                    console.warn('Cross-reference data unavailable:', error);
+                    loading = null; // allow a retry
+                    return null;
+                }});
+        }}
+        return loading;
+    }}
+    
+    // "Romans 8:28-30" (or a decoded esv.org path) -> '45008028-45008030', read
+    // as versification.parse_passage reads it: a chapter-only reference spans
+    // the chapter, and ranges may cross chapters
+    function referenceKey(reference) {{
+        const match = reference.match(/^\\s*([123]?\\s*[A-Za-z][A-Za-z .]*?)\\.?\\s+(\\d+)(?::(\\d+))?(?:\\s*[-–—]\\s*(\\d+)(?::(\\d+))?)?\\s*$/);
+        if (!match) return null;
+        const book = crossRefData.books[match[1].replace(/\\s+/g, ' ').replace(/\\.$/, '').toLowerCase()];
+        const chapters = book && crossRefData.chapters[book - 1];
+        const chapter = parseInt(match[2], 10);
+        if (!chapters || !chapters[chapter - 1]) return null;
+        const clamp = (value, low, high) => Math.min(Math.max(value, low), high);
+        
+        let startVerse = match[3] ? parseInt(match[3], 10) : 1;
+        let endChapter = chapter;
+        let endVerse;
+        if (match[5]) {{
+            endChapter = parseInt(match[4], 10);
+            endVerse = parseInt(match[5], 10);
+        }} else if (match[4] && !match[3]) {{
+            endChapter = parseInt(match[4], 10);
+            endVerse = chapters[clamp(endChapter, chapter, chapters.length) - 1];
+        }} else {{
+            endVerse = match[4] ? parseInt(match[4], 10) : (match[3] ? startVerse : chapters[chapter - 1]);
+        }}
+        endChapter = clamp(endChapter, chapter, chapters.length);
+        startVerse = clamp(startVerse, 1, chapters[chapter - 1]);
+        endVerse = clamp(endVerse, 1, chapters[endChapter - 1]);
+        
+        const start = book * 1000000 + chapter * 1000 + startVerse;
+        const end = Math.max(book * 1000000 + endChapter * 1000 + endVerse, start);
+        return start === end ? String(start) : start + '-' + end;
+    }}
+    
+    function linkKey(link) {{
+        const href = link.getAttribute('href') || '';
+        if (href.includes('esv.org/')) {{
+            const path = href.split('esv.org/')[1].split('?')[0].replace(/\\+/g, ' ');
+            return referenceKey(decodeURIComponent(path).replace(/^[\\/\\s]+|[\\/\\s]+$/g, ''));
+        }}
+        const search = new URL(href, location.href).searchParams.get('search');
+        return search ? referenceKey(search) : null;
+    }}
+    
+    function doctrineNames(entry) {{
+        return entry ? (entry.doctrines || []).map(i => crossRefData.doctrines[i]) : [];
+    }}
+    
     // Toggle panel
     toggle.addEventListener('click', () => {{
         panel.classList.toggle('open');
+        loadCrossReferences();
     }});
     
     close.addEventListener('click', () => {{
         panel.classList.remove('open');
     }});
     
-    // Show cross-references for a verse
-    function showCrossReferences(verse) {{
-        currentVerse = verse;
-        const refs = crossRefData[verse];
-        const doctrines = doctrineData[verse] || [];
+    // Show cross-references for a verse key
+    async function showCrossReferences(key) {{
+        currentVerse = key;
+        if (!crossRefData) {{
+            content.innerHTML = '<div class="cross-ref-empty">Loading related verses…</div>';
+            if (!await loadCrossReferences()) {{
+                content.innerHTML = '<div class="cross-ref-empty">Related verses could not be loaded.</div>';
+                return;
+            }}
+            if (currentVerse !== key) return; // a newer request replaced this one
+        }}
         
-        if (!refs || refs.length === 0) {{
+        const entry = crossRefData.verses[key];
+        const verse = entry ? entry.label : key;
+        const refs = entry && entry.related ? entry.related : [];
+        const doctrines = doctrineNames(entry);
+        const scoreMode = crossRefData.mode;
+        const strengthThresholds = crossRefData.thresholds;
+        
+        if (refs.length === 0) {{
             content.innerHTML = `
                 <div class="cross-ref-empty">
                     <strong>${{verse}}</strong><br><br>
@@ -253,93 +794,128 @@ def add_cross_reference_script(cross_refs, verse_to_doctrines):
         
         html += '<h4 style="color: #6b7280; font-size: 0.9em; text-transform: uppercase; margin: 1em 0 0.5em 0;">Related Verses:</h4>';
         
-        refs.forEach(ref => {{
-            const relatedDoctrines = doctrineData[ref.verse] || [];
-            const strengthLabel = ref.strength > 5 ? 'Strongly related' : 
-                                 ref.strength > 2 ? 'Related' : 'Mentioned together';
+        refs.forEach(([relatedKey, strength]) => {{
+            const related = crossRefData.verses[relatedKey];
+            const relatedDoctrines = doctrineNames(related);
+            const strengthLabel = strength >= strengthThresholds[0] ? 'Strongly related' : 
+                                 strength >= strengthThresholds[1] ? 'Related' : 'Mentioned together';
+            const strengthDetail = scoreMode === 'count' ?
+                `${{strength}} connection${{strength > 1 ? 's' : ''}}` : `${{scoreMode}} ${{strength}}`;
             
             html += `
-                <div class="cross-ref-item" onclick="showCrossReferences('${{ref.verse}}')">
-                    <div class="cross-ref-verse">${{ref.verse}}</div>
-                    <div class="cross-ref-strength">${{strengthLabel}} (${{ref.strength}} connection${{ref.strength > 1 ? 's' : ''}})</div>
+                <div class="cross-ref-item" onclick="showCrossReferences('${{relatedKey}}')">
+                    <div class="cross-ref-verse">${{related ? related.label : relatedKey}}</div>
+                    <div class="cross-ref-strength">${{strengthLabel}} (${{strengthDetail}})</div>
                     ${{relatedDoctrines.length > 0 ? 
                         `<div class="cross-ref-doctrines">In: ${{relatedDoctrines.join(', ')}}</div>` : ''}}
                 </div>
             `;
         }});
         
+        // Precomputed two-hop neighbours and verse cluster
+        const hop2 = entry.hop2 || [];
+        if (hop2.length > 0) {{
+            html += '<h4 style="color: #6b7280; font-size: 0.9em; text-transform: uppercase; margin: 1.5em 0 0.5em 0;">Also Connected (2 steps):</h4>';
+            hop2.forEach(([otherKey]) => {{
+                const other = crossRefData.verses[otherKey];
+                html += `
+                    <div class="cross-ref-item" onclick="showCrossReferences('${{otherKey}}')">
+                        <div class="cross-ref-verse">${{other ? other.label : otherKey}}</div>
+                    </div>
+                `;
+            }});
+        }}
+        
+        const cluster = crossRefData.clusters && entry.cluster !== undefined ? crossRefData.clusters[entry.cluster] : null;
+        if (cluster) {{
+            const hubs = cluster.hubs.map(hubKey =>
+                `<a onclick="showCrossReferences('${{hubKey}}')">${{crossRefData.verses[hubKey].label}}</a>`).join(', ');
+            html += `<div class="cross-ref-cluster">Part of a cluster of ${{cluster.size}} closely linked verses.<br>Hub verses: ${{hubs}}</div>`;
+        }}
+        
         content.innerHTML = html;
         
         // Scroll to top of panel
         panel.scrollTop = 0;
     }}
     
-    // Add click handlers to all scripture links
-    document.addEventListener('click', (e) => {{
+    // Add click handlers to all scripture links; data loads on the first click
+    document.addEventListener('click', async (e) => {{
         const link = e.target.closest('a[href*="esv.org"], a[href*="biblegateway"]');
-        if (link) {{
-            const verse = link.textContent.trim();
-            if (crossRefData[verse]) {{
-                showCrossReferences(verse);
+        if (link && await loadCrossReferences()) {{
+            const key = linkKey(link);
+            if (key && crossRefData.verses[key]) {{
+                showCrossReferences(key);
                 panel.classList.add('open');
             }}
         }}
     }});
     
-    // Also listen for verse link hovers
-    const scriptureLinks = document.querySelectorAll('a[href*="esv.org"], a[href*="biblegateway"]');
-    scriptureLinks.forEach(link => {{
-        link.addEventListener('mouseenter', function() {{
-            const verse = this.textContent.trim();
-            if (crossRefData[verse] && !panel.classList.contains('open')) {{
-                // Optionally auto-show on hover
-                // showCrossReferences(verse);
-            }}
-        }});
-    }});
-    
     // Expose function globally
     window.showCrossReferences = showCrossReferences;
     
-    console.log(`✓ Cross-reference engine enabled with ${{Object.keys(crossRefData).length}} verses`);
+    console.log('✓ Cross-reference engine enabled (data loads on first use)');
 }})();
 </script>
 """
 
-def add_cross_references(html_file, output_file):
-    """Add cross-reference system to HTML file."""
+def build_cross_reference_assets(html_file, mode='count', data_file=CROSS_REF_DATA_FILE,
+                                 graphml_file=CROSS_REF_GRAPHML_FILE, edges_file=CROSS_REF_EDGES_FILE):
+    """Write the cross-reference data asset (and verse graph exports) for html_file."""
     
     print(f"Analyzing scripture relationships in {html_file}...")
     
     # Extract relationships
-    verse_co_occurrence, verse_to_doctrines = extract_verse_relationships(html_file)
+    incidence, verses, verse_to_doctrines, proximity = extract_verse_relationships(html_file)
     
     # Generate cross-references
-    cross_refs = generate_cross_references(verse_co_occurrence, min_occurrences=2)
+    cross_refs = generate_cross_references(incidence, verses, mode=mode, min_occurrences=2, proximity=proximity)
     
     print(f"  - Found {len(verse_to_doctrines)} unique verses")
-    print(f"  - Generated {len(cross_refs)} cross-reference sets")
+    print(f"  - {len(overlapping_ranges(verses))} overlapping verse range pairs counted as related")
+    print(f"  - Generated {len(cross_refs)} cross-reference sets ({mode} scoring)")
+    
+    # Precomputed graph structure: clusters, hubs and two-hop neighbourhoods
+    graph = analyze_verse_graph(cross_refs, verses)
+    print(f"  - {len(graph['clusters'])} verse clusters; top hub: {format_reference(graph['hubs'][0]) if graph['hubs'] else 'none'}")
+    
+    write_cross_reference_data(build_cross_reference_data(cross_refs, verse_to_doctrines, mode, graph), data_file)
+    print(f"  - Wrote cross-reference data to {data_file}")
+    if graphml_file:
+        write_verse_graphml(verses, graph, graphml_file)
+        edge_count = write_verse_edge_list(verses, graph, edges_file)
+        print(f"  - Exported verse graph ({edge_count} edges) to {graphml_file} and {edges_file}")
+
+def add_cross_reference_panel(html_file, output_file, data_url=CROSS_REF_DATA_URL):
+    """Add the (lazy-loading) panel to HTML file, replacing an older copy with inlined data."""
     
-    # Read file
     with open(html_file, 'r', encoding='utf-8') as f:
         content = f.read()
     
-    # Check if already exists
-    if 'cross-ref-panel' in content:
-        print(f"ℹ Cross-references already exist in {html_file}")
-        return
+    script = add_cross_reference_script(data_url).strip()
+    panel_marker = '<style>\n.cross-ref-panel {'
     
-    # Add script
-    script = add_cross_reference_script(cross_refs, verse_to_doctrines)
+    if script in content:
+        print(f"ℹ Cross-references already up to date in {html_file}")
+        return
     
-    # Insert before last closing div
-    last_div_pos = content.rfind('</div>')
-    if last_div_pos != -1:
-        before = content[:last_div_pos]
-        after = content[last_div_pos:]
-        result = before + script + '\n' + after
+    if panel_marker in content:
+        # Older copy (e.g. with the data inlined as const crossRefData): replace it
+        start = content.index(panel_marker)
+        end = content.index('</script>', content.index('window.showCrossReferences', start)) + len('</script>')
+        result = content[:start] + script + content[end:]
+    elif 'cross-ref-panel' in content:
+        print(f"⚠ Unrecognized cross-reference panel in {html_file}; not changed")
+        return
     else:
-        result = content + script
+        # Insert before last closing div
+        last_div_pos = content.rfind('</div>')
+        if last_div_pos != -1:
+            before = content[:last_div_pos]
+            after = content[last_div_pos:]
+            result = before + '\n' + script + '\n' + after
+        else:
+            result = content + script
     
     # Write output
     with open(output_file, 'w', encoding='utf-8') as f:
@@ -347,21 +923,39 @@ def add_cross_references(html_file, output_file):
     
     print(f"✓ Added cross-references to {output_file}")
 
+def add_cross_references(html_file, output_file, mode='count', data_file=CROSS_REF_DATA_FILE, data_url=CROSS_REF_DATA_URL,
+                         graphml_file=CROSS_REF_GRAPHML_FILE, edges_file=CROSS_REF_EDGES_FILE):
+    """Write the cross-reference data asset for html_file and add the panel that fetches it."""
+    build_cross_reference_assets(html_file, mode, data_file, graphml_file, edges_file)
+    add_cross_reference_panel(html_file, output_file, data_url)
+
 def main():
     """Main execution."""
     print("Adding cross-reference suggestion engine...\n")
     
+    mode = 'proximity'
+    if '--score' in sys.argv:
+        mode = sys.argv[sys.argv.index('--score') + 1]
+    if mode not in SCORING_MODES:
+        print(f"Unknown scoring mode: {mode} (choose from {', '.join(SCORING_MODES)})")
+        sys.exit(1)
+    data_url = sys.argv[sys.argv.index('--data-url') + 1] if '--data-url' in sys.argv else CROSS_REF_DATA_URL
+    
+    # One data asset, built from the publish page, serves both pages
+    build_cross_reference_assets('Doctrines/doctrines_library_wp_publish.html', mode)
+    
     # Process both files
     for filename in ['doctrines_library_wp_publish.html', 'doctrines_library_wp_clean.html']:
         filepath = f'Doctrines/{filename}'
         print(f"\nProcessing {filename}...")
-        add_cross_references(filepath, filepath)
+        add_cross_reference_panel(filepath, filepath, data_url)
     
     print("\n✓ Cross-reference system complete!")
     print("  - Click any scripture reference to see related verses")
     print("  - Shows connection strength")
     print("  - Lists doctrines containing each verse")
     print("  - Sliding panel interface")
+    print(f"\n📦 Upload {CROSS_REF_DATA_FILE} so it is served at {data_url}")
 
 if __name__ == '__main__':
     main()
@@ -128,22 +128,10 @@ def add_search_to_doctrines(html_file, output_file):
     
     print(f"✓ Added search functionality to {output_file}")
 
-def add_search_to_index(html_file, output_file):
-    """Add enhanced search functionality to scripture index."""
-    
-    with open(html_file, 'r', encoding='utf-8') as f:
-        content = f.read()
+def get_index_search_html():
+    """Search box and script for the scripture index."""
     
-    soup = BeautifulSoup(f'<html><body>{content}</body></html>', 'html.parser')
-    
-    # Find the wrapper div
-    wrapper = soup.find('div', class_='si-wrapper')
-    if not wrapper:
-        print("Error: Could not find si-wrapper")
-        return
-    
-    # Create search box HTML
-    search_html = """
+    return """
 <div class="search-container" style="margin: 2em 0; text-align: center;">
     <input type="text" id="scriptureSearch" placeholder="🔍 Search by book, chapter, or verse..." style="width: 80%; max-width: 600px; padding: 12px 20px; font-size: 16px; border: 2px solid #3b82f6; border-radius: 25px; box-shadow: 0 2px 8px rgba(59, 130, 246, 0.2); transition: all 0.3s ease; outline: none;">
     <div id="searchResults" style="margin-top: 1em; text-align: center; color: #6b7280; font-style: italic;"></div>
@@ -170,6 +158,26 @@ def add_search_to_index(html_file, output_file):
     searchInput.addEventListener('input', function() {
         const searchTerm = this.value.toLowerCase().trim();
         
+        // Virtualized or chunked index: filter the row data instead of the DOM.
+        // Chunked indexes load book data first, so the count may be a Promise.
+        const virtualIndex = window.ScriptureIndex;
+        if (virtualIndex) {
+            const query = this.value;
+            Promise.resolve(virtualIndex.filter(searchTerm)).then(matchCount => {
+                if (query !== searchInput.value) return; // a newer search is running
+                if (searchTerm === '') {
+                    searchResults.textContent = '';
+                } else if (matchCount === 0) {
+                    searchResults.textContent = 'No scriptures found matching "' + query + '"';
+                    searchResults.style.color = '#ef4444';
+                } else {
+                    searchResults.textContent = 'Showing ' + matchCount + ' of ' + virtualIndex.total + ' scripture references';
+                    searchResults.style.color = '#10b981';
+                }
+            });
+            return;
+        }
+        
         if (searchTerm === '') {
             // Show all rows
             rows.forEach(row => {
@@ -216,11 +224,25 @@ def add_search_to_index(html_file, output_file):
 })();
 </script>
 """
+
+def add_search_to_index(html_file, output_file):
+    """Add enhanced search functionality to scripture index."""
+    
+    with open(html_file, 'r', encoding='utf-8') as f:
+        content = f.read()
+    
+    soup = BeautifulSoup(f'<html><body>{content}</body></html>', 'html.parser')
+    
+    # Find the wrapper div
+    wrapper = soup.find('div', class_='si-wrapper')
+    if not wrapper:
+        print("Error: Could not find si-wrapper")
+        return
     
     # Find the container div and insert search box at the beginning
     container = wrapper.find('div', class_='container')
     if container:
-        search_soup = BeautifulSoup(search_html, 'html.parser')
+        search_soup = BeautifulSoup(get_index_search_html(), 'html.parser')
         # Insert after the back link
         back_link = container.find('a', class_='back-link')
         if back_link:
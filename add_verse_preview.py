@@ -2,17 +2,53 @@
 """
 Add Verse Preview on Hover
 Adds tooltip functionality to show verse text when hovering over scripture references.
-Uses the ESV API for verse text retrieval (requires client-side API calls).
+Verse text comes from the static verse pack written by
+`python3 verse_store.py export-pack`, fetched one book at a time, or from the
+live Bible API when add_bible_api.py has been run on the page.
+
+References are prefetched while the browser is idle as their links scroll
+into view, in batches that fit one ESV request, leaving part of the ESV rate
+limit free for hovers.
+
+Usage:
+    python3 add_verse_preview.py [--pack-url /verse_pack/]
 """
 
+import json
+import sys
+
 from bs4 import BeautifulSoup
 
-def add_verse_preview_script():
+from add_bible_api import legacy_verse_tooltip_override, verse_tooltip_override_script
+from verse_store import ESV_MAX_VERSES
+
+VERSE_PACK_URL = '/verse_pack/'
+
+# Longest passage shown in a tooltip
+MAX_PREVIEW_VERSES = 6
+
+# Prefetch links this close to the viewport
+PREFETCH_ROOT_MARGIN = '300px'
+# Most references looked up in one idle-time prefetch batch
+PREFETCH_BATCH_SIZE = 25
+# Requests per rate-limit window that prefetching leaves for hovers
+PREFETCH_RESERVE = 10
+
+def add_verse_preview_script(pack_url=VERSE_PACK_URL):
     """Generate JavaScript for verse preview functionality."""
     
     return """
 <script>
 (function() {
+    const VERSE_PACK_URL = """ + json.dumps(pack_url) + """;
+    const MAX_PREVIEW_VERSES = """ + str(MAX_PREVIEW_VERSES) + """;
+    const PREFETCH = {
+        rootMargin: """ + json.dumps(PREFETCH_ROOT_MARGIN) + """,
+        batchSize: """ + str(PREFETCH_BATCH_SIZE) + """,
+        maxVerses: """ + str(ESV_MAX_VERSES) + """,  // one ESV request
+        reserve: """ + str(PREFETCH_RESERVE) + """
+    };
+    
     // Verse preview tooltip functionality
     const style = document.createElement('style');
     style.textContent = `
@@ -104,31 +140,79 @@ def add_verse_preview_script():
         return text;
     }
     
-    // Get verse text (simulated - in production would use Bible API)
-    function getVerseText(reference) {
-        return new Promise((resolve) => {
-            // Check cache first
-            if (verseCache[reference]) {
-                resolve(verseCache[reference]);
-                return;
-            }
-            
-            // Simulate API delay
-            setTimeout(() => {
-                // In production, this would be an actual API call to ESV API or Bible Gateway
-                // For now, we'll show a message indicating where to get the API
-                const verseText = {
-                    text: "Hover preview available with API key. Click to view full verse on ESV.org",
-                    reference: reference,
-                    cached: false
-                };
-                
-                verseCache[reference] = verseText;
-                resolve(verseText);
-            }, 100);
-        });
+    // Verse pack: index.json maps book names to per-book files, and each
+    // book file is {chapters: [[verse text, ...], ...]}, so a lookup is two
+    // array indexes once the book has been fetched
+    let packIndex = null;
+    const packBooks = {};
+    
+    function fetchJSON(url) {
+        return fetch(url)
+            .then(response => response.ok ? response.json() : null)
+            .catch(() => null);
+    }
+    
+    function loadPackIndex() {
+        if (!packIndex) {
+            packIndex = fetchJSON(VERSE_PACK_URL + 'index.json');
+        }
+        return packIndex;
     }
     
+    function loadPackBook(index, number) {
+        if (!packBooks[number]) {
+            packBooks[number] = fetchJSON(VERSE_PACK_URL + index.files[number]);
+        }
+        return packBooks[number];
+    }
+    
+    async function packPassage(reference) {
+        const match = reference.match(/^\\s*([123]?\\s*[A-Za-z][A-Za-z .]*?)\\.?\\s+(\\d+):(\\d+)(?:\\s*[-–—]\\s*(\\d+))?/);
+        if (!match) return null;
+        
+        const index = await loadPackIndex();
+        const number = index && index.books[match[1].replace(/\\s+/g, ' ').toLowerCase()];
+        if (!number || !index.files[number]) return null;
+        
+        const book = await loadPackBook(index, number);
+        const chapter = book && book.chapters[parseInt(match[2], 10) - 1];
+        if (!chapter) return null;
+        
+        const start = parseInt(match[3], 10);
+        const end = Math.max(match[4] ? parseInt(match[4], 10) : start, start);
+        const verses = chapter.slice(start - 1, Math.min(end, start + MAX_PREVIEW_VERSES - 1)).filter(Boolean);
+        if (!verses.length) return null;
+        
+        return {
+            text: verses.join(' ') + (end - start >= MAX_PREVIEW_VERSES ? ' …' : ''),
+            translation: index.translation
+        };
+    }
+    
+    // Get verse text from the verse pack, or a pointer to ESV.org without one
+    async function getVerseText(reference) {
+        // Check cache first
+        if (verseCache[reference]) {
+            return verseCache[reference];
+        }
+        
+        const passage = await packPassage(reference);
+        const verseText = passage ? {
+            text: passage.text,
+            reference: passage.translation ? `${reference} (${passage.translation})` : reference,
+            cached: true
+        } : {
+            text: "Verse text is not available offline. Click to view full verse on ESV.org",
+            reference: reference,
+            cached: false
+        };
+        
+        verseCache[reference] = verseText;
+        return verseText;
+    }
+    // add_bible_api.py replaces this with a live API lookup
+    window.getVerseText = getVerseText;
+    
     // Position tooltip
     function positionTooltip(e) {
         const padding = 10;
@@ -166,7 +250,7 @@ def add_verse_preview_script():
         
         // Get verse text
         try {
-            const verse = await getVerseText(reference);
+            const verse = await window.getVerseText(reference, link.dataset.passageId);
             tooltip.innerHTML = `
                 <div class="verse-tooltip-reference">${verse.reference}</div>
                 <div class="verse-tooltip-text">${verse.text}</div>
@@ -208,33 +292,121 @@ def add_verse_preview_script():
         link.addEventListener('mouseleave', hideTooltip);
     });
     
+    // Prefetch references near the viewport while the browser is idle
+    const whenIdle = window.requestIdleCallback
+        || (callback => setTimeout(() => callback({ didTimeout: false, timeRemaining: () => 10 }), 200));
+    const prefetchQueue = new Map();  // reference -> API.Bible passage ID from the link
+    const prefetched = new Set();
+    let prefetchScheduled = false;
+    
+    // Requests prefetching may still make: what is left in the tightest ESV
+    // rate-limit window less the reserve kept for hovers
+    function prefetchBudget() {
+        if (!window.ESV_RATE_LIMITER || !window.BIBLE_API_CONFIG || !window.BIBLE_API_CONFIG.esv.enabled) {
+            return Infinity;  // verse pack only: no quota to spend
+        }
+        const remaining = window.ESV_RATE_LIMITER.getRemaining();
+        return Math.min(remaining.minute, remaining.hour, remaining.day) - PREFETCH.reserve;
+    }
+    
+    function schedulePrefetch() {
+        if (!prefetchScheduled && prefetchQueue.size) {
+            prefetchScheduled = true;
+            // The remaining quota means nothing until the limiter's stored state has loaded
+            const limiter = window.ESV_RATE_LIMITER;
+            Promise.resolve(limiter && limiter.ready).then(() => whenIdle(prefetchBatch));
+        }
+    }
+    
+    // Look up one batch of queued references; lookups started together are
+    // coalesced into a single request, so each batch costs one
+    function prefetchBatch(deadline) {
+        prefetchScheduled = false;
+        if (prefetchBudget() < 1) {
+            // Out of quota for now; try again when the minute window has moved on
+            setTimeout(schedulePrefetch, 60 * 1000);
+            return;
+        }
+        
+        const batch = [];
+        let verses = 0;
+        for (const [reference, passageId] of prefetchQueue) {
+            if (batch.length >= PREFETCH.batchSize || (batch.length && deadline.timeRemaining() <= 0)) break;
+            const range = window.esvPassageRange ? window.esvPassageRange(reference) : null;
+            const size = range ? range.verses : 1;
+            if (batch.length && verses + size > PREFETCH.maxVerses) break;
+            prefetchQueue.delete(reference);
+            prefetched.add(reference);
+            batch.push([reference, passageId]);
+            verses += size;
+        }
+        
+        Promise.all(batch.map(([reference, passageId]) => window.getVerseText(reference, passageId).catch(() => null)))
+            .then(schedulePrefetch);
+    }
+    
+    if ('IntersectionObserver' in window) {
+        const prefetchObserver = new IntersectionObserver(entries => {
+            for (const entry of entries) {
+                if (!entry.isIntersecting) continue;
+                prefetchObserver.unobserve(entry.target);
+                const reference = parseReference(entry.target);
+                if (reference && !prefetched.has(reference)) {
+                    prefetchQueue.set(reference, entry.target.dataset.passageId);
+                }
+            }
+            schedulePrefetch();
+        }, { rootMargin: PREFETCH.rootMargin });
+        
+        scriptureLinks.forEach(link => prefetchObserver.observe(link));
+    }
+    
     console.log(`✓ Verse preview enabled for ${scriptureLinks.length} scripture references`);
 })();
 </script>
 """
 
-def add_verse_preview(html_file, output_file):
-    """Add verse preview functionality to HTML file."""
+def add_verse_preview(html_file, output_file, pack_url=VERSE_PACK_URL):
+    """Add verse preview functionality to HTML file, replacing an older copy."""
     
     with open(html_file, 'r', encoding='utf-8') as f:
         content = f.read()
     
-    # Check if script already exists
-    if 'verse-tooltip' in content:
-        print(f"ℹ Verse preview already exists in {html_file}")
+    script = add_verse_preview_script(pack_url).strip()
+    preview_marker = '// Verse preview tooltip functionality'
+    
+    # An older Bible API block overrides getVerseText without passage IDs or
+    # the verse-pack fallback; bring it up to date with the preview
+    upgraded = legacy_verse_tooltip_override() in content
+    content = content.replace(legacy_verse_tooltip_override(), verse_tooltip_override_script())
+    
+    if script in content:
+        if upgraded:
+            with open(output_file, 'w', encoding='utf-8') as f:
+                f.write(content)
+            print(f"✓ Updated the Bible API tooltip override in {output_file}")
+        else:
+            print(f"ℹ Verse preview already up to date in {html_file}")
         return
     
-    # Find the end of the content and insert script before it
-    if '</div>' in content:
+    if preview_marker in content:
+        # Older copy (placeholder text, no verse pack or prefetching): replace it
+        start = content.rfind('<script>', 0, content.index(preview_marker))
+        end = content.index('</script>', start) + len('</script>')
+        result = content[:start] + script + content[end:]
+    elif 'verse-tooltip' in content:
+        print(f"⚠ Unrecognized verse preview in {html_file}; not changed")
+        return
+    elif '</div>' in content:
         # Find the last closing div (the wrapper)
         last_div_pos = content.rfind('</div>')
         before = content[:last_div_pos]
         after = content[last_div_pos:]
         
-        result = before + add_verse_preview_script() + '\n' + after
+        result = before + '\n' + script + '\n' + after
     else:
         # Append at end
-        result = content + add_verse_preview_script()
+        result = content + '\n' + script
     
     # Write to output
     with open(output_file, 'w', encoding='utf-8') as f:
@@ -246,23 +418,25 @@ def main():
     """Main execution."""
     print("Adding verse text preview on hover...\n")
     
-    # Add to doctrines library
-    add_verse_preview(
-        'Doctrines/doctrines_library_wp_clean.html',
-        'Doctrines/doctrines_library_wp_clean.html'
-    )
+    pack_url = sys.argv[sys.argv.index('--pack-url') + 1] if '--pack-url' in sys.argv else VERSE_PACK_URL
+    
+    # Add to both doctrines library pages
+    for filename in ['doctrines_library_wp_publish.html', 'doctrines_library_wp_clean.html']:
+        add_verse_preview(f'Doctrines/{filename}', f'Doctrines/{filename}', pack_url)
     
     # Add to scripture index
     add_verse_preview(
         'Doctrines/scripture_index_wp_clean.html',
-        'Doctrines/scripture_index_wp_clean.html'
+        'Doctrines/scripture_index_wp_clean.html',
+        pack_url
     )
     
     # Add to analytics if it exists
     try:
         add_verse_preview(
             'Doctrines/scripture_analytics_wp.html',
-            'Doctrines/scripture_analytics_wp.html'
+            'Doctrines/scripture_analytics_wp.html',
+            pack_url
         )
     except FileNotFoundError:
         pass
@@ -271,8 +445,9 @@ def main():
     print("  - Hover over any scripture link to see verse text")
     print("  - Tooltips follow mouse cursor")
     print("  - Cached results for better performance")
-    print("\nNote: For production, integrate with ESV API or Bible Gateway API")
-    print("      for actual verse text retrieval.")
+    print("  - Links near the viewport are prefetched while the browser is idle")
+    print(f"\nVerse text is read from the verse pack at {pack_url}")
+    print("  Build it with: python3 verse_store.py import <translation> && python3 verse_store.py export-pack")
 
 if __name__ == '__main__':
     main()
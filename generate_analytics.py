@@ -2,18 +2,49 @@
 """
 Scripture Analytics Generator
 Analyzes scripture references across the doctrines library and generates statistics.
+
+By default every doctrine artifact under Doctrines/ is analyzed in parallel
+(--library-only restricts the report to the main library file).
+
+With --history, also charts reference statistics for every committed revision
+of the library, cached by git blob hash in Doctrines/analytics_history.json.
 """
 
+import json
 import re
-from collections import Counter, defaultdict
+import subprocess
+import sys
+from collections import Counter
+from multiprocessing import Pool
+from datetime import datetime, timezone
+from pathlib import Path
+from xml.sax.saxutils import escape
 from bs4 import BeautifulSoup
+import numpy as np
+
+from add_cross_references import format_reference, passage_range, url_reference
+from generate_scripture_index import CANONICAL_BOOKS, extract_section_references, ref_verse_range
+from versification import (CHAPTER_BOOK, CHAPTER_LENGTH, CHAPTER_NUMBER, CHAPTER_START, TOTAL_VERSES,
+                           chapter_ordinals, ordinal_verse_ids, verse_ordinals)
+
+# Precomputed verse graph written by add_cross_references.py
+CROSS_REF_DATA_FILE = 'Doctrines/cross_references.json'
+LIBRARY_FILE = 'Doctrines/doctrines_library_wp_publish.html'
+HISTORY_CACHE_FILE = 'Doctrines/analytics_history.json'
+DOCTRINES_DIR = Path('Doctrines')
+
+# Generated reports cite scripture but are not doctrine artifacts
+GENERATED_ARTIFACT_PREFIXES = ('scripture_index', 'scripture_analytics')
 
 def extract_scripture_references(html_file):
     """Extract all scripture references and their associated doctrines."""
     with open(html_file, 'r', encoding='utf-8') as f:
-        content = f.read()
-        # Wrap in proper HTML structure for BeautifulSoup
-        soup = BeautifulSoup(f'<html><body>{content}</body></html>', 'html.parser')
+        return extract_references_from_html(f.read())
+
+def extract_references_from_html(content):
+    """Scripture references and doctrines from library HTML held in memory."""
+    # Wrap in proper HTML structure for BeautifulSoup
+    soup = BeautifulSoup(f'<html><body>{content}</body></html>', 'html.parser')
     
     references = []
     current_doctrine = ""
@@ -23,6 +54,7 @@ def extract_scripture_references(html_file):
     
     for section in sections:
         # Get doctrine name from h2
+        section_id = section['id']
         h2 = section.find('h2')
         if h2:
             current_doctrine = h2.get_text(strip=True)
@@ -37,70 +69,518 @@ def extract_scripture_references(html_file):
                 references.append({
                     'reference': text,
                     'doctrine': current_doctrine,
+                    'section': section_id,
                     'url': href
                 })
     
     return references
 
-def parse_reference(ref_string):
-    """Parse a scripture reference into components."""
-    # Match patterns like "John 3:16", "Genesis 1:1", "Psalms 119"
-    # Handle various formats: "Matt. 1:18", "Isaiah 11:2", "1 Pet. 3:18-19"
+def citation_arrays(references):
+    """
+    One pass over the references: NumPy arrays of book index (0-65), doctrine
+    index and start/end verse ID for every citation whose URL or text parses,
+    plus the doctrine names in first-seen order.
+    """
+    doctrine_index = {}
+    books, doctrines, starts, ends = [], [], [], []
     
-    # Clean up the reference
-    ref_string = ref_string.strip()
+    for ref in references:
+        verse_range = reference_range(ref)
+        if verse_range:
+            books.append(verse_range[0] // 1000000 - 1)
+            doctrines.append(doctrine_index.setdefault(ref['doctrine'], len(doctrine_index)))
+            starts.append(verse_range[0])
+            ends.append(verse_range[1])
     
-    # Pattern: optional number + book name + chapter + optional :verse or :verse-verse
-    match = re.match(r'([0-9]*\s*[A-Za-z\.]+)\s+(\d+)(?::(\d+))?(?:[-–](\d+))?', ref_string)
+    return (np.array(books, dtype=np.int64), np.array(doctrines, dtype=np.int64),
+            np.array(starts, dtype=np.int64), np.array(ends, dtype=np.int64), list(doctrine_index))
+
+def book_doctrine_matrix(book_idx, doctrine_idx, doctrine_count):
+    """Dense 66 x N matrix of citation counts per (book, doctrine)."""
+    matrix = np.zeros((len(CANONICAL_BOOKS), doctrine_count), dtype=np.int64)
+    np.add.at(matrix, (book_idx, doctrine_idx), 1)
+    return matrix
+
+def expand_verse_ids(starts, ends):
+    """Every integer in the given inclusive ranges (verse IDs or positions), with repeats (vectorized range expansion)."""
+    lengths = ends - starts + 1
+    offsets = np.arange(lengths.sum()) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+    return np.repeat(starts, lengths) + offsets
+
+def chapter_coverage(starts, ends):
+    """
+    Expand cited ranges into a bitmap over all 31,102 verses (a difference array
+    plus cumulative sum, so no per-verse loop), then reduce it per chapter and
+    per book. Chapter-only citations cover the whole chapter.
+    """
+    first, last = verse_ordinals(starts), verse_ordinals(ends)
+    valid = (first >= 0) & (last >= first)
     
-    if match:
-        book = match.group(1).strip().replace('.', '')
-        chapter = int(match.group(2))
-        verse_start = int(match.group(3)) if match.group(3) else 1
-        verse_end = int(match.group(4)) if match.group(4) else verse_start
-        
-        return {
-            'book': book,
-            'chapter': chapter,
-            'verse_start': verse_start,
-            'verse_end': verse_end,
-            'verse_count': verse_end - verse_start + 1
-        }
-    return None
+    marks = np.zeros(TOTAL_VERSES + 1, dtype=np.int64)
+    np.add.at(marks, first[valid], 1)
+    np.add.at(marks, last[valid] + 1, -1)
+    bitmap = np.cumsum(marks[:-1]) > 0
+    
+    book_count = len(CANONICAL_BOOKS)
+    covered = np.add.reduceat(bitmap, CHAPTER_START)
+    citations = np.bincount(chapter_ordinals(starts[valid]), minlength=len(CHAPTER_LENGTH))
+    book_covered = np.bincount(CHAPTER_BOOK, weights=covered, minlength=book_count)
+    book_verses = np.bincount(CHAPTER_BOOK, weights=CHAPTER_LENGTH, minlength=book_count)
+    
+    return {
+        'bitmap': bitmap,
+        'chapter_covered': covered,
+        'chapter_fraction': covered / CHAPTER_LENGTH,
+        'chapter_citations': citations,
+        'book_fraction': book_covered / book_verses,
+        'verses_covered': int(bitmap.sum()),
+        'chapters_cited': int((covered > 0).sum()),
+    }
+
+def top_counts(counts, labels, limit):
+    """[(label, count), ...] for the highest non-zero counts, ties in label order."""
+    order = np.argsort(-counts, kind='stable')[:limit]
+    return [(labels[i], int(counts[i])) for i in order if counts[i] > 0]
+
+def reference_range(ref):
+    return url_reference(ref['url']) or passage_range(ref['reference'])
+
+def discover_doctrine_artifacts(doctrines_dir=DOCTRINES_DIR):
+    """
+    Every HTML doctrine artifact under doctrines_dir, in priority order: the
+    published library, then standalone pages, then everything else. Folders
+    named after a standalone page hold its drafts and are skipped.
+    """
+    standalone_slugs = {path.name[:-len('_wp_standalone.html')] for path in doctrines_dir.glob('*_wp_standalone.html')}
+    artifacts = [
+        path for path in doctrines_dir.rglob('*.html')
+        if not path.name.startswith(GENERATED_ARTIFACT_PREFIXES)
+        and not standalone_slugs.intersection(part for part in path.relative_to(doctrines_dir).parts[:-1])
+    ]
+    
+    def priority(path):
+        if path.name == Path(LIBRARY_FILE).name:
+            return (0, str(path))
+        return (1 if path.name.endswith('_wp_standalone.html') else 2, str(path))
+    return sorted(artifacts, key=priority)
+
+def artifact_citations(path):
+    """
+    Map step: (path, [(doctrine id, title, Counter of verse ranges)]) for one
+    artifact. Sectioned files are read through their scripture links; single
+    doctrine pages, which cite mostly in plain text, through the text patterns.
+    """
+    with open(path, 'r', encoding='utf-8') as f:
+        content = f.read()
+    
+    doctrines = {}
+    if re.search(r'<section\b[^>]*\bid=', content):
+        for ref in extract_references_from_html(content):
+            verse_range = reference_range(ref)
+            if verse_range:
+                doctrines.setdefault(ref['section'], (ref['doctrine'], Counter()))[1][verse_range] += 1
+    else:
+        doctrine_id = Path(path).stem.replace('_wp_standalone', '')
+        h1 = BeautifulSoup(content, 'html.parser').find('h1')
+        title = h1.get_text(' ', strip=True) if h1 else doctrine_id
+        _, refs = extract_section_references(doctrine_id, content)
+        ranges = Counter(filter(None, (ref_verse_range(book, ref) for book, ref in refs)))
+        if ranges:
+            doctrines[doctrine_id] = (title, ranges)
+    
+    return str(path), [(doctrine_id, title, ranges) for doctrine_id, (title, ranges) in doctrines.items()]
+
+def merge_artifact_citations(partials):
+    """
+    Reduce step: combine per-artifact counts into citation arrays. A doctrine
+    found in several artifacts (working copies, exports) is counted once, from
+    the highest-priority artifact. Returns (citation arrays, per-source summary).
+    """
+    merged = {}
+    sources = []
+    for path, doctrines in partials:
+        added = [(doctrine_id, title, ranges) for doctrine_id, title, ranges in doctrines if doctrine_id not in merged]
+        for doctrine_id, title, ranges in added:
+            merged[doctrine_id] = (title, ranges)
+        sources.append({
+            'path': path,
+            'doctrines': len(added),
+            'duplicates': len(doctrines) - len(added),
+            'citations': sum(sum(ranges.values()) for _, _, ranges in added),
+        })
+    
+    titles = [title for title, _ in merged.values()]
+    ranges = [(row, verse_range, count) for row, (_, counter) in enumerate(merged.values())
+              for verse_range, count in counter.items()]
+    rows, verse_ranges, counts = zip(*ranges) if ranges else ((), (), ())
+    bounds = np.array(verse_ranges, dtype=np.int64).reshape(-1, 2)
+    counts = np.array(counts, dtype=np.int64)
+    
+    starts = np.repeat(bounds[:, 0], counts)
+    ends = np.repeat(bounds[:, 1], counts)
+    doctrine_idx = np.repeat(np.array(rows, dtype=np.int64), counts)
+    return (starts // 1000000 - 1, doctrine_idx, starts, ends, titles), sources
+
+def artifact_analytics(doctrines_dir=DOCTRINES_DIR, processes=None):
+    """Analytics over every doctrine artifact, parsed in parallel worker processes."""
+    artifacts = discover_doctrine_artifacts(doctrines_dir)
+    with Pool(processes) as pool:
+        partials = pool.map(artifact_citations, artifacts)
+    citations, sources = merge_artifact_citations(partials)
+    analytics = analytics_from_citations(*citations)
+    analytics['sources'] = [source for source in sources if source['doctrines']]
+    return analytics
 
 def generate_analytics(references):
     """Generate comprehensive analytics from scripture references."""
+    return analytics_from_citations(*citation_arrays(references), total_references=len(references))
+
+def analytics_from_citations(book_idx, doctrine_idx, starts, ends, doctrines, total_references=None):
+    """Analytics from citation arrays (see citation_arrays)."""
+    matrix = book_doctrine_matrix(book_idx, doctrine_idx, len(doctrines))
     
-    # Count references per book
-    book_counter = Counter()
-    doctrine_counter = Counter()
-    book_doctrine_map = defaultdict(set)
-    verse_usage = defaultdict(int)
+    book_totals = matrix.sum(axis=1)
+    doctrine_totals = matrix.sum(axis=0)
+    doctrines_per_book = (matrix > 0).sum(axis=1)
     
-    for ref in references:
-        parsed = parse_reference(ref['reference'])
-        if parsed:
-            book = parsed['book']
-            book_counter[book] += 1
-            doctrine_counter[ref['doctrine']] += 1
-            book_doctrine_map[book].add(ref['doctrine'])
-            
-            # Count individual verses
-            for verse in range(parsed['verse_start'], parsed['verse_end'] + 1):
-                verse_key = f"{book} {parsed['chapter']}:{verse}"
-                verse_usage[verse_key] += 1
+    # Verse usage: whole-chapter citations name no particular verse. Ranges are
+    # expanded over verse positions so cross-chapter ranges stay in the text
+    first, last = verse_ordinals(starts), verse_ordinals(ends)
+    whole_chapters = (starts % 1000 == 1) & (ends % 1000 == CHAPTER_LENGTH[np.maximum(chapter_ordinals(ends), 0)])
+    named = (first >= 0) & (last >= first) & ~whole_chapters
+    verse_ids, verse_counts = np.unique(ordinal_verse_ids(expand_verse_ids(first[named], last[named])),
+                                        return_counts=True)
+    verse_labels = [format_reference((vid, vid)) for vid in verse_ids]
+    coverage = chapter_coverage(starts, ends)
     
     return {
-        'total_references': len(references),
-        'unique_doctrines': len(doctrine_counter),
-        'books_referenced': len(book_counter),
-        'most_cited_books': book_counter.most_common(10),
-        'doctrines_with_most_refs': doctrine_counter.most_common(10),
-        'most_referenced_verses': sorted(verse_usage.items(), key=lambda x: x[1], reverse=True)[:20],
-        'book_doctrine_coverage': {book: len(doctrines) for book, doctrines in book_doctrine_map.items()}
+        'total_references': len(starts) if total_references is None else total_references,
+        'unique_doctrines': int((doctrine_totals > 0).sum()),
+        'books_referenced': int((book_totals > 0).sum()),
+        'most_cited_books': top_counts(book_totals, CANONICAL_BOOKS, 10),
+        'doctrines_with_most_refs': top_counts(doctrine_totals, doctrines, 10),
+        'most_referenced_verses': top_counts(verse_counts, verse_labels, 20),
+        'book_doctrine_coverage': {CANONICAL_BOOKS[i]: int(doctrines_per_book[i]) for i in np.flatnonzero(book_totals)},
+        'book_doctrine_matrix': matrix,
+        'coverage': coverage,
+        'books': CANONICAL_BOOKS,
+        'doctrines': doctrines,
     }
 
-def generate_analytics_html(analytics):
+def revision_summary(references):
+    """The headline numbers tracked across revisions."""
+    book_idx, _, starts, ends, doctrines = citation_arrays(references)
+    return {
+        'references': len(references),
+        'books': int(np.unique(book_idx).size),
+        'doctrines': len(doctrines),
+        'verses_covered': chapter_coverage(starts, ends)['verses_covered'],
+    }
+
+def library_revisions(path=LIBRARY_FILE):
+    """
+    Oldest-first [(commit, timestamp, blob hash)] for every commit that changed
+    path, read from a single git log with raw diff lines. Deletions are skipped.
+    """
+    log = subprocess.run(
+        ['git', 'log', '--format=%x00%H %ct', '--raw', '--no-abbrev', '--no-renames', '--', path],
+        capture_output=True, text=True, check=True
+    ).stdout
+    
+    revisions = []
+    for entry in log.split('\0')[1:]:
+        lines = entry.strip().splitlines()
+        commit, timestamp = lines[0].split()
+        for line in lines[1:]:
+            fields = line.split()
+            if line.startswith(':') and len(fields) >= 5 and fields[3].strip('0'):
+                revisions.append((commit, int(timestamp), fields[3]))
+                break
+    revisions.reverse()
+    return revisions
+
+def read_blob(blob):
+    return subprocess.run(['git', 'cat-file', 'blob', blob], capture_output=True, check=True).stdout.decode('utf-8')
+
+def history_analytics(path=LIBRARY_FILE, cache_file=HISTORY_CACHE_FILE):
+    """
+    Reference statistics for every committed revision of path. Results are
+    cached by blob hash, so a revision whose content was seen before (including
+    reverts) is never parsed again.
+    """
+    try:
+        revisions = library_revisions(path)
+    except (OSError, subprocess.CalledProcessError) as e:
+        print(f"⚠ Could not read git history for {path}: {e}")
+        return []
+    
+    cache = {}
+    if Path(cache_file).exists():
+        with open(cache_file, 'r', encoding='utf-8') as f:
+            cache = json.load(f)
+    
+    computed = 0
+    history = []
+    for commit, timestamp, blob in revisions:
+        if blob not in cache:
+            cache[blob] = revision_summary(extract_references_from_html(read_blob(blob)))
+            computed += 1
+        history.append({'commit': commit, 'timestamp': timestamp, 'blob': blob, **cache[blob]})
+    
+    if computed:
+        with open(cache_file, 'w', encoding='utf-8') as f:
+            json.dump(cache, f, indent=1, sort_keys=True)
+    print(f"✓ {len(history)} revisions of {path} ({computed} analyzed, {len(history) - computed} cached)")
+    return history
+
+HISTORY_SERIES = [
+    ('references', 'Scripture references', '#1e40af'),
+    ('books', 'Books cited', '#059669'),
+    ('doctrines', 'Doctrines', '#b45309'),
+]
+
+def generate_trend_svg(history, width=760, panel_height=90, margin=50):
+    """One small line chart per tracked number, sharing the revision time axis."""
+    times = np.array([r['timestamp'] for r in history], dtype=float)
+    span = max(times[-1] - times[0], 1.0)
+    xs = margin + (times - times[0]) / span * (width - 2 * margin) if len(times) > 1 else np.full(1, width / 2)
+    height = panel_height * len(HISTORY_SERIES) + 24
+    
+    parts = [f'<svg xmlns="http://www.w3.org/2000/svg" viewBox="0 0 {width} {height}" width="100%" '
+             f'role="img" aria-label="Library statistics by revision" '
+             f'style="font-family: Georgia, serif; font-size: 10px; background: white;">']
+    
+    for i, (key, label, color) in enumerate(HISTORY_SERIES):
+        top = i * panel_height + 14
+        values = np.array([r[key] for r in history], dtype=float)
+        low, high = values.min(), values.max()
+        ys = top + panel_height - 24 - (values - low) / max(high - low, 1.0) * (panel_height - 34)
+        
+        parts.append(f'<text x="{margin}" y="{top}" font-weight="bold" fill="{color}">{label}</text>')
+        parts.append(f'<text x="{margin - 6}" y="{ys.min() + 3:.1f}" text-anchor="end" fill="#6b7280">{high:.0f}</text>')
+        if high > low:
+            parts.append(f'<text x="{margin - 6}" y="{ys.max() + 3:.1f}" text-anchor="end" fill="#6b7280">{low:.0f}</text>')
+        parts.append(f'<line x1="{margin}" y1="{top + panel_height - 20}" x2="{width - margin}" '
+                     f'y2="{top + panel_height - 20}" stroke="#e5e7eb"/>')
+        if len(history) > 1:
+            points = ' '.join(f'{x:.1f},{y:.1f}' for x, y in zip(xs, ys))
+            parts.append(f'<polyline points="{points}" fill="none" stroke="{color}" stroke-width="1.5"/>')
+        for x, y, revision in zip(xs, ys, history):
+            parts.append(f'<circle cx="{x:.1f}" cy="{y:.1f}" r="2.5" fill="{color}">'
+                         f'<title>{revision["commit"][:7]}: {revision[key]:,} {label.lower()}</title></circle>')
+    
+    first, last = (datetime.fromtimestamp(history[j]['timestamp'], timezone.utc).strftime('%Y-%m-%d') for j in (0, -1))
+    parts.append(f'<text x="{margin}" y="{height - 4}" fill="#6b7280">{first}</text>')
+    parts.append(f'<text x="{width - margin}" y="{height - 4}" text-anchor="end" fill="#6b7280">{last}</text>')
+    parts.append('</svg>')
+    return '\n'.join(parts)
+
+def generate_history_html(history, limit=15):
+    """Trend chart and the most recent revisions, newest first."""
+    if not history:
+        return ""
+    
+    rows = ""
+    for i in range(len(history) - 1, max(len(history) - 1 - limit, -1), -1):
+        revision = history[i]
+        change = revision['references'] - history[i - 1]['references'] if i else 0
+        date = datetime.fromtimestamp(revision['timestamp'], timezone.utc).strftime('%Y-%m-%d')
+        rows += (f"<tr><td>{date}</td><td><code>{revision['commit'][:7]}</code></td>"
+                 f"<td>{revision['references']:,} ({change:+d})</td><td>{revision['books']}</td>"
+                 f"<td>{revision['doctrines']}</td><td>{revision['verses_covered']:,}</td></tr>\n            ")
+    
+    return f"""
+    <div class="stat-box">
+        <h3>📈 Library Growth Over Time</h3>
+        <p style="color: #4b5563;">Reference statistics for each of the {len(history)} committed revisions of the library.</p>
+        <div style="overflow-x: auto;">
+        {generate_trend_svg(history)}
+        </div>
+        <table>
+            <tr><th>Date</th><th>Commit</th><th>References</th><th>Books</th><th>Doctrines</th><th>Verses Covered</th></tr>
+            {rows}
+        </table>
+    </div>
+"""
+
+def heatmap_color(fraction):
+    """White to deep blue; fraction in [0, 1]."""
+    low, high = np.array([239, 246, 255]), np.array([30, 64, 175])
+    r, g, b = (low + (high - low) * fraction).round().astype(int)
+    return f"#{r:02x}{g:02x}{b:02x}"
+
+def chapter_label(chapter):
+    return f"{CANONICAL_BOOKS[CHAPTER_BOOK[chapter]]} {CHAPTER_NUMBER[chapter]}"
+
+def generate_coverage_svg(coverage, cell=5, row_height=8, label_width=110):
+    """
+    Static SVG map of chapter coverage: one row per book, one cell per chapter,
+    shaded by the share of the chapter's verses the library cites.
+    """
+    chapter_fraction = coverage['chapter_fraction']
+    max_chapters = int(np.bincount(CHAPTER_BOOK).max())
+    width = label_width + cell * max_chapters + 50
+    height = row_height * len(CANONICAL_BOOKS) + 4
+    
+    parts = [f'<svg xmlns="http://www.w3.org/2000/svg" viewBox="0 0 {width} {height}" width="100%" '
+             f'role="img" aria-label="Share of each chapter cited, by book" '
+             f'style="font-family: Georgia, serif; font-size: 7px; background: white;">']
+    
+    for b, book in enumerate(CANONICAL_BOOKS):
+        y = b * row_height + 2
+        chapters = np.flatnonzero(CHAPTER_BOOK == b)
+        parts.append(f'<text x="{label_width - 4}" y="{y + row_height - 2}" text-anchor="end">{escape(book)}</text>')
+        parts.append(f'<rect x="{label_width}" y="{y}" width="{cell * len(chapters)}" height="{row_height - 1}" fill="#f3f4f6"/>')
+        for chapter in chapters[chapter_fraction[chapters] > 0]:
+            x = label_width + (CHAPTER_NUMBER[chapter] - 1) * cell
+            title = (f"{chapter_label(chapter)}: {chapter_fraction[chapter]:.0%} of verses "
+                     f"({coverage['chapter_covered'][chapter]}/{CHAPTER_LENGTH[chapter]}), "
+                     f"{coverage['chapter_citations'][chapter]} citations")
+            parts.append(f'<rect x="{x}" y="{y}" width="{cell - 0.5}" height="{row_height - 1}" '
+                         f'fill="{heatmap_color(0.3 + 0.7 * chapter_fraction[chapter])}"><title>{title}</title></rect>')
+        parts.append(f'<text x="{label_width + cell * len(chapters) + 4}" y="{y + row_height - 2}" fill="#6b7280">'
+                     f'{coverage["book_fraction"][b]:.0%}</text>')
+    
+    parts.append('</svg>')
+    return '\n'.join(parts)
+
+def generate_coverage_html(coverage):
+    """Coverage stat box: summary, chapter map, hottest chapters and uncited books."""
+    hot = np.argsort(-coverage['chapter_citations'], kind='stable')[:10]
+    hot_rows = ""
+    for i, chapter in enumerate(hot, 1):
+        if coverage['chapter_citations'][chapter] == 0:
+            break
+        hot_rows += (f"<tr><td>{i}</td><td>{chapter_label(chapter)}</td>"
+                     f"<td>{coverage['chapter_citations'][chapter]}</td>"
+                     f"<td>{coverage['chapter_fraction'][chapter]:.0%}</td></tr>\n            ")
+    
+    cold_books = [book for b, book in enumerate(CANONICAL_BOOKS) if coverage['book_fraction'][b] == 0]
+    
+    return f"""
+    <div class="stat-box">
+        <h3>📚 Bible Coverage by Chapter</h3>
+        <p style="color: #4b5563;">The library cites <strong>{coverage['verses_covered']:,}</strong> of {TOTAL_VERSES:,} verses
+        ({coverage['verses_covered'] / TOTAL_VERSES:.1%}) in <strong>{coverage['chapters_cited']}</strong> of {len(CHAPTER_LENGTH):,} chapters.
+        Each row is a book and each cell a chapter; darker cells have more of their verses cited.</p>
+        <div style="overflow-x: auto;">
+        {generate_coverage_svg(coverage)}
+        </div>
+        <h4 style="color: #1e40af;">Most Cited Chapters</h4>
+        <table>
+            <tr><th>Rank</th><th>Chapter</th><th>Citations</th><th>Verses Covered</th></tr>
+            {hot_rows}
+        </table>
+        <p style="color: #6b7280;"><strong>Books not yet cited ({len(cold_books)}):</strong> {', '.join(cold_books) or 'none'}</p>
+    </div>
+"""
+
+def generate_heatmap_svg(matrix, books, doctrines, cell=12, label_width=250, header_height=90):
+    """
+    Static SVG heatmap of the book x doctrine matrix: one column per book, one row
+    per doctrine, colour on a square-root scale. Rendered at build time.
+    """
+    doctrine_order = np.argsort(-matrix.sum(axis=0), kind='stable')
+    peak = max(int(matrix.max()), 1)
+    width = label_width + cell * len(books) + 10
+    height = header_height + cell * len(doctrines) + 10
+    
+    parts = [f'<svg xmlns="http://www.w3.org/2000/svg" viewBox="0 0 {width} {height}" width="100%" '
+             f'role="img" aria-label="Scripture citations by book and doctrine" '
+             f'style="font-family: Georgia, serif; font-size: 9px; background: white;">']
+    
+    for col, book in enumerate(books):
+        x = label_width + col * cell + cell * 0.7
+        parts.append(f'<text transform="translate({x:.1f},{header_height - 4}) rotate(-60)">{escape(book)}</text>')
+    
+    for row, d in enumerate(doctrine_order):
+        y = header_height + row * cell
+        name = doctrines[d] if len(doctrines[d]) <= 45 else doctrines[d][:42] + "..."
+        parts.append(f'<text x="{label_width - 6}" y="{y + cell - 3}" text-anchor="end">{escape(name)}</text>')
+        parts.append(f'<rect x="{label_width}" y="{y}" width="{cell * len(books)}" height="{cell}" fill="#f9fafb" stroke="#e5e7eb" stroke-width="0.5"/>')
+        for col in np.flatnonzero(matrix[:, d]):
+            count = int(matrix[col, d])
+            color = heatmap_color(np.sqrt(count / peak))
+            parts.append(f'<rect x="{label_width + col * cell}" y="{y}" width="{cell}" height="{cell}" fill="{color}">'
+                         f'<title>{escape(books[col])} — {escape(doctrines[d])}: {count}</title></rect>')
+    
+    parts.append('</svg>')
+    return '\n'.join(parts)
+
+def load_verse_graph_summary(data_file=CROSS_REF_DATA_FILE):
+    """Hub verses and verse clusters precomputed by add_cross_references.py, or None if not built yet."""
+    path = Path(data_file)
+    if not path.exists():
+        return None
+    with open(path, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    if 'hubs' not in data:
+        return None
+    
+    def label(key):
+        return data['verses'][key]['label']
+    
+    return {
+        'hubs': [(label(key), degree, rank) for key, degree, rank in data['hubs']],
+        'clusters': [(cluster['size'], [label(key) for key in cluster['hubs']]) for cluster in data['clusters'][:10]],
+        'cluster_count': len(data['clusters']),
+    }
+
+def generate_verse_graph_html(verse_graph):
+    """Stat boxes for hub verses and verse clusters (empty when no graph has been built)."""
+    if not verse_graph:
+        return ""
+    
+    hub_rows = ""
+    for i, (verse, degree, rank) in enumerate(verse_graph['hubs'][:10], 1):
+        hub_rows += f"<tr><td>{i}</td><td>{verse}</td><td>{degree}</td><td>{rank * 100:.2f}</td></tr>\n            "
+    
+    cluster_rows = ""
+    for i, (size, hubs) in enumerate(verse_graph['clusters'], 1):
+        cluster_rows += f"<tr><td>{i}</td><td>{size}</td><td>{', '.join(hubs)}</td></tr>\n            "
+    
+    return f"""
+    <div class="stat-box">
+        <h3>🔗 Hub Verses</h3>
+        <p style="color: #6b7280;">Verses at the centre of the cross-reference graph (weighted PageRank).</p>
+        <table>
+            <tr><th>Rank</th><th>Verse</th><th>Connections</th><th>Centrality</th></tr>
+            {hub_rows}
+        </table>
+    </div>
+    
+    <div class="stat-box">
+        <h3>🧩 Verse Clusters</h3>
+        <p style="color: #6b7280;">Largest of {verse_graph['cluster_count']} groups of verses that list each other as related.</p>
+        <table>
+            <tr><th>Cluster</th><th>Verses</th><th>Hub Verses</th></tr>
+            {cluster_rows}
+        </table>
+    </div>
+"""
+
+def generate_sources_html(sources):
+    """Which artifacts the report draws on, when more than one."""
+    if not sources or len(sources) < 2:
+        return ""
+    
+    rows = ""
+    for source in sources:
+        rows += (f"<tr><td>{escape(Path(source['path']).name)}</td><td>{source['doctrines']}</td>"
+                 f"<td>{source['citations']:,}</td></tr>\n            ")
+    
+    return f"""
+    <div class="stat-box">
+        <h3>🗂 Sources</h3>
+        <p style="color: #4b5563;">Doctrines that appear in several files are counted once, from the first file listed.</p>
+        <table>
+            <tr><th>File</th><th>Doctrines</th><th>Citations</th></tr>
+            {rows}
+        </table>
+    </div>
+"""
+
+def generate_analytics_html(analytics, verse_graph=None, history=None):
     """Generate HTML report of analytics."""
     
     # Generate book rows
@@ -120,6 +600,8 @@ def generate_analytics_html(analytics):
     for i, (verse, count) in enumerate(analytics['most_referenced_verses'], 1):
         verse_rows += f"<tr><td>{i}</td><td>{verse}</td><td>{count}</td></tr>\n            "
     
+    heatmap_svg = generate_heatmap_svg(analytics['book_doctrine_matrix'], analytics['books'], analytics['doctrines'])
+    
     html = f"""<!-- WordPress-Ready Scripture Analytics -->
 <style>
 .analytics-wrapper {{
@@ -230,6 +712,14 @@ def generate_analytics_html(analytics):
         </div>
     </div>
     
+    <div class="stat-box">
+        <h3>🗺️ Citations by Book and Doctrine</h3>
+        <p style="color: #6b7280;">Each cell counts one doctrine's citations of one book; darker means more. Hover a cell for the count.</p>
+        <div style="overflow-x: auto;">
+        {heatmap_svg}
+        </div>
+    </div>
+    
     <div class="stat-box">
         <h3>📖 Most Cited Books</h3>
         <table>
@@ -253,6 +743,10 @@ def generate_analytics_html(analytics):
             {verse_rows}
         </table>
     </div>
+    {generate_coverage_html(analytics['coverage'])}
+    {generate_verse_graph_html(verse_graph)}
+    {generate_history_html(history)}
+    {generate_sources_html(analytics.get('sources'))}
 </div>
 </div>
 """
@@ -263,19 +757,33 @@ def main():
     """Main execution."""
     print("Generating scripture analytics...")
     
-    # Extract references from publish file
-    html_file = 'Doctrines/doctrines_library_wp_publish.html'
-    references = extract_scripture_references(html_file)
-    print(f"✓ Extracted {len(references)} scripture references")
+    if '--library-only' in sys.argv:
+        # Extract references from publish file
+        references = extract_scripture_references(LIBRARY_FILE)
+        print(f"✓ Extracted {len(references)} scripture references")
+        analytics = generate_analytics(references)
+    else:
+        # Map-reduce over every doctrine artifact
+        analytics = artifact_analytics()
+        for source in analytics['sources']:
+            print(f"✓ {source['path']}: {source['doctrines']} doctrines, {source['citations']} citations")
     
-    # Generate analytics
-    analytics = generate_analytics(references)
     print(f"✓ Analyzed {analytics['total_references']} total references")
     print(f"✓ Found {analytics['unique_doctrines']} unique doctrines")
     print(f"✓ Covered {analytics['books_referenced']} books of the Bible")
+    coverage = analytics['coverage']
+    print(f"✓ Cited {coverage['verses_covered']} of {TOTAL_VERSES} verses in {coverage['chapters_cited']} chapters")
+    
+    # Hub verses and clusters, if add_cross_references.py has built the graph
+    verse_graph = load_verse_graph_summary()
+    if verse_graph:
+        print(f"✓ Loaded {len(verse_graph['hubs'])} hub verses and {verse_graph['cluster_count']} verse clusters")
+    
+    # Trend across committed revisions of the library (--history)
+    history = history_analytics() if '--history' in sys.argv else None
     
     # Generate HTML report
-    html_output = generate_analytics_html(analytics)
+    html_output = generate_analytics_html(analytics, verse_graph, history)
     
     # Save to both files
     output_wp = 'Doctrines/scripture_analytics_wp.html'
@@ -0,0 +1,244 @@
+#!/usr/bin/env python3
+"""
+Generate Doctrine Similarity Graph
+Scores every pair of doctrines by shared scripture (overlapping verse ranges)
+and shared vocabulary (TF-IDF section text), then writes a top-N "related
+doctrines" list per doctrine plus a GraphML file for offline exploration.
+
+Covers every library section and the standalone Divine Essence and Divine
+Decree pages.
+
+Usage:
+    python3 generate_doctrine_similarity.py [--top N] [--scripture-weight W]
+"""
+
+import html
+import json
+import re
+import sys
+from pathlib import Path
+from xml.sax.saxutils import escape, quoteattr
+
+import numpy as np
+from scipy import sparse
+
+from generate_scripture_index import extract_section_references, ref_verse_range, split_sections
+
+DOCTRINES_DIR = Path(__file__).parent / "Doctrines"
+
+# Standalone pages included as single doctrines: (id, title, file)
+STANDALONE_DOCTRINES = [
+    ('doctrine-of-divine-essence', 'Divine Essence (standalone)', 'doctrine-of-divine-essence_wp_standalone.html'),
+    ('doctrine-of-the-divine-decree', 'Divine Decree (standalone)', 'doctrine-of-the-divine-decree_wp_standalone.html'),
+]
+
+DEFAULT_TOP_N = 5
+DEFAULT_SCRIPTURE_WEIGHT = 0.6
+
+STOP_WORDS = set("""
+a about above after again against all also am an and any are as at be because been before being below
+between both but by can could did do does doing down during each few for from further had has have having
+he her here hers him his how i if in into is it its itself just let me more most my no nor not now of off
+on once only or other our ours out over own same shall she should so some such than that the their theirs
+them then there these they this those through thus to too under until unto up upon us very was we were
+what when where which while who whom why will with would ye yet you your
+""".split())
+
+def section_text(content):
+    """Plain lowercase text of a section, without markup, scripts or styles."""
+    content = re.sub(r'<(script|style)\b.*?</\1>', ' ', content, flags=re.DOTALL | re.IGNORECASE)
+    return html.unescape(re.sub(r'<[^>]+>', ' ', content)).lower()
+
+def tokenize(text):
+    return [word for word in re.findall(r"[a-z][a-z']+", text) if len(word) > 2 and word not in STOP_WORDS]
+
+def load_doctrines(doctrines_dir=DOCTRINES_DIR):
+    """
+    Return [{'id', 'title', 'source', 'verses', 'tokens'}, ...] for every library
+    section and standalone doctrine page. 'verses' is the set of verse IDs cited.
+    """
+    doctrines = []
+
+    def add(doctrine_id, title, source, content, refs):
+        verses = set()
+        for book, ref in refs:
+            verse_range = ref_verse_range(book, ref)
+            if verse_range:
+                verses.update(range(verse_range[0], verse_range[1] + 1))
+        doctrines.append({
+            'id': doctrine_id,
+            'title': title,
+            'source': source,
+            'verses': verses,
+            'tokens': tokenize(section_text(content)),
+        })
+
+    library_file = 'doctrines_library_wp_publish.html'
+    with open(doctrines_dir / library_file, 'r', encoding='utf-8') as f:
+        library = f.read()
+    for section_id, content in split_sections(library):
+        title, refs = extract_section_references(section_id, content)
+        add(section_id, html.unescape(title), library_file, content, refs)
+
+    for doctrine_id, title, filename in STANDALONE_DOCTRINES:
+        path = doctrines_dir / filename
+        if not path.exists():
+            print(f"⚠ Standalone page not found: {path}")
+            continue
+        with open(path, 'r', encoding='utf-8') as f:
+            content = f.read()
+        _, refs = extract_section_references(doctrine_id, content)
+        add(doctrine_id, title, filename, content, refs)
+
+    return doctrines
+
+def incidence_matrix(rows):
+    """Sparse doctrine x feature count matrix from an iterable of feature lists per doctrine."""
+    feature_index = {}
+    row_ids, col_ids = [], []
+    for row, features in enumerate(rows):
+        for feature in features:
+            row_ids.append(row)
+            col_ids.append(feature_index.setdefault(feature, len(feature_index)))
+    matrix = sparse.csr_matrix(
+        (np.ones(len(row_ids), dtype=np.float64), (row_ids, col_ids)),
+        shape=(len(rows), len(feature_index))
+    )
+    return matrix
+
+def tfidf_rows(counts, sublinear=True):
+    """TF-IDF weight a doctrine x feature count matrix and L2-normalize each row."""
+    counts = counts.tocsr(copy=True)
+    if sublinear:
+        counts.data = 1 + np.log(counts.data)
+    document_frequency = np.bincount(counts.indices, minlength=counts.shape[1])
+    idf = np.log((1 + counts.shape[0]) / (1 + document_frequency)) + 1
+    weighted = counts @ sparse.diags(idf)
+    norms = np.sqrt(np.asarray(weighted.multiply(weighted).sum(axis=1)).ravel())
+    return sparse.diags(1 / np.maximum(norms, 1e-12)) @ weighted
+
+def similarity_matrices(doctrines):
+    """
+    Dense doctrine x doctrine matrices:
+    (scripture cosine, text cosine, shared verse counts).
+    """
+    verse_counts = incidence_matrix([sorted(d['verses']) for d in doctrines])
+    scripture_vectors = tfidf_rows(verse_counts, sublinear=False)
+    text_vectors = tfidf_rows(incidence_matrix([d['tokens'] for d in doctrines]))
+
+    scripture = (scripture_vectors @ scripture_vectors.T).toarray()
+    text = (text_vectors @ text_vectors.T).toarray()
+    shared = (verse_counts @ verse_counts.T).toarray().astype(np.int64)
+
+    for matrix in (scripture, text, shared):
+        np.fill_diagonal(matrix, 0)
+    return scripture, text, shared
+
+def top_neighbors(similarity, top_n):
+    """Indices of each row's top_n highest scores, best first (one vectorized pass)."""
+    top_n = min(top_n, similarity.shape[1] - 1)
+    if top_n <= 0:
+        return np.empty((similarity.shape[0], 0), dtype=np.int64)
+    candidates = np.argpartition(-similarity, top_n - 1, axis=1)[:, :top_n]
+    order = np.argsort(-np.take_along_axis(similarity, candidates, axis=1), axis=1, kind='stable')
+    return np.take_along_axis(candidates, order, axis=1)
+
+def build_similarity_graph(doctrines, top_n=DEFAULT_TOP_N, scripture_weight=DEFAULT_SCRIPTURE_WEIGHT):
+    """Combined similarity and the top-N neighbor list for each doctrine."""
+    scripture, text, shared = similarity_matrices(doctrines)
+    combined = scripture_weight * scripture + (1 - scripture_weight) * text
+    neighbors = top_neighbors(combined, top_n)
+
+    related = {}
+    for row, doctrine in enumerate(doctrines):
+        related[doctrine['id']] = [
+            {
+                'id': doctrines[col]['id'],
+                'title': doctrines[col]['title'],
+                'score': round(float(combined[row, col]), 4),
+                'scripture': round(float(scripture[row, col]), 4),
+                'text': round(float(text[row, col]), 4),
+                'shared_verses': int(shared[row, col]),
+            }
+            for col in neighbors[row] if combined[row, col] > 0
+        ]
+    return related
+
+def write_neighbors_json(doctrines, related, output_path):
+    data = {
+        'doctrines': [
+            {'id': d['id'], 'title': d['title'], 'source': d['source'], 'verses': len(d['verses'])}
+            for d in doctrines
+        ],
+        'related': related,
+    }
+    with open(output_path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False, indent=2)
+
+def write_graphml(doctrines, related, output_path):
+    """Top-N neighbor edges as an undirected GraphML graph (duplicate pairs merged)."""
+    edges = {}
+    for source, neighbors in related.items():
+        for neighbor in neighbors:
+            key = tuple(sorted((source, neighbor['id'])))
+            edges[key] = neighbor
+
+    lines = [
+        '<?xml version="1.0" encoding="UTF-8"?>',
+        '<graphml xmlns="http://graphml.graphdrawing.org/xmlns">',
+        '  <key id="title" for="node" attr.name="title" attr.type="string"/>',
+        '  <key id="source" for="node" attr.name="source" attr.type="string"/>',
+        '  <key id="verses" for="node" attr.name="verses" attr.type="int"/>',
+        '  <key id="score" for="edge" attr.name="score" attr.type="double"/>',
+        '  <key id="scripture" for="edge" attr.name="scripture" attr.type="double"/>',
+        '  <key id="text" for="edge" attr.name="text" attr.type="double"/>',
+        '  <key id="shared_verses" for="edge" attr.name="shared_verses" attr.type="int"/>',
+        '  <graph id="doctrines" edgedefault="undirected">',
+    ]
+    for d in doctrines:
+        lines.append(f'    <node id={quoteattr(d["id"])}>')
+        lines.append(f'      <data key="title">{escape(d["title"])}</data>')
+        lines.append(f'      <data key="source">{escape(d["source"])}</data>')
+        lines.append(f'      <data key="verses">{len(d["verses"])}</data>')
+        lines.append('    </node>')
+    for (a, b), edge in sorted(edges.items()):
+        lines.append(f'    <edge source={quoteattr(a)} target={quoteattr(b)}>')
+        for key in ('score', 'scripture', 'text', 'shared_verses'):
+            lines.append(f'      <data key="{key}">{edge[key]}</data>')
+        lines.append('    </edge>')
+    lines.append('  </graph>')
+    lines.append('</graphml>')
+
+    with open(output_path, 'w', encoding='utf-8') as f:
+        f.write('\n'.join(lines) + '\n')
+    return len(edges)
+
+def main():
+    """Main execution."""
+    print("Generating doctrine similarity graph...")
+
+    top_n = int(sys.argv[sys.argv.index('--top') + 1]) if '--top' in sys.argv else DEFAULT_TOP_N
+    scripture_weight = DEFAULT_SCRIPTURE_WEIGHT
+    if '--scripture-weight' in sys.argv:
+        scripture_weight = float(sys.argv[sys.argv.index('--scripture-weight') + 1])
+
+    doctrines = load_doctrines()
+    print(f"✓ Loaded {len(doctrines)} doctrines")
+
+    related = build_similarity_graph(doctrines, top_n, scripture_weight)
+
+    json_path = DOCTRINES_DIR / "doctrine_similarity.json"
+    graphml_path = DOCTRINES_DIR / "doctrine_similarity.graphml"
+    write_neighbors_json(doctrines, related, json_path)
+    edge_count = write_graphml(doctrines, related, graphml_path)
+
+    print(f"✓ Top {top_n} related doctrines: {json_path}")
+    print(f"✓ Similarity graph ({edge_count} edges): {graphml_path}")
+
+    for doctrine_id, _, _ in STANDALONE_DOCTRINES:
+        if related.get(doctrine_id):
+            titles = ', '.join(n['title'] for n in related[doctrine_id][:3])
+            print(f"  - {doctrine_id}: {titles}")
+
+if __name__ == '__main__':
+    main()
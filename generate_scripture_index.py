@@ -5,8 +5,12 @@ Extracts all scripture references and organizes them by book
 """
 
 import re
+import sys
+import json
+import hashlib
 from pathlib import Path
 from collections import defaultdict
+from html import escape
 from html.parser import HTMLParser
 
 # Bible books in order
@@ -26,6 +30,10 @@ BIBLE_BOOKS = [
     "1 John", "2 John", "3 John", "Jude", "Revelation"
 ]
 
+# The 66 books in canonical order (BIBLE_BOOKS also lists "Psalm" as an alias)
+CANONICAL_BOOKS = [book for book in BIBLE_BOOKS if book != "Psalm"]
+BOOK_NUMBERS = {book: i + 1 for i, book in enumerate(CANONICAL_BOOKS)}
+
 # Normalize book names
 BOOK_ALIASES = {
     "Psalm": "Psalms",
@@ -78,6 +86,27 @@ BOOK_ALIASES = {
     "Tit": "Titus",
 }
 
+# Estimated height (px) of one row in the virtualized index table;
+# the renderer replaces it with the measured height after the first paint
+VIRTUAL_ROW_HEIGHT = 52
+
+# Longest excerpt (characters) shown in the Excerpt column
+EXCERPT_MAX_CHARS = 160
+
+def verse_id(book, chapter, verse):
+    """Integer verse ID in BBCCCVVV form, e.g. Romans 8:28 -> 45008028."""
+    return BOOK_NUMBERS[book] * 1000000 + chapter * 1000 + verse
+
+def split_verse_id(vid):
+    """Inverse of verse_id: returns (book, chapter, verse)."""
+    return CANONICAL_BOOKS[vid // 1000000 - 1], (vid // 1000) % 1000, vid % 1000
+
+def book_number_lookup():
+    """Lowercased book names and abbreviations -> book number, for client-side reference parsing."""
+    books = {book.lower(): number for book, number in BOOK_NUMBERS.items()}
+    books.update({alias.lower(): BOOK_NUMBERS[book] for alias, book in BOOK_ALIASES.items() if book in BOOK_NUMBERS})
+    return books
+
 class DoctrineHTMLParser(HTMLParser):
     def __init__(self):
         super().__init__()
@@ -106,58 +135,741 @@ class DoctrineHTMLParser(HTMLParser):
         if self.in_h2 and self.current_section:
             self.current_section_title = data.strip()
 
-def extract_scripture_references(html_content):
-    """Extract all scripture references from HTML content."""
-    references = defaultdict(lambda: defaultdict(lambda: {'sections': set(), 'section_ids': set()}))
-    
-    # Parse HTML to get section information
-    parser = DoctrineHTMLParser()
-    parser.feed(html_content)
-    
-    # Multiple patterns to catch different scripture reference formats
-    patterns = [
-        # Standard format: Book chapter:verse or Book chapter:verse-verse
-        r'\b([123]?\s*[A-Z][a-z]+\.?)\s+(\d+):(\d+)(?:[–—\-](\d+))?',
-        # Parenthetical references: (Book chapter:verse)
-        r'\(([123]?\s*[A-Z][a-z]+\.?)\s+(\d+):(\d+)(?:[–—\-](\d+))?\)',
-    ]
-    
-    # Split content by sections
+# Scripture reference patterns used for every section
+REFERENCE_PATTERNS = [
+    # Standard format: Book chapter:verse or Book chapter:verse-verse
+    r'\b([123]?\s*[A-Z][a-z]+\.?)\s+(\d+):(\d+)(?:[–—\-](\d+))?',
+    # Parenthetical references: (Book chapter:verse)
+    r'\(([123]?\s*[A-Z][a-z]+\.?)\s+(\d+):(\d+)(?:[–—\-](\d+))?\)',
+]
+
+def split_sections(html_content):
+    """Yield (section_id, section_content) for each <section id="..."> in the library."""
     sections = re.split(r'<section id="([^"]+)">', html_content)
     
     for i in range(1, len(sections), 2):
         if i+1 < len(sections):
-            section_id = sections[i]
-            section_content = sections[i+1]
+            yield sections[i], sections[i+1]
+
+def extract_section_references(section_id, section_content):
+    """Return (section title, set of (book, reference)) for one doctrine section."""
+    # Extract section title
+    title_match = re.search(r'<h2>([^<]+)</h2>', section_content)
+    section_title = title_match.group(1) if title_match else section_id
+    
+    refs = set()
+    
+    # Find all scripture references using all patterns
+    for pattern in REFERENCE_PATTERNS:
+        matches = re.finditer(pattern, section_content)
+        
+        for match in matches:
+            book = match.group(1).strip().rstrip('.')
+            # Normalize book name
+            book = BOOK_ALIASES.get(book, book)
+            
+            chapter = match.group(2)
+            verse_start = match.group(3)
+            verse_end = match.group(4) if len(match.groups()) >= 4 and match.group(4) else verse_start
             
-            # Extract section title
-            title_match = re.search(r'<h2>([^<]+)</h2>', section_content)
-            section_title = title_match.group(1) if title_match else section_id
+            ref = f"{chapter}:{verse_start}"
+            if verse_end and verse_end != verse_start:
+                ref += f"–{verse_end}"
             
-            # Find all scripture references using all patterns
-            for pattern in patterns:
-                matches = re.finditer(pattern, section_content)
-                
-                for match in matches:
-                    book = match.group(1).strip().rstrip('.')
-                    # Normalize book name
-                    book = BOOK_ALIASES.get(book, book)
-                    
-                    chapter = match.group(2)
-                    verse_start = match.group(3)
-                    verse_end = match.group(4) if len(match.groups()) >= 4 and match.group(4) else verse_start
-                    
-                    ref = f"{chapter}:{verse_start}"
-                    if verse_end and verse_end != verse_start:
-                        ref += f"–{verse_end}"
-                    
-                    references[book][ref]['sections'].add(section_title)
-                    references[book][ref]['section_ids'].add(section_id)
+            refs.add((book, ref))
+    
+    return section_title, refs
+
+def new_reference_map():
+    """Empty book -> reference -> {sections, section_ids, section_titles} mapping."""
+    return defaultdict(lambda: defaultdict(lambda: {'sections': set(), 'section_ids': set(), 'section_titles': {}}))
+
+def add_section_references(references, section_id, section_title, refs):
+    """Record a section as citing each (book, reference) in refs."""
+    for book, ref in refs:
+        references[book][ref]['sections'].add(section_title)
+        references[book][ref]['section_ids'].add(section_id)
+        references[book][ref]['section_titles'][section_id] = section_title
+
+def remove_section_references(references, section_id, refs):
+    """Undo add_section_references, dropping references no section cites any more."""
+    for book, ref in refs:
+        if book not in references or ref not in references[book]:
+            continue
+        entry = references[book][ref]
+        entry['section_ids'].discard(section_id)
+        entry['section_titles'].pop(section_id, None)
+        entry['sections'] = set(entry['section_titles'].values())
+        if not entry['section_ids']:
+            del references[book][ref]
+            if not references[book]:
+                del references[book]
+
+def extract_scripture_references(html_content):
+    """Extract all scripture references from HTML content."""
+    references = new_reference_map()
+    
+    for section_id, section_content in split_sections(html_content):
+        section_title, refs = extract_section_references(section_id, section_content)
+        add_section_references(references, section_id, section_title, refs)
     
     return references
 
-def generate_html_index(references):
-    """Generate HTML for scripture index."""
+def load_section_map(map_path):
+    """Load the persistent section_id -> {title, hash, refs} map (empty if missing)."""
+    map_path = Path(map_path)
+    if not map_path.exists():
+        return {}
+    with open(map_path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+def save_section_map(section_map, map_path):
+    with open(map_path, 'w', encoding='utf-8') as f:
+        json.dump(section_map, f, ensure_ascii=False, indent=1, sort_keys=True)
+
+def references_from_section_map(section_map):
+    """Rebuild the reference mapping from the section map without parsing any HTML."""
+    references = new_reference_map()
+    for section_id, entry in section_map.items():
+        add_section_references(references, section_id, entry['title'], {tuple(ref) for ref in entry['refs']})
+    return references
+
+def update_references(references, section_map, html_content):
+    """
+    Bring references and section_map up to date with html_content.
+    Only sections whose content hash changed are reparsed: their old
+    references are subtracted and the new ones added. Returns
+    (changed section ids, set of affected books).
+    """
+    changed = []
+    affected_books = set()
+    seen = set()
+    
+    for section_id, section_content in split_sections(html_content):
+        seen.add(section_id)
+        digest = hashlib.sha1(section_content.encode('utf-8')).hexdigest()
+        old_entry = section_map.get(section_id)
+        if old_entry and old_entry['hash'] == digest:
+            continue
+        
+        section_title, new_refs = extract_section_references(section_id, section_content)
+        old_refs = {tuple(ref) for ref in old_entry['refs']} if old_entry else set()
+        
+        if old_entry and old_entry['title'] != section_title:
+            touched = old_refs | new_refs
+        else:
+            touched = old_refs ^ new_refs
+        affected_books.update(book for book, ref in touched)
+        
+        remove_section_references(references, section_id, old_refs)
+        add_section_references(references, section_id, section_title, new_refs)
+        section_map[section_id] = {'title': section_title, 'hash': digest, 'refs': sorted(new_refs)}
+        changed.append(section_id)
+    
+    # Sections that were removed from the library
+    for section_id in set(section_map) - seen:
+        old_refs = {tuple(ref) for ref in section_map.pop(section_id)['refs']}
+        affected_books.update(book for book, ref in old_refs)
+        remove_section_references(references, section_id, old_refs)
+        changed.append(section_id)
+    
+    return changed, affected_books
+
+def format_excerpt(texts, max_chars=EXCERPT_MAX_CHARS):
+    """Join verse texts into an HTML-escaped excerpt, shortened at a word boundary."""
+    excerpt = ' '.join(texts)
+    if len(excerpt) > max_chars:
+        excerpt = excerpt[:max_chars].rsplit(' ', 1)[0].rstrip(',;:') + '…'
+    return escape(excerpt)
+
+def fill_excerpts(references, store):
+    """
+    Fill each reference's 'excerpt' from a local VerseStore.
+    Verses are read one book at a time (the store caches each book), so the
+    build never calls a live API. With ESV text the page stays within the ESV
+    display limits: at most 500 verses in total and half of any one book.
+    Returns the number of references that received an excerpt.
+    """
+    from verse_store import ESV_MAX_VERSES, ESV_MAX_BOOK_FRACTION
+
+    is_esv = (store.translation or '').upper() == 'ESV'
+    shown = set()
+    filled = 0
+
+    for book in sort_books(references.keys()):
+        book_shown = set()
+        book_limit = store.book_verse_count(book) * ESV_MAX_BOOK_FRACTION
+
+        for ref in sort_refs(references[book].keys()):
+            chapter, verses = ref.split(':')
+            verse_start, _, verse_end = verses.partition('–')
+            passage = store.passage(book, int(chapter), int(verse_start), int(verse_end) if verse_end else None)
+            if not passage:
+                continue
+
+            if is_esv:
+                new_ids = {vid for vid, text in passage} - shown
+                if (len(shown) + len(new_ids) > ESV_MAX_VERSES or
+                        len(book_shown) + len(new_ids) > book_limit):
+                    continue
+                shown |= new_ids
+                book_shown |= new_ids
+
+            references[book][ref]['excerpt'] = format_excerpt(text for vid, text in passage)
+            filled += 1
+
+    return filled
+
+def sort_books(books):
+    """Sort book names by Bible order."""
+    return sorted(books, key=lambda x: BIBLE_BOOKS.index(x) if x in BIBLE_BOOKS else 999)
+
+def sort_refs(refs):
+    """Sort chapter:verse references numerically (a range after its first verse)."""
+    def key(ref):
+        chapter, verses = ref.split(':')
+        verse_start, _, verse_end = verses.partition('–')
+        return int(chapter), int(verse_start), int(verse_end or verse_start)
+    return sorted(refs, key=key)
+
+def build_index_data(references):
+    """
+    Pack the index rows into compact data for the virtual renderer.
+    Books and doctrine sections are stored once; each row refers to them by
+    position: [book, reference, [section, ...], excerpt?].
+    """
+    books = []
+    sections = []
+    section_index = {}
+    rows = []
+
+    for book in sort_books(references.keys()):
+        book_idx = len(books)
+        books.append(book)
+
+        refs = references[book]
+        for ref in sort_refs(refs.keys()):
+            titles = refs[ref]['section_titles']
+            row_sections = []
+            for section_id in sorted(refs[ref]['section_ids'], key=lambda sid: (titles.get(sid, sid), sid)):
+                if section_id not in section_index:
+                    section_index[section_id] = len(sections)
+                    sections.append([section_id, titles.get(section_id, section_id)])
+                row_sections.append(section_index[section_id])
+            row = [book_idx, ref, row_sections]
+            if refs[ref].get('excerpt'):
+                row.append(refs[ref]['excerpt'])
+            rows.append(row)
+
+    return {'books': books, 'sections': sections, 'rows': rows}
+
+def generate_table_rows(references):
+    """Generate one eager <tr> per reference (non-virtualized index)."""
+    html = []
+    html.append('    <table>')
+    html.append('        <tr><th>Book</th><th>Reference</th><th>Excerpt</th><th>Doctrine(s)</th></tr>')
+
+    for book in sort_books(references.keys()):
+        refs = references[book]
+
+        for ref in sort_refs(refs.keys()):
+            data = refs[ref]
+            titles = data['section_titles']
+
+            # Create ESV.org URL for the verse
+            # Format: www.esv.org/BookName+Chapter:Verse
+            esv_book = book.replace(' ', '+')
+            esv_ref = ref.replace('–', '-')  # ESV uses regular hyphen
+            esv_url = f"https://www.esv.org/{esv_book}+{esv_ref}"
+
+            # Create links for each doctrine
+            doctrine_links = []
+            for section_id in sorted(data['section_ids'], key=lambda sid: (titles.get(sid, sid), sid)):
+                doctrine_links.append(f'<a href="doctrines_library.html#{section_id}">{titles.get(section_id, section_id)}</a>')
+
+            doctrine_links_str = ', '.join(doctrine_links)
+
+            html.append(f'        <tr>')
+            html.append(f'            <td>{book}</td>')
+            html.append(f'            <td><a href="{esv_url}" target="_blank">{ref}</a></td>')
+            html.append(f'            <td>{data.get("excerpt") or "[Verse text to be added]"}</td>')
+            html.append(f'            <td>{doctrine_links_str}</td>')
+            html.append(f'        </tr>')
+
+    html.append('    </table>')
+    return html
+
+def get_virtual_index_script():
+    """Generate JavaScript that renders only the visible index rows."""
+
+    return """
+<script>
+(function() {
+    // Virtual scrolling renderer for the scripture index.
+    // Only the rows inside the viewport (plus a small overscan) exist in the DOM.
+    const OVERSCAN = 8;
+    let rowHeight = %d;
+
+    const viewport = document.getElementById('scriptureIndexViewport');
+    const tbody = document.getElementById('scriptureIndexBody');
+    const data = JSON.parse(document.getElementById('scriptureIndexData').textContent);
+    const books = data.books;
+    const sections = data.sections;
+    const rows = data.rows;
+
+    let view = rows.map((row, i) => i);
+    let searchText = null;
+    let lastStart = -1;
+    let lastEnd = -1;
+    let pending = false;
+
+    function esvUrl(row) {
+        return 'https://www.esv.org/' + books[row[0]].replace(/ /g, '+') + '+' + row[1].replace('–', '-');
+    }
+
+    function rowHtml(row, position) {
+        const links = row[2].map(i =>
+            '<a href="doctrines_library.html#' + sections[i][0] + '">' + sections[i][1] + '</a>'
+        ).join(', ');
+        const excerpt = row[3] || '[Verse text to be added]';
+        return '<tr class="vs-row' + (position %% 2 ? ' vs-even' : '') + '">' +
+            '<td>' + books[row[0]] + '</td>' +
+            '<td><a href="' + esvUrl(row) + '" target="_blank">' + row[1] + '</a></td>' +
+            '<td title="' + excerpt.replace(/"/g, '&quot;') + '">' + excerpt + '</td>' +
+            '<td>' + links + '</td>' +
+            '</tr>';
+    }
+
+    function spacer(height) {
+        return height > 0 ? '<tr class="vs-spacer"><td colspan="4" style="height: ' + height + 'px;"></td></tr>' : '';
+    }
+
+    function render(force) {
+        const first = Math.floor(viewport.scrollTop / rowHeight);
+        const start = Math.max(0, first - OVERSCAN);
+        const end = Math.min(view.length, first + Math.ceil(viewport.clientHeight / rowHeight) + OVERSCAN);
+        if (!force && start === lastStart && end === lastEnd) return;
+        lastStart = start;
+        lastEnd = end;
+
+        let html = spacer(start * rowHeight);
+        for (let i = start; i < end; i++) {
+            html += rowHtml(rows[view[i]], i);
+        }
+        html += spacer((view.length - end) * rowHeight);
+        tbody.innerHTML = html;
+    }
+
+    function scheduleRender() {
+        if (pending) return;
+        pending = true;
+        requestAnimationFrame(() => {
+            pending = false;
+            render(false);
+        });
+    }
+
+    // Filter rows by a search term; returns the number of matching rows
+    function filter(term) {
+        term = (term || '').toLowerCase().trim();
+        if (term === '') {
+            view = rows.map((row, i) => i);
+        } else {
+            if (!searchText) {
+                searchText = rows.map(row =>
+                    (books[row[0]] + ' ' + row[1] + ' ' + (row[3] || '') + ' ' +
+                     row[2].map(i => sections[i][1]).join(' ')).toLowerCase()
+                );
+            }
+            view = [];
+            for (let i = 0; i < rows.length; i++) {
+                if (searchText[i].includes(term)) view.push(i);
+            }
+        }
+        viewport.scrollTop = 0;
+        render(true);
+        return view.length;
+    }
+
+    viewport.addEventListener('scroll', scheduleRender, { passive: true });
+    window.addEventListener('resize', scheduleRender);
+
+    render(true);
+
+    // Use the real row height once the first rows are laid out
+    const measured = tbody.querySelector('tr.vs-row');
+    if (measured && measured.getBoundingClientRect().height > 0) {
+        rowHeight = measured.getBoundingClientRect().height;
+        render(true);
+    }
+
+    window.ScriptureIndex = {
+        filter: filter,
+        total: rows.length,
+        render: () => render(true)
+    };
+})();
+</script>
+""" % VIRTUAL_ROW_HEIGHT
+
+def book_chunk_name(book):
+    """File name of a book's data chunk, e.g. '1 Peter' -> '1-peter.json'."""
+    return book.lower().replace(' ', '-') + '.json'
+
+def build_book_chunks(references):
+    """
+    Split the packed index into one chunk per book, in Bible order.
+    Returns (directory, chunks) where chunks maps file name -> chunk data.
+    Each chunk carries its own section table and its rows are
+    [reference, [section, ...], excerpt?], so a chunk only changes when its
+    own book's references do.
+    """
+    data = build_index_data(references)
+    books = [[book, book_chunk_name(book), 0, []] for book in data['books']]
+    chunks = {}
+    local_index = {}
+
+    for row in data['rows']:
+        entry = books[row[0]]
+        chunk = chunks.setdefault(entry[1], {'book': entry[0], 'sections': [], 'rows': []})
+        positions = local_index.setdefault(entry[1], {})
+
+        row_sections = []
+        for section in row[2]:
+            if section not in positions:
+                positions[section] = len(chunk['sections'])
+                chunk['sections'].append(data['sections'][section])
+                entry[3].append(section)
+            row_sections.append(positions[section])
+
+        chunk['rows'].append([row[1], row_sections] + row[3:])
+        entry[2] += 1
+
+    for entry in books:
+        entry[3].sort()
+
+    directory = {'books': books, 'sections': data['sections']}
+    return directory, chunks
+
+def build_chunk_directory(references):
+    """Book directory for the chunked index: [book, chunk, row count, [section, ...]]."""
+    return build_book_chunks(references)[0]
+
+def get_chunk_loader_script():
+    """Generate JavaScript that fetches a book's index rows on demand."""
+
+    return """
+<script>
+(function() {
+    // Chunked scripture index: the page only carries the book directory,
+    // each book's rows are fetched the first time it is opened or searched.
+    const container = document.getElementById('scriptureIndexBooks');
+    const directory = JSON.parse(document.getElementById('scriptureIndexDirectory').textContent);
+    const base = container.getAttribute('data-chunk-base') || '';
+    const books = directory.books;
+    const sections = directory.sections;
+    const chunks = new Map();
+    const total = books.reduce((sum, book) => sum + book[2], 0);
+    let currentTerm = '';
+
+    function esvUrl(book, ref) {
+        return 'https://www.esv.org/' + book.replace(/ /g, '+') + '+' + ref.replace('–', '-');
+    }
+
+    function rowText(chunk, row) {
+        return (chunk.book + ' ' + row[0] + ' ' + (row[2] || '') + ' ' +
+                row[1].map(i => chunk.sections[i][1]).join(' ')).toLowerCase();
+    }
+
+    function loadBook(i) {
+        if (!chunks.has(i)) {
+            const request = fetch(base + books[i][1])
+                .then(response => {
+                    if (!response.ok) throw new Error('HTTP ' + response.status);
+                    return response.json();
+                })
+                .then(chunk => {
+                    chunk.text = chunk.rows.map(row => rowText(chunk, row));
+                    return chunk;
+                })
+                .catch(error => {
+                    chunks.delete(i);
+                    throw error;
+                });
+            chunks.set(i, request);
+        }
+        return chunks.get(i);
+    }
+
+    function renderBook(i, chunk) {
+        const body = container.querySelector('details[data-book="' + i + '"] .chunk-body');
+        let html = '<table><tr><th>Reference</th><th>Excerpt</th><th>Doctrine(s)</th></tr>';
+        let shown = 0;
+        chunk.rows.forEach((row, r) => {
+            if (currentTerm && !chunk.text[r].includes(currentTerm)) return;
+            const links = row[1].map(s =>
+                '<a href="doctrines_library.html#' + chunk.sections[s][0] + '">' + chunk.sections[s][1] + '</a>'
+            ).join(', ');
+            html += '<tr><td><a href="' + esvUrl(chunk.book, row[0]) + '" target="_blank">' + row[0] + '</a></td>' +
+                    '<td>' + (row[2] || '[Verse text to be added]') + '</td>' +
+                    '<td>' + links + '</td></tr>';
+            shown++;
+        });
+        body.innerHTML = html + '</table>';
+        return shown;
+    }
+
+    function openBook(i) {
+        const details = container.querySelector('details[data-book="' + i + '"]');
+        const body = details.querySelector('.chunk-body');
+        if (!body.hasChildNodes()) {
+            body.innerHTML = '<div class="chunk-status">Loading ' + books[i][0] + '...</div>';
+        }
+        return loadBook(i)
+            .then(chunk => renderBook(i, chunk))
+            .catch(() => {
+                body.innerHTML = '<div class="chunk-status">Could not load ' + books[i][0] + '. Please try again.</div>';
+                return 0;
+            });
+    }
+
+    // Build the directory
+    container.innerHTML = books.map((book, i) =>
+        '<details class="book-chunk" data-book="' + i + '">' +
+        '<summary>' + book[0] + ' <span class="book-count">' + book[2] + ' reference' + (book[2] === 1 ? '' : 's') + '</span></summary>' +
+        '<div class="chunk-body"></div>' +
+        '</details>'
+    ).join('');
+
+    container.addEventListener('toggle', function(e) {
+        const details = e.target;
+        if (details.open) openBook(Number(details.getAttribute('data-book')));
+    }, true);
+
+    // Books whose chunks can contain a match for the search term
+    function candidateBooks(term) {
+        const bookPart = term.replace(/\\s*\\d+(:\\d+)?([–-]\\d+)?\\s*$/, '').replace(/\\.$/, '').trim();
+        const byName = [];
+        const bySection = [];
+        books.forEach((book, i) => {
+            const name = book[0].toLowerCase();
+            if (bookPart && (name.startsWith(bookPart) || name.includes(term))) byName.push(i);
+            if (book[3].some(s => sections[s][1].toLowerCase().includes(term))) bySection.push(i);
+        });
+        if (byName.length) return byName;
+        if (bySection.length) return bySection;
+        // Nothing in the directory narrows it down: search every chunk
+        return books.map((book, i) => i);
+    }
+
+    // Filter the index; resolves to the number of matching references
+    function filter(term) {
+        currentTerm = (term || '').toLowerCase().trim();
+        const details = container.querySelectorAll('details.book-chunk');
+
+        if (currentTerm === '') {
+            details.forEach(d => {
+                d.style.display = '';
+                const i = Number(d.getAttribute('data-book'));
+                if (chunks.has(i)) chunks.get(i).then(chunk => renderBook(i, chunk)).catch(() => {});
+            });
+            return Promise.resolve(total);
+        }
+
+        const candidates = new Set(candidateBooks(currentTerm));
+        const requested = currentTerm;
+        return Promise.all(Array.from(candidates).map(i =>
+            loadBook(i).then(chunk => ({ i, chunk })).catch(() => ({ i, chunk: null }))
+        )).then(results => {
+            if (requested !== currentTerm) return 0;
+            let count = 0;
+            const matched = new Set();
+            results.forEach(({ i, chunk }) => {
+                if (!chunk) return;
+                const shown = renderBook(i, chunk);
+                if (shown > 0) {
+                    matched.add(i);
+                    count += shown;
+                }
+            });
+            details.forEach(d => {
+                const i = Number(d.getAttribute('data-book'));
+                d.style.display = matched.has(i) ? '' : 'none';
+                if (matched.has(i)) d.open = true;
+            });
+            return count;
+        });
+    }
+
+    window.ScriptureIndex = {
+        filter: filter,
+        total: total,
+        loadBook: loadBook
+    };
+})();
+</script>
+"""
+
+def write_chunked_index(references, output_dir, chunk_dir_name='books'):
+    """
+    Write the chunked scripture index: a small directory page plus one JSON
+    data chunk per book. Only chunks whose content changed are rewritten, and
+    chunks of books no longer cited are removed. Every chunk is compared, not
+    just those of books whose references changed, because the ESV excerpt
+    quota is shared across books.
+    Returns (path of the directory page, number of chunks written).
+    """
+    output_dir = Path(output_dir)
+    chunk_dir = output_dir / chunk_dir_name
+    chunk_dir.mkdir(parents=True, exist_ok=True)
+
+    directory, chunks = build_book_chunks(references)
+    written = 0
+    for name, chunk in chunks.items():
+        data = json.dumps(chunk, ensure_ascii=False, separators=(',', ':'))
+        path = chunk_dir / name
+        if path.exists() and path.read_text(encoding='utf-8') == data:
+            continue
+        path.write_text(data, encoding='utf-8')
+        written += 1
+
+    for stale in chunk_dir.glob('*.json'):
+        if stale.name not in chunks:
+            stale.unlink()
+
+    page_path = output_dir / "index.html"
+    with open(page_path, 'w', encoding='utf-8') as f:
+        f.write(generate_html_index(references, chunked=True, chunk_base_url=f'{chunk_dir_name}/', directory=directory))
+
+    return page_path, written
+
+def ref_verse_range(book, ref):
+    """Start and end verse IDs of a 'C:V' or 'C:V–W' reference, or None for an unknown book."""
+    if book not in BOOK_NUMBERS:
+        return None
+    chapter, verses = ref.split(':')
+    verse_start, _, verse_end = verses.partition('–')
+    return (verse_id(book, int(chapter), int(verse_start)),
+            verse_id(book, int(chapter), int(verse_end or verse_start)))
+
+def iter_index_records(references):
+    """Yield one book/reference/sections record per index row, in index order."""
+    for book in sort_books(references.keys()):
+        refs = references[book]
+        for ref in sort_refs(refs.keys()):
+            data = refs[ref]
+            titles = data['section_titles']
+            record = {
+                'book': book,
+                'reference': ref,
+                'sections': [{'id': sid, 'title': titles.get(sid, sid)}
+                             for sid in sorted(data['section_ids'], key=lambda sid: (titles.get(sid, sid), sid))]
+            }
+            if data.get('excerpt'):
+                record['excerpt'] = data['excerpt']
+            yield record
+
+def write_index_ndjson(references, output_path):
+    """Stream the index to NDJSON, one record per line."""
+    with open(output_path, 'w', encoding='utf-8') as f:
+        for record in iter_index_records(references):
+            f.write(json.dumps(record, ensure_ascii=False) + '\n')
+
+def read_index_ndjson(input_path):
+    """Yield records from an NDJSON index without loading the whole file."""
+    with open(input_path, 'r', encoding='utf-8') as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+def build_compact_index(references):
+    """
+    Pack the index as integer IDs plus a string table:
+      strings:  every section id, title and excerpt, stored once
+      sections: [id string, title string]
+      refs:     [start verse ID, end verse ID, [section, ...], excerpt string?]
+    References to unrecognized books have no verse ID and are left out.
+    """
+    strings = []
+    string_ids = {}
+    sections = []
+    section_ids = {}
+    refs = []
+
+    def intern(value):
+        if value not in string_ids:
+            string_ids[value] = len(strings)
+            strings.append(value)
+        return string_ids[value]
+
+    for record in iter_index_records(references):
+        verse_range = ref_verse_range(record['book'], record['reference'])
+        if not verse_range:
+            continue
+
+        row_sections = []
+        for section in record['sections']:
+            if section['id'] not in section_ids:
+                section_ids[section['id']] = len(sections)
+                sections.append([intern(section['id']), intern(section['title'])])
+            row_sections.append(section_ids[section['id']])
+
+        row = [verse_range[0], verse_range[1], row_sections]
+        if 'excerpt' in record:
+            row.append(intern(record['excerpt']))
+        refs.append(row)
+
+    return {'format': 'scripture-index/1', 'strings': strings, 'sections': sections, 'refs': refs}
+
+def load_compact_index(input_path):
+    """
+    Load a compact index back into the book -> reference -> sections mapping
+    returned by extract_scripture_references.
+    """
+    with open(input_path, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+
+    strings = data['strings']
+    references = new_reference_map()
+
+    for row in data['refs']:
+        book, chapter, verse_start = split_verse_id(row[0])
+        verse_end = row[1] % 1000
+        ref = f"{chapter}:{verse_start}" + (f"–{verse_end}" if verse_end != verse_start else "")
+
+        entry = references[book][ref]
+        for section in row[2]:
+            section_id, title = strings[data['sections'][section][0]], strings[data['sections'][section][1]]
+            entry['sections'].add(title)
+            entry['section_ids'].add(section_id)
+            entry['section_titles'][section_id] = title
+        if len(row) > 3:
+            entry['excerpt'] = strings[row[3]]
+
+    return references
+
+def write_index_exports(references, output_dir):
+    """Write scripture_index.ndjson and scripture_index.json; returns both paths."""
+    output_dir = Path(output_dir)
+    ndjson_path = output_dir / "scripture_index.ndjson"
+    json_path = output_dir / "scripture_index.json"
+
+    write_index_ndjson(references, ndjson_path)
+    with open(json_path, 'w', encoding='utf-8') as f:
+        json.dump(build_compact_index(references), f, ensure_ascii=False, separators=(',', ':'))
+
+    return ndjson_path, json_path
+
+def generate_html_index(references, virtualized=True, chunked=False, chunk_base_url='books/', directory=None):
+    """
+    Generate HTML for scripture index.
+    With virtualized=True the rows are emitted as JSON and drawn by a
+    virtual-scrolling renderer instead of as one <tr> per reference.
+    With chunked=True only the book directory is embedded and each book's
+    rows are fetched from chunk_base_url when the book is opened or searched.
+    The chunked page is complete as written, search box included; pass the
+    directory from build_book_chunks to avoid building it twice.
+    """
     html = []
     html.append('<!DOCTYPE html>')
     html.append('<html lang="en">')
@@ -281,6 +993,65 @@ def generate_html_index(references):
     html.append('            box-shadow: 0 6px 12px rgba(59, 130, 246, 0.4);')
     html.append('            background: linear-gradient(135deg, #2563eb 0%, #1e40af 100%);')
     html.append('        }')
+    if chunked:
+        html.append('        .book-chunk {')
+        html.append('            margin: 0.5em 0;')
+        html.append('            border: 1px solid #e5e7eb;')
+        html.append('            border-radius: 8px;')
+        html.append('            overflow: hidden;')
+        html.append('        }')
+        html.append('        .book-chunk summary {')
+        html.append('            cursor: pointer;')
+        html.append('            padding: 0.75em 1em;')
+        html.append('            font-weight: bold;')
+        html.append('            color: #1e40af;')
+        html.append('            background: linear-gradient(to right, #eff6ff, #dbeafe);')
+        html.append('        }')
+        html.append('        .book-chunk summary .book-count {')
+        html.append('            float: right;')
+        html.append('            font-weight: normal;')
+        html.append('            color: #6b7280;')
+        html.append('        }')
+        html.append('        .book-chunk .chunk-status {')
+        html.append('            padding: 1em;')
+        html.append('            color: #6b7280;')
+        html.append('            font-style: italic;')
+        html.append('        }')
+        html.append('        .book-chunk table { border-radius: 0; box-shadow: none; }')
+    elif virtualized:
+        html.append('        .index-viewport {')
+        html.append('            max-height: 75vh;')
+        html.append('            overflow: auto;')
+        html.append('            border-radius: 8px;')
+        html.append('            box-shadow: 0 4px 8px rgba(0,0,0,0.08);')
+        html.append('        }')
+        html.append('        .index-viewport table {')
+        html.append('            table-layout: fixed;')
+        html.append('            overflow: visible;')
+        html.append('            box-shadow: none;')
+        html.append('        }')
+        html.append('        .index-viewport td {')
+        html.append(f'            height: {VIRTUAL_ROW_HEIGHT}px;')
+        html.append('            padding-top: 0;')
+        html.append('            padding-bottom: 0;')
+        html.append('            white-space: nowrap;')
+        html.append('        }')
+        html.append('        .index-viewport td:nth-child(3) {')
+        html.append('            overflow: hidden;')
+        html.append('            text-overflow: ellipsis;')
+        html.append('        }')
+        html.append('        .index-viewport td:nth-child(4) {')
+        html.append('            overflow-x: auto;')
+        html.append('        }')
+        html.append('        .index-viewport tr.vs-row { background-color: white; }')
+        html.append('        .index-viewport tr.vs-even { background-color: #f9fafb; }')
+        html.append('        .index-viewport tr.vs-row:hover { background-color: #eff6ff; transform: none; }')
+        html.append('        .index-viewport tr.vs-spacer td { padding: 0; border: none; }')
+        html.append('        .index-viewport table { display: table; min-width: 720px; }')
+        html.append('        .index-viewport thead { display: table-header-group; }')
+        html.append('        .index-viewport tbody { display: table-row-group; }')
+        html.append('        .index-viewport tr { display: table-row; }')
+        html.append('        .index-viewport th, .index-viewport td { display: table-cell; }')
     html.append('        @media (max-width: 1024px) {')
     html.append('            body { padding: 15px; }')
     html.append('            .container { padding: 1.5em; }')
@@ -315,43 +1086,28 @@ def generate_html_index(references):
     html.append('        <p>All scripture references from the Doctrines Library, organized by book</p>')
     html.append('    </div>')
     html.append('')
-    html.append('    <table>')
-    html.append('        <tr><th>Book</th><th>Reference</th><th>Excerpt</th><th>Doctrine(s)</th></tr>')
-    
-    # Sort books by Bible order
-    sorted_books = sorted(references.keys(), 
-                         key=lambda x: BIBLE_BOOKS.index(x) if x in BIBLE_BOOKS else 999)
-    
-    for book in sorted_books:
-        refs = references[book]
-        sorted_refs = sorted(refs.keys(), key=lambda x: (int(x.split(':')[0]), int(x.split(':')[1].split('–')[0])))
-        
-        for ref in sorted_refs:
-            data = refs[ref]
-            doctrines = data['sections']
-            section_ids = data['section_ids']
-            
-            # Create ESV.org URL for the verse
-            # Format: www.esv.org/BookName+Chapter:Verse
-            esv_book = book.replace(' ', '+')
-            esv_ref = ref.replace('–', '-')  # ESV uses regular hyphen
-            esv_url = f"https://www.esv.org/{esv_book}+{esv_ref}"
-            
-            # Create links for each doctrine
-            doctrine_links = []
-            for section_title, section_id in zip(sorted(doctrines), sorted(section_ids)):
-                doctrine_links.append(f'<a href="doctrines_library.html#{section_id}">{section_title}</a>')
-            
-            doctrine_links_str = ', '.join(doctrine_links)
-            
-            html.append(f'        <tr>')
-            html.append(f'            <td>{book}</td>')
-            html.append(f'            <td><a href="{esv_url}" target="_blank">{ref}</a></td>')
-            html.append(f'            <td>[Verse text to be added]</td>')
-            html.append(f'            <td>{doctrine_links_str}</td>')
-            html.append(f'        </tr>')
-    
-    html.append('    </table>')
+    if chunked:
+        from add_search_functionality import get_index_search_html
+        if directory is None:
+            directory = build_chunk_directory(references)
+        directory = json.dumps(directory, ensure_ascii=False, separators=(',', ':'))
+        html.append(get_index_search_html())
+        html.append(f'    <div id="scriptureIndexBooks" data-chunk-base="{chunk_base_url}"></div>')
+        html.append('    <script type="application/json" id="scriptureIndexDirectory">' + directory.replace('</', '<\\/') + '</script>')
+        html.append(get_chunk_loader_script())
+    elif virtualized:
+        index_data = json.dumps(build_index_data(references), ensure_ascii=False, separators=(',', ':'))
+        html.append('    <div class="index-viewport" id="scriptureIndexViewport">')
+        html.append('    <table>')
+        html.append('        <colgroup><col style="width: 15%"><col style="width: 13%"><col style="width: 37%"><col style="width: 35%"></colgroup>')
+        html.append('        <thead><tr><th>Book</th><th>Reference</th><th>Excerpt</th><th>Doctrine(s)</th></tr></thead>')
+        html.append('        <tbody id="scriptureIndexBody"></tbody>')
+        html.append('    </table>')
+        html.append('    </div>')
+        html.append('    <script type="application/json" id="scriptureIndexData">' + index_data.replace('</', '<\\/') + '</script>')
+        html.append(get_virtual_index_script())
+    else:
+        html.extend(generate_table_rows(references))
     html.append('</div>')
     html.append('')
     html.append('</body>')
@@ -360,25 +1116,75 @@ def generate_html_index(references):
     return '\n'.join(html)
 
 def main():
+    doctrines_dir = Path(__file__).parent / "Doctrines"
+    
     # Read doctrines_library_wp_publish.html
-    library_path = Path(__file__).parent / "Doctrines" / "doctrines_library_wp_publish.html"
+    library_path = doctrines_dir / "doctrines_library_wp_publish.html"
     with open(library_path, 'r', encoding='utf-8') as f:
         content = f.read()
     
-    # Extract references
-    references = extract_scripture_references(content)
+    output_publish = doctrines_dir / "scripture_index_wp_publish.html"
+    output_clean = doctrines_dir / "scripture_index_wp_clean.html"
+    chunked_dir = doctrines_dir / "scripture_index"
+    chunked = '--chunked' in sys.argv
+    
+    # Update the persistent per-section reference map; only changed sections
+    # are reparsed (--full discards the map and reparses everything).
+    # The single-page and chunked outputs each keep their own map.
+    if chunked:
+        map_path = chunked_dir / "sections.json"
+        chunked_dir.mkdir(parents=True, exist_ok=True)
+    else:
+        map_path = doctrines_dir / "scripture_index_sections.json"
+    section_map = {} if '--full' in sys.argv else load_section_map(map_path)
+    references = references_from_section_map(section_map)
+    changed, affected_books = update_references(references, section_map, content)
+    print(f"Reparsed {len(changed)} changed section(s); {len(affected_books)} book(s) affected")
+    
+    # Excerpts come from the local verse store when one has been imported;
+    # a store newer than the index means they need refreshing
+    from verse_store import VerseStore, DEFAULT_DB_PATH
+    db_path = Path(sys.argv[sys.argv.index('--verses') + 1]) if '--verses' in sys.argv else DEFAULT_DB_PATH
+    output_path = chunked_dir / "index.html" if chunked else output_publish
+    store_changed = db_path.exists() and (
+        not output_path.exists() or db_path.stat().st_mtime > output_path.stat().st_mtime
+    )
+    
+    if not changed and not store_changed and output_path.exists():
+        print("Scripture index is up to date")
+        return
+    
+    if db_path.exists():
+        store = VerseStore(db_path)
+        filled = fill_excerpts(references, store)
+        print(f"Filled {filled} excerpts from {db_path} ({store.translation})")
+        store.close()
+    
+    # Machine-readable exports for other tools
+    ndjson_path, json_path = write_index_exports(references, doctrines_dir)
+    print(f"Scripture index data exported:")
+    print(f"  - {ndjson_path}")
+    print(f"  - {json_path}")
+    
+    # Chunked mode: book directory page plus one data file per book
+    if chunked:
+        # Only chunks whose rows or excerpts changed are rewritten
+        page_path, written = write_chunked_index(references, chunked_dir)
+        save_section_map(section_map, map_path)
+        print(f"Chunked scripture index generated:")
+        print(f"  - {page_path}")
+        print(f"  - {chunked_dir / 'books'} ({written} of {len(references)} book chunks written)")
+        return
     
     # Generate HTML index
     html_index = generate_html_index(references)
     
     # Write to both index files
-    output_publish = Path(__file__).parent / "Doctrines" / "scripture_index_wp_publish.html"
-    output_clean = Path(__file__).parent / "Doctrines" / "scripture_index_wp_clean.html"
-    
     with open(output_publish, 'w', encoding='utf-8') as f:
         f.write(html_index)
     with open(output_clean, 'w', encoding='utf-8') as f:
         f.write(html_index)
+    save_section_map(section_map, map_path)
     
     print(f"Scripture indexes generated:")
     print(f"  - {output_publish}")
@@ -0,0 +1,400 @@
+#!/usr/bin/env python3
+"""
+Mock ESV API Server
+Local stand-in for the ESV v3 passage text endpoint, for testing the page's
+batched lookups, rate limiter and verse cache without a key or network.
+Responses follow the ESV format (query, canonical, parsed, passage_meta,
+passages); text comes from the local verse store when one has been imported,
+otherwise placeholder text is served. Each API token gets the ESV limits of
+60 requests a minute, 1,000 an hour and 5,000 a day, and requests over them
+get 429 responses with a Retry-After header.
+
+--time-scale speeds up the server's clock, so the hour and day windows can be
+exercised in seconds (at 60, a minute passes every second).
+
+Usage:
+    python3 mock_esv_server.py serve [--port 8765] [--db Doctrines/verses.db] [--time-scale 1] [--key KEY]
+    python3 mock_esv_server.py load [--url http://localhost:8765] [--refs 300] [--batch 25] [--concurrency 8] [--no-retry]
+    python3 mock_esv_server.py bench [--refs 300] [--batch 25] [--concurrency 8] [--time-scale 60]
+
+In a page, point the API at the mock from the browser console:
+    BIBLE_API_CONFIG.esv = {enabled: true, key: 'test', baseUrl: 'http://localhost:8765/v3/passage/text/'}
+"""
+
+import json
+import math
+import random
+import sys
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+from generate_scripture_index import CANONICAL_BOOKS, verse_id
+from rate_limiter import ESV_RATE_LIMITS, RATE_WINDOWS, RateLimiter, max_in_window
+from verse_store import DEFAULT_DB_PATH, ESV_MAX_VERSES, VerseStore
+from versification import CHAPTER_VERSES, parse_passage
+
+DEFAULT_PORT = 8765
+PASSAGE_PATH = '/v3/passage/text/'
+
+def passage_verse_ids(book, start, end):
+    """Every verse ID from start to end inclusive, across chapter boundaries."""
+    chapters = CHAPTER_VERSES[book]
+    ids = []
+    for chapter in range((start // 1000) % 1000, (end // 1000) % 1000 + 1):
+        first = start % 1000 if chapter == (start // 1000) % 1000 else 1
+        last = end % 1000 if chapter == (end // 1000) % 1000 else chapters[chapter - 1]
+        ids.extend(verse_id(book, chapter, verse) for verse in range(first, last + 1))
+    return ids
+
+def canonical_reference(book, start, end):
+    """ESV-style canonical form: 'Romans 8', 'Romans 8:28', 'Romans 8:28–30', 'Romans 8:28–9:2'."""
+    start_chapter, start_verse = (start // 1000) % 1000, start % 1000
+    end_chapter, end_verse = (end // 1000) % 1000, end % 1000
+    chapters = CHAPTER_VERSES[book]
+    if start_verse == 1 and end_verse == chapters[end_chapter - 1]:
+        if start_chapter == end_chapter:
+            return f"{book} {start_chapter}"
+        return f"{book} {start_chapter}–{end_chapter}"
+    if start_chapter != end_chapter:
+        return f"{book} {start_chapter}:{start_verse}–{end_chapter}:{end_verse}"
+    if start_verse != end_verse:
+        return f"{book} {start_chapter}:{start_verse}–{end_verse}"
+    return f"{book} {start_chapter}:{start_verse}"
+
+def load_verse_text(db_path):
+    """{verse ID: text} for the whole verse store, or {} when none has been imported."""
+    if not Path(db_path).exists():
+        return {}
+    store = VerseStore(db_path)
+    verses = {}
+    for book in CANONICAL_BOOKS:
+        verses.update(store.book(book))
+    store.close()
+    return verses
+
+def flag(params, name, default=True):
+    value = params.get(name, [str(default).lower()])[0].lower()
+    return value not in ('false', '0', 'no')
+
+class MockESV:
+    """Server state: verse text, per-token rate limiters and request statistics."""
+
+    def __init__(self, verses=None, limits=ESV_RATE_LIMITS, time_scale=1.0, key=None):
+        self.verses = verses or {}
+        self.limits = dict(limits)
+        self.time_scale = time_scale
+        self.key = key
+        self.lock = threading.Lock()
+        self.started = time.time()
+        self.reset()
+
+    def clock(self):
+        """Server time in seconds, running time_scale times faster than real time."""
+        return self.started + (time.time() - self.started) * self.time_scale
+
+    def reset(self):
+        with self.lock:
+            self.limiters = {}
+            self.allowed = []
+            self.throttled = 0
+            self.references = 0
+
+    def stats(self):
+        with self.lock:
+            return {
+                'time_scale': self.time_scale,
+                'limits': self.limits,
+                'allowed': list(self.allowed),
+                'throttled': self.throttled,
+                'references': self.references,
+            }
+
+    def acquire(self, token):
+        """Record a request for token if its limits allow; returns seconds to wait otherwise (0 when allowed)."""
+        with self.lock:
+            limiter = self.limiters.setdefault(token, RateLimiter(self.limits, clock=self.clock))
+            now = self.clock()
+            if limiter.try_acquire(now):
+                self.allowed.append(now)
+                return 0
+            self.throttled += 1
+            return max(math.ceil(limiter.wait_time(now)), 1)
+
+    def verse_text(self, vid):
+        book = CANONICAL_BOOKS[vid // 1000000 - 1]
+        return self.verses.get(vid) or f"Mock text of {book} {(vid // 1000) % 1000}:{vid % 1000}."
+
+    def passage_response(self, query, params):
+        """The ESV v3 /passage/text/ response body for a q=ref1;ref2;... query."""
+        include_references = flag(params, 'include-passage-references')
+        include_numbers = flag(params, 'include-verse-numbers')
+        include_copyright = flag(params, 'include-short-copyright')
+
+        parsed, meta, passages, canonical = [], [], [], []
+        shown = 0
+        for reference in query.split(';'):
+            passage = parse_passage(reference)
+            if not passage or shown >= ESV_MAX_VERSES:
+                continue
+            book, start, end = passage
+            # ESV shows at most ESV_MAX_VERSES verses per query
+            ids = passage_verse_ids(book, start, end)[:ESV_MAX_VERSES - shown]
+            shown += len(ids)
+            end = ids[-1]
+
+            name = canonical_reference(book, start, end)
+            text = ' '.join(
+                (f"[{vid % 1000}] " if include_numbers else '') + self.verse_text(vid) for vid in ids
+            )
+            if include_references:
+                text = f"{name}\n\n  {text}"
+            if include_copyright:
+                text += " (ESV)"
+
+            first_chapter = start - start % 1000
+            last_chapter = end - end % 1000
+            parsed.append([start, end])
+            canonical.append(name)
+            meta.append({
+                'canonical': name,
+                'chapter_start': [first_chapter + 1, first_chapter + CHAPTER_VERSES[book][(start // 1000) % 1000 - 1]],
+                'chapter_end': [last_chapter + 1, last_chapter + CHAPTER_VERSES[book][(end // 1000) % 1000 - 1]],
+            })
+            passages.append(text + "\n")
+
+        with self.lock:
+            self.references += len(parsed)
+        return {
+            'query': query,
+            'canonical': '; '.join(canonical),
+            'parsed': parsed,
+            'passage_meta': meta,
+            'passages': passages,
+        }
+
+class MockESVHandler(BaseHTTPRequestHandler):
+    server_version = 'MockESV/1'
+
+    def log_message(self, format, *args):
+        pass
+
+    def send_json(self, status, body, headers=()):
+        data = json.dumps(body, ensure_ascii=False).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        # Pages opened from disk or another port call the mock cross-origin
+        self.send_header('Access-Control-Allow-Origin', '*')
+        for name, value in headers:
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_OPTIONS(self):
+        self.send_response(204)
+        self.send_header('Access-Control-Allow-Origin', '*')
+        self.send_header('Access-Control-Allow-Headers', 'Authorization')
+        self.send_header('Access-Control-Allow-Methods', 'GET, OPTIONS')
+        self.end_headers()
+
+    def do_GET(self):
+        mock = self.server.mock
+        url = urllib.parse.urlsplit(self.path)
+
+        if url.path == '/mock/stats':
+            return self.send_json(200, mock.stats())
+        if url.path == '/mock/reset':
+            mock.reset()
+            return self.send_json(200, {'reset': True})
+        if url.path != PASSAGE_PATH:
+            return self.send_json(404, {'detail': 'Not found.'})
+
+        auth = self.headers.get('Authorization', '')
+        token = auth[len('Token '):].strip() if auth.startswith('Token ') else ''
+        if not token:
+            return self.send_json(401, {'detail': 'Authentication credentials were not provided.'})
+        if mock.key and token != mock.key:
+            return self.send_json(401, {'detail': 'Invalid token.'})
+
+        wait = mock.acquire(token)
+        if wait:
+            return self.send_json(
+                429, {'detail': f'Request was throttled. Expected available in {wait} seconds.'},
+                [('Retry-After', str(wait))]
+            )
+
+        params = urllib.parse.parse_qs(url.query)
+        self.send_json(200, mock.passage_response(params.get('q', [''])[0], params))
+
+def start_server(mock, port=DEFAULT_PORT):
+    """Serve mock in a background thread; returns the server (port 0 picks a free one)."""
+    server = ThreadingHTTPServer(('127.0.0.1', port), MockESVHandler)
+    server.daemon_threads = True
+    server.mock = mock
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+def random_references(count, seed=0):
+    """Deterministic mix of single verses, short ranges and whole chapters, like doctrine citations."""
+    rng = random.Random(seed)
+    references = []
+    for _ in range(count):
+        book = rng.choice(CANONICAL_BOOKS)
+        chapter = rng.randint(1, len(CHAPTER_VERSES[book]))
+        verses = CHAPTER_VERSES[book][chapter - 1]
+        kind = rng.random()
+        if kind < 0.05:
+            references.append(f"{book} {chapter}")
+            continue
+        verse = rng.randint(1, verses)
+        if kind < 0.35 and verse < verses:
+            references.append(f"{book} {chapter}:{verse}-{rng.randint(verse + 1, min(verse + 6, verses))}")
+        else:
+            references.append(f"{book} {chapter}:{verse}")
+    return references
+
+def pack_batches(references, batch_size):
+    """Group references the way the page does: at most batch_size per request and ESV_MAX_VERSES verses."""
+    batches, batch, verses = [], [], 0
+    for reference in references:
+        passage = parse_passage(reference)
+        size = len(passage_verse_ids(*passage)) if passage else ESV_MAX_VERSES
+        if batch and (len(batch) >= batch_size or verses + size > ESV_MAX_VERSES):
+            batches.append(batch)
+            batch, verses = [], 0
+        batch.append(reference)
+        verses += size
+    if batch:
+        batches.append(batch)
+    return batches
+
+def run_load(base_url, references, batch_size=25, concurrency=8, retry=True, key='test'):
+    """
+    Send references to the server in batches from concurrency workers.
+    With retry, a throttled batch waits out Retry-After and is sent again.
+    Returns {'elapsed', 'sent', 'ok', 'throttled', 'failed', 'references', 'latencies'}.
+    """
+    time_scale = json.load(urllib.request.urlopen(base_url + '/mock/stats'))['time_scale']
+    results = {'sent': 0, 'ok': 0, 'throttled': 0, 'failed': 0, 'references': 0, 'latencies': []}
+    lock = threading.Lock()
+
+    def send(batch):
+        query = urllib.parse.urlencode({'q': ';'.join(batch), 'include-passage-references': 'false'})
+        request = urllib.request.Request(f"{base_url}{PASSAGE_PATH}?{query}", headers={'Authorization': f'Token {key}'})
+        while True:
+            started = time.perf_counter()
+            try:
+                body = json.load(urllib.request.urlopen(request))
+                status, wait = 200, 0
+            except urllib.error.HTTPError as error:
+                status, wait = error.code, int(error.headers.get('Retry-After') or 0)
+            with lock:
+                results['sent'] += 1
+                results['latencies'].append(time.perf_counter() - started)
+                if status == 200:
+                    results['ok'] += 1
+                    results['references'] += len(body['passages'])
+                elif status == 429:
+                    results['throttled'] += 1
+                else:
+                    results['failed'] += 1
+            if status != 429 or not retry:
+                return
+            time.sleep(wait / time_scale)
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(send, pack_batches(references, batch_size)))
+    results['elapsed'] = time.perf_counter() - started
+    return results
+
+def report_load(label, results, reference_count):
+    latencies = sorted(results['latencies']) or [0]
+    p50 = latencies[len(latencies) // 2] * 1000
+    p95 = latencies[min(int(len(latencies) * 0.95), len(latencies) - 1)] * 1000
+    per_request = results['references'] / results['ok'] if results['ok'] else 0
+    print(f"  {label}:")
+    print(f"    {results['sent']} requests ({results['ok']} ok, {results['throttled']} throttled, "
+          f"{results['failed']} failed) in {results['elapsed']:.2f}s")
+    print(f"    {results['references']}/{reference_count} references served, "
+          f"{per_request:.1f} per request, {results['references'] / max(results['elapsed'], 1e-9):.0f}/s")
+    print(f"    latency p50 {p50:.1f}ms, p95 {p95:.1f}ms")
+
+def check_limits(base_url):
+    """Check the server never allowed more requests in a window than its limit; returns True if so."""
+    stats = json.load(urllib.request.urlopen(base_url + '/mock/stats'))
+    allowed = sorted(stats['allowed'])
+    ok = True
+    for name, (window, _) in RATE_WINDOWS.items():
+        peak = max_in_window(allowed, window)
+        limit = stats['limits'][name]
+        ok = ok and peak <= limit
+        print(f"{'✓' if peak <= limit else '✗'} Busiest {name}: {peak} requests allowed (limit {limit})")
+    return ok
+
+def option(name, default, cast=str):
+    return cast(sys.argv[sys.argv.index(name) + 1]) if name in sys.argv else default
+
+def main():
+    commands = ('serve', 'load', 'bench')
+    command = sys.argv[1] if len(sys.argv) > 1 else 'bench'
+    if command not in commands:
+        print(__doc__.split('Usage:')[1].split('In a page')[0].rstrip())
+        sys.exit(1)
+
+    ref_count = option('--refs', 300, int)
+    batch_size = option('--batch', 25, int)
+    concurrency = option('--concurrency', 8, int)
+
+    if command == 'serve':
+        port = option('--port', DEFAULT_PORT, int)
+        verses = load_verse_text(option('--db', DEFAULT_DB_PATH, Path))
+        mock = MockESV(verses, time_scale=option('--time-scale', 1.0, float), key=option('--key', None))
+        server = start_server(mock, port)
+        source = f"{len(verses)} verses from the verse store" if verses else "placeholder text (no verse store)"
+        print(f"✓ Mock ESV API on http://localhost:{server.server_port}{PASSAGE_PATH} serving {source}")
+        print(f"  Limits: {mock.limits['minute']}/min, {mock.limits['hour']}/hour, {mock.limits['day']}/day "
+              f"per token, clock x{mock.time_scale:g}")
+        try:
+            threading.Event().wait()
+        except KeyboardInterrupt:
+            server.shutdown()
+        return
+
+    references = random_references(ref_count)
+
+    if command == 'load':
+        base_url = option('--url', f"http://localhost:{DEFAULT_PORT}").rstrip('/')
+        print(f"Loading {base_url} with {ref_count} references...")
+        results = run_load(base_url, references, batch_size, concurrency, retry='--no-retry' not in sys.argv)
+        report_load(f"batches of up to {batch_size}", results, ref_count)
+        check_limits(base_url)
+        return
+
+    # bench: compare one reference per request with batched requests, then a
+    # burst that ignores Retry-After, against an in-process server
+    mock = MockESV(time_scale=option('--time-scale', 60.0, float))
+    server = start_server(mock, 0)
+    base_url = f"http://127.0.0.1:{server.server_port}"
+    print(f"Benchmarking mock ESV API ({ref_count} references, clock x{mock.time_scale:g})...")
+
+    for label, size in (('one reference per request', 1), (f'batches of up to {batch_size}', batch_size)):
+        mock.reset()
+        results = run_load(base_url, references, size, concurrency)
+        report_load(label, results, ref_count)
+        check_limits(base_url)
+
+    mock.reset()
+    results = run_load(base_url, references, 1, concurrency, retry=False)
+    report_load('burst without retries', results, ref_count)
+    check_limits(base_url)
+    server.shutdown()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,199 @@
+#!/usr/bin/env python3
+"""
+ESV API Rate Limiter
+Python mirror of the page rate limiter in add_api_rate_limiting.py, for the
+build tools and the local mock server. Requests are counted per minute, hour
+and day in fixed ring buffers of time slots, so memory and every check are
+constant however many requests are made.
+
+A window's count covers every slot that overlaps the window (one more slot
+than the window holds), so it can only overstate the true sliding-window
+count: the limits are never exceeded.
+
+State saved by the earlier page limiter (a list of request timestamps in
+milliseconds from the last hour plus a daily count) is migrated on load.
+
+Usage:
+    python3 rate_limiter.py    # simulate two days of traffic and check the limits hold
+    python3 -m pytest test_rate_limiter.py
+"""
+
+import math
+import random
+import sys
+import time
+
+# ESV API terms
+ESV_RATE_LIMITS = {'minute': 60, 'hour': 1000, 'day': 5000}
+
+# Window length in seconds and number of ring-buffer slots
+RATE_WINDOWS = {
+    'minute': (60, 12),
+    'hour': (60 * 60, 60),
+    'day': (24 * 60 * 60, 24),
+}
+
+class WindowCounter:
+    """Requests in the last `window` seconds, counted in time slots of window / slots seconds."""
+
+    def __init__(self, window, slots, state=None):
+        # The slot containing now is partly in the window and so is the
+        # oldest one, so the ring holds slots + 1 of them
+        self.slots = slots + 1
+        self.slot_seconds = window / slots
+        counts = (state or {}).get('counts')
+        self.counts = list(counts) if counts and len(counts) == self.slots else [0] * self.slots
+        self.slot = (state or {}).get('slot', 0)
+        self.total = sum(self.counts)
+
+    def advance(self, now):
+        """Move to the slot containing now, clearing the slots that fell out of the window."""
+        current = math.floor(now / self.slot_seconds)
+        if current - self.slot >= self.slots:
+            self.counts = [0] * self.slots
+            self.total = 0
+        else:
+            for slot in range(self.slot + 1, current + 1):
+                self.total -= self.counts[slot % self.slots]
+                self.counts[slot % self.slots] = 0
+        self.slot = max(self.slot, current)
+
+    def count(self, now):
+        self.advance(now)
+        return self.total
+
+    def add(self, now, n=1):
+        self.advance(now)
+        self.counts[self.slot % self.slots] += n
+        self.total += n
+
+    def wait_time(self, now, limit):
+        """Seconds until the oldest slots expire enough to bring the count under limit."""
+        self.advance(now)
+        total = self.total
+        for age in range(self.slots - 1, -1, -1):
+            if total < limit:
+                break
+            slot = self.slot - age
+            total -= self.counts[slot % self.slots]
+            if total < limit:
+                return max((slot + self.slots) * self.slot_seconds - now, 0.0)
+        return 0.0
+
+    def to_dict(self):
+        return {'slot': self.slot, 'counts': list(self.counts)}
+
+class RateLimiter:
+    """Per-minute, per-hour and per-day request limits; state serializes to a small dict."""
+
+    def __init__(self, limits=ESV_RATE_LIMITS, windows=RATE_WINDOWS, state=None, clock=time.time):
+        self.limits = dict(limits)
+        self.clock = clock
+        legacy = state if state and isinstance(state.get('requests'), list) else None
+        self.counters = {
+            name: WindowCounter(window, slots, None if legacy else (state or {}).get(name))
+            for name, (window, slots) in windows.items()
+        }
+        if legacy:
+            self.migrate_timestamps(legacy)
+
+    def migrate_timestamps(self, state, now=None):
+        """Count requests from the earlier limiter's {'requests': [ms, ...], 'dailyCount', 'lastReset'} state."""
+        now = self._now(now)
+        hour = RATE_WINDOWS['hour'][0]
+        recent = sorted(t / 1000 for t in state['requests'] if now - hour < t / 1000 <= now)
+        for t in recent:
+            for counter in self.counters.values():
+                counter.add(t)
+        if 'day' in self.counters and state.get('lastReset', 0) / 1000 > now - RATE_WINDOWS['day'][0]:
+            self.counters['day'].add(now, max((state.get('dailyCount') or 0) - len(recent), 0))
+
+    def _now(self, now):
+        return self.clock() if now is None else now
+
+    def can_make_request(self, now=None):
+        now = self._now(now)
+        return all(counter.count(now) < self.limits[name] for name, counter in self.counters.items())
+
+    def record_request(self, now=None):
+        now = self._now(now)
+        for counter in self.counters.values():
+            counter.add(now)
+
+    def try_acquire(self, now=None):
+        """Record a request if every limit allows it; returns whether it was allowed."""
+        now = self._now(now)
+        if not self.can_make_request(now):
+            return False
+        self.record_request(now)
+        return True
+
+    def remaining(self, now=None):
+        now = self._now(now)
+        return {name: self.limits[name] - counter.count(now) for name, counter in self.counters.items()}
+
+    def wait_time(self, now=None):
+        """Seconds until a request would be allowed (0 when one is allowed now)."""
+        now = self._now(now)
+        return max(counter.wait_time(now, self.limits[name]) for name, counter in self.counters.items())
+
+    def to_dict(self):
+        return {name: counter.to_dict() for name, counter in self.counters.items()}
+
+def simulate(limiter, start, duration, seed=0):
+    """Bursty request attempts over duration seconds; returns the times that were allowed."""
+    rng = random.Random(seed)
+    now, allowed = start, []
+    while now < start + duration:
+        # Bursts of rapid attempts separated by idle gaps
+        now += rng.expovariate(2.0) if rng.random() < 0.9 else rng.expovariate(1 / 120)
+        if limiter.try_acquire(now):
+            allowed.append(now)
+    return allowed
+
+def max_in_window(times, window):
+    """Largest number of times falling in any half-open window of the given length."""
+    best, first = 0, 0
+    for last, t in enumerate(times):
+        while times[first] <= t - window:
+            first += 1
+        best = max(best, last - first + 1)
+    return best
+
+def main():
+    print("Checking ESV rate limiter...")
+    failed = False
+
+    start = 1_700_000_000.0
+    limiter = RateLimiter()
+    allowed = simulate(limiter, start, 2 * 24 * 60 * 60)
+    print(f"✓ {len(allowed)} requests allowed over two simulated days")
+
+    for name, (window, _) in RATE_WINDOWS.items():
+        peak = max_in_window(allowed, window)
+        status = '✓' if peak <= ESV_RATE_LIMITS[name] else '✗'
+        failed = failed or status == '✗'
+        print(f"{status} Busiest {name}: {peak} requests (limit {ESV_RATE_LIMITS[name]})")
+
+    # A blocked caller that waits wait_time() seconds is let through
+    limiter = RateLimiter()
+    now = start
+    while limiter.try_acquire(now):
+        now += 0.1
+    wait = limiter.wait_time(now)
+    # Counters only move forward in time, so check the earlier instant first
+    blocked_until_then = not limiter.can_make_request(now + wait - 1)
+    status = '✓' if wait > 0 and blocked_until_then and limiter.can_make_request(now + wait) else '✗'
+    failed = failed or status == '✗'
+    print(f"{status} Blocked after {limiter.limits['minute']} requests; wait_time() = {wait:.1f}s")
+
+    restored = RateLimiter(state=limiter.to_dict())
+    status = '✓' if restored.remaining(now) == limiter.remaining(now) else '✗'
+    failed = failed or status == '✗'
+    print(f"{status} State round-trips ({sum(len(c['counts']) for c in limiter.to_dict().values())} slot counters)")
+
+    if failed:
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
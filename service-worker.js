@@ -1,10 +1,19 @@
 // Service Worker for Christian Doctrines Library PWA
 const CACHE_NAME = 'doctrines-v1';
+const DATA_CACHE_NAME = 'doctrines-data-v1';
 const urlsToCache = [
   '/complete-library-of-christian-doctrine/',
   '/comprehensive-biblical-reference-guide/',
   // Add other resources as needed
 ];
+// Data assets fetched on demand by the pages (not precached)
+const dataAssets = [
+  '/cross_references.json',
+];
+// Directories of data assets (the offline verse pack)
+const dataPrefixes = [
+  '/verse_pack/',
+];
 
 // Install service worker and cache resources
 self.addEventListener('install', event => {
@@ -19,6 +28,29 @@ self.addEventListener('install', event => {
 
 // Fetch from cache or network
 self.addEventListener('fetch', event => {
+  // Data assets: serve the cached copy at once and refresh it in the background
+  const path = new URL(event.request.url).pathname;
+  if (dataAssets.includes(path) || dataPrefixes.some(prefix => path.startsWith(prefix))) {
+    event.respondWith(
+      caches.open(DATA_CACHE_NAME).then(cache =>
+        cache.match(event.request).then(cached => {
+          const network = fetch(event.request).then(response => {
+            if (response && response.status === 200) {
+              cache.put(event.request, response.clone());
+            }
+            return response;
+          });
+          if (cached) {
+            event.waitUntil(network.catch(() => {}));
+            return cached;
+          }
+          return network;
+        })
+      )
+    );
+    return;
+  }
+  
   event.respondWith(
     caches.match(event.request)
       .then(response => {
@@ -52,7 +84,7 @@ self.addEventListener('fetch', event => {
 
 // Update service worker
 self.addEventListener('activate', event => {
-  const cacheWhitelist = [CACHE_NAME];
+  const cacheWhitelist = [CACHE_NAME, DATA_CACHE_NAME];
   
   event.waitUntil(
     caches.keys().then(cacheNames => {
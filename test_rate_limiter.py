@@ -0,0 +1,91 @@
+"""Tests for rate_limiter.py, the Python mirror of the page's ESV rate limiter."""
+
+import json
+
+import pytest
+
+from rate_limiter import ESV_RATE_LIMITS, RATE_WINDOWS, RateLimiter, max_in_window, simulate
+
+# A multiple of every slot length (5 s, 60 s, 3600 s), so it starts a slot in each window
+START = 1_700_006_400.0
+
+def test_limits_hold_over_bursty_trace():
+    limiter = RateLimiter()
+    allowed = simulate(limiter, START, 2 * 24 * 60 * 60, seed=1)
+
+    for name, (window, _) in RATE_WINDOWS.items():
+        assert max_in_window(allowed, window) <= ESV_RATE_LIMITS[name]
+    # The daily quota is what binds over two days, and it is used in full
+    assert len(allowed) == 2 * ESV_RATE_LIMITS['day']
+
+def test_try_acquire_refuses_at_limit():
+    limiter = RateLimiter()
+    assert all(limiter.try_acquire(START) for _ in range(ESV_RATE_LIMITS['minute']))
+    assert limiter.remaining(START)['minute'] == 0
+
+    assert not limiter.try_acquire(START)
+    assert not limiter.can_make_request(START + 30)
+    # A refused request is not counted
+    assert limiter.remaining(START)['hour'] == ESV_RATE_LIMITS['hour'] - ESV_RATE_LIMITS['minute']
+
+@pytest.mark.parametrize('offset', [0.0, 2.5, 4.999])
+def test_wait_time_is_exact_at_slot_boundaries(offset):
+    window, slots = RATE_WINDOWS['minute']
+    slot_seconds = window / slots
+    limiter = RateLimiter({'minute': 3}, {'minute': (window, slots)})
+    now = START + offset
+    for _ in range(3):
+        assert limiter.try_acquire(now)
+
+    wait = limiter.wait_time(now)
+    # The requests' slot leaves the ring slots + 1 slots after it began
+    assert wait == pytest.approx((slots + 1) * slot_seconds - offset)
+    assert not limiter.can_make_request(now + wait - 1e-6)
+    assert limiter.can_make_request(now + wait)
+    assert limiter.wait_time(now + wait) == 0
+
+def test_wait_time_is_zero_when_allowed():
+    limiter = RateLimiter()
+    limiter.record_request(START)
+    assert limiter.wait_time(START) == 0
+
+def test_state_round_trips():
+    limiter = RateLimiter()
+    simulate(limiter, START, 3 * 60 * 60, seed=2)
+    now = START + 3 * 60 * 60
+
+    state = json.loads(json.dumps(limiter.to_dict()))
+    restored = RateLimiter(state=state)
+    assert restored.to_dict() == limiter.to_dict()
+    assert restored.remaining(now) == limiter.remaining(now)
+    assert restored.wait_time(now) == limiter.wait_time(now)
+
+    for t in (now, now + 1, now + 61, now + 3600):
+        assert restored.try_acquire(t) == limiter.try_acquire(t)
+
+def test_state_with_wrong_slot_count_is_discarded():
+    state = {'minute': {'slot': 5, 'counts': [60] * 4}}
+    assert RateLimiter(state=state).remaining(START)['minute'] == ESV_RATE_LIMITS['minute']
+
+def test_migrates_timestamp_state():
+    now = START
+    state = {
+        # Milliseconds, as the earlier page limiter stored them
+        'requests': [(now - age) * 1000 for age in (10, 20, 30, 120, 1800, 3599, 3601, 7200)],
+        'dailyCount': 100,
+        'lastReset': (now - 6 * 60 * 60) * 1000,
+    }
+    limiter = RateLimiter(state=state, clock=lambda: now)
+    remaining = limiter.remaining(now)
+
+    # Only the last hour's timestamps carry over; the rest of the daily count
+    # is charged to the day window
+    assert remaining['minute'] == ESV_RATE_LIMITS['minute'] - 3
+    assert remaining['hour'] == ESV_RATE_LIMITS['hour'] - 6
+    assert remaining['day'] == ESV_RATE_LIMITS['day'] - 100
+
+def test_migration_ignores_daily_count_from_earlier_day():
+    now = START
+    state = {'requests': [], 'dailyCount': 4000, 'lastReset': (now - 25 * 60 * 60) * 1000}
+    limiter = RateLimiter(state=state, clock=lambda: now)
+    assert limiter.remaining(now) == ESV_RATE_LIMITS
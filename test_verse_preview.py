@@ -0,0 +1,79 @@
+"""Tests for upgrading pages that already carry an older verse preview."""
+
+from add_bible_api import legacy_verse_tooltip_override, verse_tooltip_override_script
+from add_verse_preview import add_verse_preview, add_verse_preview_script
+
+OLD_PREVIEW = """<script>
+// WordPress-safe DOM ready wrapper
+(function() {
+    function initScript() {
+    // Verse preview tooltip functionality
+    const style = document.createElement('style');
+    style.textContent = '.verse-tooltip { position: fixed; }';
+    async function getVerseText(reference) {
+        // Simulate API delay
+        await new Promise(resolve => setTimeout(resolve, 300));
+        return { reference: reference, text: 'Verse text preview' };
+    }
+    window.getVerseText = getVerseText;
+    }
+    initScript();
+})();
+</script>"""
+
+OLD_API = """<script>
+(function() {
+    // Bible API Configuration
+    if (typeof window.getVerseText === 'undefined') {
+    } else {
+""" + legacy_verse_tooltip_override() + """    }
+})();
+</script>"""
+
+def old_page():
+    return ('<div class="bd-wrapper">\n<p><a href="https://www.esv.org/Romans+8:28">Romans 8:28</a></p>\n'
+            + OLD_PREVIEW + '\n\n' + OLD_API + '\n</div>')
+
+def test_old_preview_is_replaced(tmp_path):
+    page = tmp_path / 'library.html'
+    page.write_text(old_page(), encoding='utf-8')
+    add_verse_preview(page, page)
+    content = page.read_text(encoding='utf-8')
+
+    assert 'Simulate API delay' not in content
+    assert content.count('// Verse preview tooltip functionality') == 1
+    assert add_verse_preview_script().strip() in content
+    assert legacy_verse_tooltip_override() not in content
+    assert verse_tooltip_override_script() in content
+    # The page around the preview is kept
+    assert content.startswith('<div class="bd-wrapper">\n<p><a href=')
+    assert content.endswith('})();\n</script>\n</div>')
+
+def test_second_run_changes_nothing(tmp_path):
+    page = tmp_path / 'library.html'
+    page.write_text(old_page(), encoding='utf-8')
+    add_verse_preview(page, page)
+    first = page.read_text(encoding='utf-8')
+
+    add_verse_preview(page, page)
+    assert page.read_text(encoding='utf-8') == first
+
+def test_pack_url_change_replaces_preview(tmp_path):
+    page = tmp_path / 'library.html'
+    page.write_text(old_page(), encoding='utf-8')
+    add_verse_preview(page, page)
+    add_verse_preview(page, page, pack_url='/static/verse_pack/')
+    content = page.read_text(encoding='utf-8')
+
+    assert content.count('// Verse preview tooltip functionality') == 1
+    assert add_verse_preview_script('/static/verse_pack/').strip() in content
+
+def test_preview_added_to_page_without_one(tmp_path):
+    page = tmp_path / 'index.html'
+    page.write_text('<div class="si-wrapper">\n<table></table>\n</div>', encoding='utf-8')
+    add_verse_preview(page, page)
+    add_verse_preview(page, page)
+    content = page.read_text(encoding='utf-8')
+
+    assert content.count('// Verse preview tooltip functionality') == 1
+    assert content.endswith('</script>\n</div>')
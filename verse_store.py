@@ -0,0 +1,333 @@
+#!/usr/bin/env python3
+"""
+Local Verse Text Store
+SQLite database of verse text keyed by integer verse ID, filled from a
+public-domain translation file on disk. Lets the build look up excerpts
+without live API calls, and exports a static verse pack so page previews
+work offline.
+
+Usage:
+    python3 verse_store.py import /path/to/kjv.txt [--translation KJV] [--format plain|osis|usfm] [--db Doctrines/verses.db]
+    python3 verse_store.py lookup "Romans 8:28-30" [--db Doctrines/verses.db]
+    python3 verse_store.py export-pack [Doctrines/verse_pack] [--db Doctrines/verses.db]
+
+Import formats, chosen from the file extension unless --format is given:
+- plain text (.txt): one verse per line as "Book C:V text" or tab-separated
+  "Book<TAB>C<TAB>V<TAB>text"
+- OSIS XML (.xml, .osis): container or milestone <verse> elements
+- USFM (.usfm, .sfm, or a directory of them): \\c and \\v markers
+
+The verse pack is one JSON file per book in which chapters[c - 1][v - 1] is
+the verse text, plus an index.json mapping book names to files.
+"""
+
+import json
+import re
+import sys
+import sqlite3
+import xml.sax
+from pathlib import Path
+
+from generate_scripture_index import BOOK_ALIASES, BOOK_NUMBERS, CANONICAL_BOOKS, book_number_lookup, verse_id
+
+DEFAULT_DB_PATH = Path(__file__).parent / "Doctrines" / "verses.db"
+DEFAULT_PACK_DIR = Path(__file__).parent / "Doctrines" / "verse_pack"
+
+# Book codes in canonical order
+OSIS_BOOK_CODES = [
+    'Gen', 'Exod', 'Lev', 'Num', 'Deut', 'Josh', 'Judg', 'Ruth', '1Sam', '2Sam', '1Kgs', '2Kgs',
+    '1Chr', '2Chr', 'Ezra', 'Neh', 'Esth', 'Job', 'Ps', 'Prov', 'Eccl', 'Song', 'Isa', 'Jer',
+    'Lam', 'Ezek', 'Dan', 'Hos', 'Joel', 'Amos', 'Obad', 'Jonah', 'Mic', 'Nah', 'Hab', 'Zeph',
+    'Hag', 'Zech', 'Mal', 'Matt', 'Mark', 'Luke', 'John', 'Acts', 'Rom', '1Cor', '2Cor', 'Gal',
+    'Eph', 'Phil', 'Col', '1Thess', '2Thess', '1Tim', '2Tim', 'Titus', 'Phlm', 'Heb', 'Jas',
+    '1Pet', '2Pet', '1John', '2John', '3John', 'Jude', 'Rev',
+]
+USFM_BOOK_CODES = [
+    'GEN', 'EXO', 'LEV', 'NUM', 'DEU', 'JOS', 'JDG', 'RUT', '1SA', '2SA', '1KI', '2KI',
+    '1CH', '2CH', 'EZR', 'NEH', 'EST', 'JOB', 'PSA', 'PRO', 'ECC', 'SNG', 'ISA', 'JER',
+    'LAM', 'EZK', 'DAN', 'HOS', 'JOL', 'AMO', 'OBA', 'JON', 'MIC', 'NAM', 'HAB', 'ZEP',
+    'HAG', 'ZEC', 'MAL', 'MAT', 'MRK', 'LUK', 'JHN', 'ACT', 'ROM', '1CO', '2CO', 'GAL',
+    'EPH', 'PHP', 'COL', '1TH', '2TH', '1TI', '2TI', 'TIT', 'PHM', 'HEB', 'JAS',
+    '1PE', '2PE', '1JN', '2JN', '3JN', 'JUD', 'REV',
+]
+OSIS_BOOKS = dict(zip(OSIS_BOOK_CODES, CANONICAL_BOOKS))
+USFM_BOOKS = dict(zip(USFM_BOOK_CODES, CANONICAL_BOOKS))
+
+# USFM paragraph-level markers whose line is not verse text (headings, titles, remarks)
+USFM_SKIP_LINE = re.compile(r'^\\(?:id|ide|h|toc\d*|mt\d*|ms\d*|mr|s\d*|sr|r|d|rem|cl|cp|sp|sts|usfm)\b.*$', re.MULTILINE)
+
+# ESV terms: no more than 500 verses, or half of any book, shown on a page
+ESV_MAX_VERSES = 500
+ESV_MAX_BOOK_FRACTION = 0.5
+
+def normalize_book(name):
+    """Return the canonical book name for a full name or abbreviation, or None."""
+    name = re.sub(r'\s+', ' ', name.strip().rstrip('.'))
+    name = BOOK_ALIASES.get(name, name)
+    return name if name in BOOK_NUMBERS else None
+
+def parse_plain_text(path):
+    """Yield (book, chapter, verse, text) from a plain-text translation file."""
+    line_pattern = re.compile(r'^([123]?\s*[A-Za-z][A-Za-z .]*?)\s+(\d+):(\d+)\s+(.+)$')
+
+    with open(path, 'r', encoding='utf-8-sig') as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+
+            fields = line.split('\t')
+            if len(fields) == 4 and fields[1].isdigit() and fields[2].isdigit():
+                book, chapter, verse, text = fields
+            else:
+                match = line_pattern.match(line)
+                if not match:
+                    continue
+                book, chapter, verse, text = match.groups()
+
+            book = normalize_book(book)
+            if book:
+                yield book, int(chapter), int(verse), text.strip()
+
+class OsisVerseHandler(xml.sax.ContentHandler):
+    """
+    Collects (book, chapter, verse, text) from OSIS, which marks verses either
+    as containers (<verse osisID="Gen.1.1">...</verse>) or as milestones
+    (<verse sID="Gen.1.1"/>...<verse eID="Gen.1.1"/>). Notes and titles are
+    skipped so footnote text does not leak into the verse.
+    """
+
+    SKIPPED = {'note', 'title', 'reference'}
+
+    def __init__(self):
+        super().__init__()
+        self.verses = []
+        self.current = None
+        self.milestone = False
+        self.text = []
+        self.skip_depth = 0
+
+    def startElement(self, name, attrs):
+        name = name.split(':')[-1]
+        if self.skip_depth or name in self.SKIPPED:
+            self.skip_depth += 1
+        elif name == 'verse':
+            if 'eID' in attrs:
+                self.flush()
+            elif 'osisID' in attrs or 'sID' in attrs:
+                self.flush()
+                self.current = (attrs.get('osisID') or attrs.get('sID')).split()[0]
+                self.milestone = 'sID' in attrs
+
+    def endElement(self, name):
+        name = name.split(':')[-1]
+        if self.skip_depth:
+            self.skip_depth -= 1
+        elif name == 'verse' and not self.milestone:
+            self.flush()
+
+    def characters(self, content):
+        if self.current and not self.skip_depth:
+            self.text.append(content)
+
+    def flush(self):
+        if self.current:
+            parts = self.current.split('.')
+            book = OSIS_BOOKS.get(parts[0])
+            text = ' '.join(''.join(self.text).split())
+            if book and len(parts) == 3 and parts[1].isdigit() and parts[2].isdigit() and text:
+                self.verses.append((book, int(parts[1]), int(parts[2]), text))
+        self.current = None
+        self.milestone = False
+        self.text = []
+
+def parse_osis(path):
+    """Yield (book, chapter, verse, text) from an OSIS XML file."""
+    handler = OsisVerseHandler()
+    xml.sax.parse(str(path), handler)
+    handler.flush()
+    yield from handler.verses
+
+def usfm_text(raw):
+    """Plain verse text from USFM: footnotes and cross-references dropped, word markup unwrapped."""
+    raw = re.sub(r'\\(f|fe|x)\s.*?\\\1\*', '', raw, flags=re.DOTALL)
+    raw = re.sub(r'\\\+?w\s+([^|\\]*)(?:\|[^\\]*)?\\\+?w\*', r'\1', raw)
+    raw = re.sub(r'\\\+?[a-z]+\d*(?:\*|\s?)', '', raw)
+    return ' '.join(raw.split())
+
+def parse_usfm(path):
+    """Yield (book, chapter, verse, text) from a USFM file or a directory of USFM files."""
+    path = Path(path)
+    files = sorted(p for p in path.iterdir() if p.suffix.lower() in ('.usfm', '.sfm')) if path.is_dir() else [path]
+
+    for usfm_file in files:
+        with open(usfm_file, 'r', encoding='utf-8-sig') as f:
+            content = f.read()
+        code = re.search(r'^\\id\s+(\w+)', content, re.MULTILINE)
+        book = USFM_BOOKS.get(code.group(1).upper()) if code else None
+        if not book:
+            continue
+
+        content = USFM_SKIP_LINE.sub('', content)
+        chapter = 0
+        markers = list(re.finditer(r'\\(c|v)\s+(\d+)\S*', content))
+        for marker, following in zip(markers, markers[1:] + [None]):
+            if marker.group(1) == 'c':
+                chapter = int(marker.group(2))
+                continue
+            text = usfm_text(content[marker.end():following.start() if following else len(content)])
+            if chapter and text:
+                yield book, chapter, int(marker.group(2)), text
+
+IMPORT_FORMATS = {'plain': parse_plain_text, 'osis': parse_osis, 'usfm': parse_usfm}
+
+def detect_format(path):
+    """Import format from the path: a directory or .usfm/.sfm is USFM, .xml/.osis is OSIS."""
+    path = Path(path)
+    if path.is_dir() or path.suffix.lower() in ('.usfm', '.sfm'):
+        return 'usfm'
+    if path.suffix.lower() in ('.xml', '.osis'):
+        return 'osis'
+    return 'plain'
+
+class VerseStore:
+    """Verse text keyed by integer verse ID, loaded and cached one book at a time."""
+
+    def __init__(self, db_path=DEFAULT_DB_PATH):
+        self.db_path = Path(db_path)
+        self.conn = sqlite3.connect(str(self.db_path))
+        self.conn.execute('CREATE TABLE IF NOT EXISTS verses (id INTEGER PRIMARY KEY, text TEXT NOT NULL)')
+        self.conn.execute('CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)')
+        self._books = {}
+
+    @property
+    def translation(self):
+        row = self.conn.execute("SELECT value FROM meta WHERE key = 'translation'").fetchone()
+        return row[0] if row else None
+
+    def import_verses(self, verses, translation):
+        """Replace the store's contents with (book, chapter, verse, text) tuples."""
+        with self.conn:
+            self.conn.execute('DELETE FROM verses')
+            self.conn.executemany(
+                'INSERT OR REPLACE INTO verses (id, text) VALUES (?, ?)',
+                ((verse_id(book, chapter, verse), text) for book, chapter, verse, text in verses)
+            )
+            self.conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('translation', ?)", (translation,))
+        self._books.clear()
+        return self.conn.execute('SELECT COUNT(*) FROM verses').fetchone()[0]
+
+    def book(self, book):
+        """All verses of a book as {verse_id: text}, fetched in one query and cached."""
+        if book not in BOOK_NUMBERS:
+            return {}
+        if book not in self._books:
+            base = BOOK_NUMBERS[book] * 1000000
+            rows = self.conn.execute(
+                'SELECT id, text FROM verses WHERE id BETWEEN ? AND ?', (base, base + 999999)
+            )
+            self._books[book] = dict(rows)
+        return self._books[book]
+
+    def book_verse_count(self, book):
+        return len(self.book(book))
+
+    def passage(self, book, chapter, verse_start, verse_end=None):
+        """(verse_id, text) pairs for a single-chapter range; missing verses are skipped."""
+        verses = self.book(book)
+        if not verses:
+            return []
+        verse_end = verse_end or verse_start
+        return [(vid, verses[vid]) for vid in range(verse_id(book, chapter, verse_start),
+                                                    verse_id(book, chapter, verse_end) + 1) if vid in verses]
+
+    def close(self):
+        self.conn.close()
+
+def export_verse_pack(store, output_dir=DEFAULT_PACK_DIR):
+    """
+    Write the store as a static verse pack: NN.json per book holding
+    {'book', 'chapters': [[verse text, ...], ...]} so a page looks a verse up by
+    index, and index.json with the translation, book-name map and file names.
+    Returns the number of verses written.
+    """
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+
+    files = {}
+    total = 0
+    for book in CANONICAL_BOOKS:
+        verses = store.book(book)
+        if not verses:
+            continue
+        chapters = []
+        for vid, text in sorted(verses.items()):
+            chapter, verse = (vid // 1000) % 1000, vid % 1000
+            while len(chapters) < chapter:
+                chapters.append([])
+            chapters[chapter - 1].extend([''] * (verse - len(chapters[chapter - 1])))
+            chapters[chapter - 1][verse - 1] = text
+        filename = f"{BOOK_NUMBERS[book]:02d}.json"
+        with open(output_dir / filename, 'w', encoding='utf-8') as f:
+            json.dump({'book': book, 'chapters': chapters}, f, ensure_ascii=False, separators=(',', ':'))
+        files[BOOK_NUMBERS[book]] = filename
+        total += len(verses)
+
+    books = book_number_lookup()
+    with open(output_dir / 'index.json', 'w', encoding='utf-8') as f:
+        json.dump({'format': 'verse-pack/1', 'translation': store.translation, 'books': books, 'files': files},
+                  f, ensure_ascii=False, separators=(',', ':'))
+    return total
+
+def main():
+    commands = ('import', 'lookup', 'export-pack')
+    if len(sys.argv) < 2 or sys.argv[1] not in commands or (sys.argv[1] != 'export-pack' and len(sys.argv) < 3):
+        print("Usage:")
+        print("  python3 verse_store.py import /path/to/translation.txt [--translation KJV] [--format plain|osis|usfm] [--db PATH]")
+        print("  python3 verse_store.py lookup \"Romans 8:28-30\" [--db PATH]")
+        print("  python3 verse_store.py export-pack [OUTPUT_DIR] [--db PATH]")
+        sys.exit(1)
+
+    args = sys.argv[2:]
+    db_path = DEFAULT_DB_PATH
+    translation = 'KJV'
+    if '--db' in args:
+        db_path = Path(args[args.index('--db') + 1])
+    if '--translation' in args:
+        translation = args[args.index('--translation') + 1]
+
+    store = VerseStore(db_path)
+
+    if sys.argv[1] == 'import':
+        source = Path(args[0])
+        if not source.exists():
+            print(f"File not found: {source}")
+            sys.exit(1)
+        source_format = args[args.index('--format') + 1] if '--format' in args else detect_format(source)
+        if source_format not in IMPORT_FORMATS:
+            print(f"Unknown format: {source_format} (expected {', '.join(IMPORT_FORMATS)})")
+            sys.exit(1)
+        count = store.import_verses(IMPORT_FORMATS[source_format](source), translation)
+        print(f"✓ Imported {count} verses ({translation}, {source_format}) into {db_path}")
+    elif sys.argv[1] == 'export-pack':
+        output_dir = Path(args[0]) if args and not args[0].startswith('--') else DEFAULT_PACK_DIR
+        if (store.translation or '').upper() == 'ESV':
+            # ESV terms cap how much text a site may show; only packs of
+            # public-domain translations are exported
+            print("ESV text cannot be published as a full verse pack; import a public-domain translation")
+            sys.exit(1)
+        count = export_verse_pack(store, output_dir)
+        print(f"✓ Exported {count} verses ({store.translation}) to {output_dir}")
+    else:
+        match = re.match(r'^(.+?)\s+(\d+):(\d+)(?:[–—\-](\d+))?$', args[0].strip())
+        book = normalize_book(match.group(1)) if match else None
+        if not book:
+            print(f"Could not parse reference: {args[0]}")
+            sys.exit(1)
+        end = int(match.group(4)) if match.group(4) else None
+        print(' '.join(text for vid, text in store.passage(book, int(match.group(2)), int(match.group(3)), end)))
+
+    store.close()
+
+if __name__ == "__main__":
+    main()